@@ -0,0 +1,82 @@
+import time
+import logging
+
+from pymodbus.exceptions import ModbusIOException
+
+from mobus_operator import (setup_modbus, close_modbus, read_registers, build_write_frame, bus_transaction,
+                            BROADCAST_NODE_ID, ROH_BEEP_SWITCH)
+from register_model import RegisterModel
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+BROADCAST_TURNAROUND = 0.2 # 广播后的转向延迟（秒），Modbus 串行链路规范建议 100~200ms，期间不能访问总线
+
+
+def send_broadcast(bus, start_address, values, turnaround=BROADCAST_TURNAROUND):
+    """
+    以设备ID 0 发送一帧 FC16 广播写入，并在持有总线的情况下等待转向延迟。
+    RtuFastTransport 直接发送原始帧，pymodbus 客户端使用 no_response_expected。
+    """
+    with bus_transaction(bus):
+        if hasattr(bus, 'send_broadcast'):
+            bus.send_broadcast(build_write_frame(BROADCAST_NODE_ID, start_address, values))
+        else:
+            try:
+                bus.write_registers(address=start_address, values=values, slave=BROADCAST_NODE_ID,
+                                    no_response_expected=True)
+            except TypeError:
+                # 旧版 pymodbus 没有 no_response_expected，广播必然等待超时
+                try:
+                    bus.write_registers(address=start_address, values=values, slave=BROADCAST_NODE_ID)
+                except ModbusIOException:
+                    pass
+        if turnaround:
+            time.sleep(turnaround)
+
+
+def broadcast_write(bus, start_address, data, node_ids, turnaround=BROADCAST_TURNAROUND, model=None):
+    """
+    向同一总线上的所有设备广播写入相同的配置，随后对每个设备用一帧 FC03 读回整段寄存器，按参考模型校验。
+    广播没有应答，设备拒绝或忽略的值无法发现，因此发送前先用参考模型检查，预计不会生效时不发送。
+    :param node_ids: 需要校验的设备ID
+    :return: {设备ID: 校验是否通过}，未发送时返回 None
+    """
+    model = model if model is not None else RegisterModel()
+    values = [data] if isinstance(data, int) else list(data)
+    for offset, value in enumerate(values):
+        accepted, expected, _ = model.table(start_address + offset)
+        if not accepted[value] or expected[value] < 0:
+            logger.error(f'寄存器{start_address + offset}的值{value}预计不会生效，取消广播')
+            return None
+    begin = time.perf_counter()
+    send_broadcast(bus, start_address, values, turnaround=turnaround)
+    result = {}
+    for node_id in node_ids:
+        response = read_registers(bus=bus, start_address=start_address, register_count=len(values),
+                                  node_id=node_id, wait_time=0)
+        if response is None or response.isError():
+            result[node_id] = False
+            continue
+        result[node_id] = all(model.check(start_address + offset, value, True, read_value)
+                              for offset, (value, read_value) in enumerate(zip(values, response.registers)))
+        if not result[node_id]:
+            logger.error(f'[node_id = {node_id}]广播写入{start_address}校验失败, 读回{response.registers}')
+    logger.info(f'广播写入{start_address} <- {values}, 校验{len(node_ids)}个设备, 耗时 {time.perf_counter() - begin:.3f}s')
+    return result
+
+
+if __name__ == "__main__":
+    # 初始化 modbus 总线
+    bus = setup_modbus()
+
+    if bus:
+        logger.info(f'校验结果: {broadcast_write(bus, ROH_BEEP_SWITCH, 1, node_ids=[2, 3])}')
+        close_modbus(bus)
@@ -0,0 +1,211 @@
+import itertools
+import time
+import logging
+
+import numpy as np
+
+from mobus_operator import setup_modbus, close_modbus, read_registers, write_registers, NODE_ID
+from limits_cache import read_device_identity
+from register_model import RegisterModel
+from step_response import StepResponseSuite, sample, step_metrics, pid_key, save_results, compare_results
+from pid_sweep import pareto_front
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+ROH_FINGER_FORCE_TARGET0  = (1115) # R/W
+ROH_FINGER_FORCE0         = (1175) # R
+ROH_FINGER_FORCE_P0       = (1225) # R/W
+NUM_FORCE_FINGERS = 5 # 带力控的手指数量（不含大拇指旋转）
+FORCE_GAIN_COUNT = 4 # FORCE_P、FORCE_I、FORCE_D、FORCE_G，间隔 10 个寄存器，每个增益单独一帧
+
+FORCE_SWEEP_GRID = [[2000, 5000, 10000, 20000], # FORCE_P
+                    [0, 200, 1000], # FORCE_I
+                    [0, 5000, 10000], # FORCE_D
+                    [100]] # FORCE_G
+FORCE_SWEEP_TARGET = 3000 # 力目标
+FORCE_SWEEP_DURATION = 2.0 # 下发力目标后的采样时长（秒），包含手指闭合到接触的时间
+FORCE_CONTACT_THRESHOLD = 0.05 # 力超过目标的该比例视为开始接触，时间指标从接触时刻算起
+FORCE_RELEASE_POS = 0 # 每轮结束后松开到的位置
+FORCE_METRICS = ('settling_time', 'overshoot', 'tracking_error')
+FORCE_RESULT_FILE = 'roh_force_sweep.json'
+
+
+def force_gain_address(gain, finger):
+    return ROH_FINGER_FORCE_P0 + gain * 10 + finger
+
+
+def force_metrics(t, force, target):
+    """
+    向量化计算力跟踪指标，force 的每一列为一个手指，时间从各手指开始接触算起。
+    :return: 各指标形状为 (k,) 的字典：接触时刻、超调量（%）、调节时间、稳态误差，
+             以及接触后的平均绝对跟踪误差，未接触的手指为 nan
+    """
+    target = np.asarray(target, dtype=np.float64)
+    touched = force >= target * FORCE_CONTACT_THRESHOLD
+    contact_index = np.argmax(touched, axis=0)
+    contact_time = np.where(touched.any(axis=0), t[contact_index], np.nan)
+    metrics = step_metrics(t, force, np.zeros_like(target), target)
+    after = np.arange(len(t))[:, None] >= contact_index
+    error = np.where(after, np.abs(force - target), 0).sum(axis=0) / np.maximum(after.sum(axis=0), 1)
+    return {'contact_time': contact_time,
+            'overshoot': metrics['overshoot'],
+            'settling_time': metrics['settling_time'] - contact_time,
+            'steady_state_error': metrics['steady_state_error'],
+            'tracking_error': np.where(touched.any(axis=0), error, np.nan)}
+
+
+class ForceSweep:
+    """
+    力控参数扫描：手指松开后写入各自的候选 FORCE_P/I/D/G，同时下发力目标，让 5 个手指压向夹具，
+    高速采样 ROH_FINGER_FORCE*，计算跟踪误差和调节时间，结果按固件版本和参数保存，可与基线对比。
+    """
+
+    def __init__(self, bus, node_id=NODE_ID, model=None, target=FORCE_SWEEP_TARGET, duration=FORCE_SWEEP_DURATION,
+                 path=FORCE_RESULT_FILE):
+        self.bus = bus
+        self.node_id = node_id
+        self.model = model if model is not None else RegisterModel()
+        self.target = target
+        self.duration = duration
+        self.path = path
+        self.suite = StepResponseSuite(bus, node_id)
+
+    def read_gains(self):
+        """
+        :return: 每个手指的 (FORCE_P, FORCE_I, FORCE_D, FORCE_G)，读取失败返回 None
+        """
+        gains = []
+        for gain in range(FORCE_GAIN_COUNT):
+            response = read_registers(bus=self.bus, start_address=force_gain_address(gain, 0),
+                                      register_count=NUM_FORCE_FINGERS, node_id=self.node_id, wait_time=0)
+            if response is None or response.isError():
+                return None
+            gains.append(response.registers)
+        return [tuple(values[finger] for values in gains) for finger in range(NUM_FORCE_FINGERS)]
+
+    def write_gains(self, gains):
+        """
+        :param gains: 每个手指的 (FORCE_P, FORCE_I, FORCE_D, FORCE_G)
+        """
+        for gain in range(FORCE_GAIN_COUNT):
+            if not write_registers(bus=self.bus, start_address=force_gain_address(gain, 0),
+                                   data=[values[gain] for values in gains], node_id=self.node_id, wait_time=0):
+                return False
+        return True
+
+    def clip(self, finger, gains):
+        clipped = []
+        for gain, value in enumerate(gains):
+            rule = self.model.rule(force_gain_address(gain, finger))
+            clipped.append(int(min(max(round(value), rule.low), rule.high)))
+        return tuple(clipped)
+
+    def release(self):
+        """
+        清零力目标并松开手指，回到位置控制。
+        """
+        write_registers(bus=self.bus, start_address=ROH_FINGER_FORCE_TARGET0, data=[0] * NUM_FORCE_FINGERS,
+                        node_id=self.node_id, wait_time=0)
+        targets = self.suite.read_targets()
+        if targets is None:
+            return False
+        targets[:NUM_FORCE_FINGERS] = [FORCE_RELEASE_POS] * NUM_FORCE_FINGERS
+        return self.suite.move_to(targets)
+
+    def run_contact(self, gains, fingers):
+        """
+        写入增益后对 fingers 同时下发力目标并采样。
+        :return: (t, force)，force 形状为 (样本数, 5)，失败返回 None
+        """
+        if not self.release() or not self.write_gains(gains):
+            return None
+        force_target = [self.target if finger in fingers else 0 for finger in range(NUM_FORCE_FINGERS)]
+        begin = time.perf_counter()
+        if not write_registers(bus=self.bus, start_address=ROH_FINGER_FORCE_TARGET0, data=force_target,
+                               node_id=self.node_id, wait_time=0):
+            return None
+        t, data = sample(self.bus, ROH_FINGER_FORCE0, NUM_FORCE_FINGERS, self.duration, node_id=self.node_id,
+                         begin=begin)
+        return t, data.astype(np.float64)
+
+    def run(self, grid=FORCE_SWEEP_GRID, fingers=range(NUM_FORCE_FINGERS)):
+        """
+        每轮给每个手指分配各自的下一组候选参数，5 个手指同时测试，结束后恢复原参数并松开。
+        :return: 结果列表，每项为一个手指一组参数的指标
+        """
+        original = self.read_gains()
+        if original is None:
+            logger.error(f'[node_id = {self.node_id}]读取力控参数失败')
+            return []
+        fingers = list(fingers)
+        candidates = {finger: [] for finger in fingers}
+        for finger in fingers:
+            for candidate in itertools.product(*grid):
+                candidate = self.clip(finger, candidate)
+                if candidate not in candidates[finger]:
+                    candidates[finger].append(candidate)
+        rounds = max((len(queue) for queue in candidates.values()), default=0)
+        begin = time.perf_counter()
+        results = []
+        try:
+            for index in range(rounds):
+                active = [finger for finger in fingers if index < len(candidates[finger])]
+                gains = [candidates[finger][index] if finger in active else original[finger]
+                         for finger in range(NUM_FORCE_FINGERS)]
+                recording = self.run_contact(gains, active)
+                if recording is None or not len(recording[0]):
+                    logger.error(f'[node_id = {self.node_id}]力控测试失败: {gains}')
+                    continue
+                t, force = recording
+                metrics = force_metrics(t, force[:, active], [self.target] * len(active))
+                for column, finger in enumerate(active):
+                    result = {'finger': finger, 'target': self.target, 'gains': gains[finger],
+                              'pid': pid_key(gains[finger]), 'samples': len(t)}
+                    result.update({name: float(value[column]) for name, value in metrics.items()})
+                    results.append(result)
+                logger.info(f'[node_id = {self.node_id}]第{index + 1}/{rounds}轮完成')
+        finally:
+            if not self.write_gains(original):
+                logger.error(f'[node_id = {self.node_id}]恢复力控参数失败: {original}')
+            self.release()
+        logger.info(f'[node_id = {self.node_id}]力控扫描完成, {len(results)}组结果, 耗时 {time.perf_counter() - begin:.1f}s')
+        return results
+
+    def best(self, results):
+        """
+        :return: {手指: 跟踪误差与调节时间的 Pareto 前沿}
+        """
+        return {finger: pareto_front([result for result in results if result['finger'] == finger],
+                                     x='tracking_error', y='settling_time')
+                for finger in sorted({result['finger'] for result in results})}
+
+    def save(self, results):
+        save_results(self.path, read_device_identity(self.bus, self.node_id), results)
+
+
+def compare_force_results(baseline, current, threshold=0.2):
+    return compare_results(baseline, current, threshold, metrics=FORCE_METRICS)
+
+
+if __name__ == "__main__":
+    # 初始化 modbus 总线
+    bus = setup_modbus()
+
+    if bus:
+        # 运行前在 5 个手指前方固定好夹具
+        sweep = ForceSweep(bus=bus)
+        results = sweep.run()
+        sweep.save(results)
+        for finger, front in sweep.best(results).items():
+            for result in front:
+                logger.info(f"手指{finger} {result['pid']}: 跟踪误差 {result['tracking_error']:.1f}, "
+                            f"调节时间 {result['settling_time']:.3f}s")
+        close_modbus(bus)
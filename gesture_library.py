@@ -0,0 +1,181 @@
+import struct
+import time
+import logging
+
+from mobus_operator import (setup_modbus, close_modbus, read_registers, write_registers, build_write_frame,
+                            compute_crc, NODE_ID, NUM_FINGERS, FC_WRITE_MULTIPLE_REGISTERS,
+                            ROH_FINGER_POS_TARGET0, ROH_FINGER_ANGLE_TARGET0, ROH_FINGER_POS0)
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+GESTURE_FILE = 'gestures.bin' # 默认手势库文件
+GESTURE_MAGIC = b'ROHG'
+GESTURE_FILE_VERSION = 1
+
+# 手势目标寄存器类型
+GESTURE_POS = 0 # 写 ROH_FINGER_POS_TARGET0~5
+GESTURE_ANGLE = 1 # 写 ROH_FINGER_ANGLE_TARGET0~5
+
+roh_gesture_kind_list = {
+        GESTURE_POS: ROH_FINGER_POS_TARGET0,
+        GESTURE_ANGLE: ROH_FINGER_ANGLE_TARGET0
+    }
+
+MOTION_START_THRESHOLD = 32 # 位置变化超过该值视为开始运动（与 FINGER_POS_TARGET_MAX_LOSS 一致）
+MOTION_START_TIMEOUT = 2 # 等待开始运动的超时时间（秒）
+
+# 默认手势（大拇指弯曲、食指、中指、无名指、小指、大拇指旋转的逻辑目标位置）
+DEFAULT_GESTURES = {
+    'open': [0, 0, 0, 0, 0, 0],
+    'fist': [65535, 65535, 65535, 65535, 65535, 0],
+    'point': [65535, 0, 65535, 65535, 65535, 0],
+    'victory': [65535, 0, 0, 65535, 65535, 0],
+}
+
+# 文件头：魔数、版本、手势数量；每条记录：名称长度、类型、设备ID、6 个目标值、帧长度，随后是名称和帧
+FILE_HEADER_FORMAT = '<4sBH'
+RECORD_FORMAT = f'<BBB{NUM_FINGERS}HB'
+
+
+class Gesture:
+    def __init__(self, name, values, kind=GESTURE_POS, node_id=NODE_ID, frame=None):
+        if len(values) != NUM_FINGERS:
+            raise ValueError(f"Invalid gesture values: {values}")
+        self.name = name
+        self.values = list(values)
+        self.kind = kind
+        self.node_id = node_id
+        self.start_address = roh_gesture_kind_list[kind]
+        self.frame = frame if frame is not None else build_write_frame(node_id, self.start_address, self.values)
+
+
+class GestureLibrary:
+    """
+    手势库：命名手势预先编译成带 CRC 的 FC16 帧，保存为紧凑的二进制文件，发送时只需一次写操作。
+    """
+
+    def __init__(self):
+        self.gestures = {}
+
+    def add(self, name, values, kind=GESTURE_POS, node_id=NODE_ID):
+        gesture = Gesture(name=name, values=values, kind=kind, node_id=node_id)
+        self.gestures[name] = gesture
+        return gesture
+
+    def get(self, name):
+        return self.gestures[name]
+
+    def save(self, path=GESTURE_FILE):
+        with open(path, 'wb') as f:
+            f.write(struct.pack(FILE_HEADER_FORMAT, GESTURE_MAGIC, GESTURE_FILE_VERSION, len(self.gestures)))
+            for gesture in self.gestures.values():
+                name = gesture.name.encode('utf-8')
+                f.write(struct.pack(RECORD_FORMAT, len(name), gesture.kind, gesture.node_id, *gesture.values,
+                                    len(gesture.frame)))
+                f.write(name)
+                f.write(gesture.frame)
+        logger.info(f'手势库已保存到{path}, 共{len(self.gestures)}个手势')
+
+    @classmethod
+    def load(cls, path=GESTURE_FILE):
+        library = cls()
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, count = struct.unpack_from(FILE_HEADER_FORMAT, data, 0)
+        if magic != GESTURE_MAGIC or version != GESTURE_FILE_VERSION:
+            raise ValueError(f'无法识别的手势库文件: {path}')
+        offset = struct.calcsize(FILE_HEADER_FORMAT)
+        for _ in range(count):
+            name_length, kind, node_id, *values, frame_length = struct.unpack_from(RECORD_FORMAT, data, offset)
+            offset += struct.calcsize(RECORD_FORMAT)
+            name = data[offset:offset + name_length].decode('utf-8')
+            offset += name_length
+            frame = data[offset:offset + frame_length]
+            offset += frame_length
+            if compute_crc(frame[:-2]) != struct.unpack_from('<H', frame, len(frame) - 2)[0]:
+                raise ValueError(f'手势{name}的帧 CRC 校验失败')
+            library.gestures[name] = Gesture(name=name, values=values, kind=kind, node_id=node_id, frame=frame)
+        return library
+
+    @classmethod
+    def default(cls):
+        library = cls()
+        for name, values in DEFAULT_GESTURES.items():
+            library.add(name, values)
+        return library
+
+    def send(self, bus, name):
+        """
+        发送手势。RtuFastTransport 直接发送预编译帧，其它总线退回 write_registers。
+        :return: 发送成功返回 True，否则返回 False
+        """
+        gesture = self.gestures[name]
+        if hasattr(bus, 'send_frame'):
+            try:
+                response = bus.send_frame(gesture.frame, FC_WRITE_MULTIPLE_REGISTERS, gesture.node_id)
+                return not response.isError()
+            except Exception as e:
+                logger.error(f'发送手势{name}异常: {e}')
+                return False
+        return write_registers(bus=bus, start_address=gesture.start_address, data=gesture.values,
+                               node_id=gesture.node_id, wait_time=0)
+
+    def measure_motion_start(self, bus, name, threshold=MOTION_START_THRESHOLD, timeout=MOTION_START_TIMEOUT):
+        """
+        发送手势并通过 ROH_FINGER_POS0~5 测量从发出指令到手指开始运动的延迟。
+        :return: 延迟（秒），超时或失败时返回 None
+        """
+        gesture = self.gestures[name]
+        return measure_motion_start(bus, lambda: self.send(bus, name), node_id=gesture.node_id,
+                                    threshold=threshold, timeout=timeout)
+
+
+def read_finger_pos(bus, node_id=NODE_ID):
+    response = read_registers(bus=bus, start_address=ROH_FINGER_POS0, register_count=NUM_FINGERS,
+                              node_id=node_id, wait_time=0)
+    if response is None or response.isError():
+        return None
+    return response.registers
+
+
+def measure_motion_start(bus, command, node_id=NODE_ID, threshold=MOTION_START_THRESHOLD, timeout=MOTION_START_TIMEOUT):
+    """
+    执行 command 并轮询位置遥测，返回任一手指位置变化超过 threshold 的时间。
+    :param command: 无参可调用对象，发送运动指令，返回是否成功
+    :return: 延迟（秒），超时或失败时返回 None
+    """
+    start_pos = read_finger_pos(bus, node_id)
+    if start_pos is None:
+        return None
+    begin = time.perf_counter()
+    if not command():
+        return None
+    while time.perf_counter() - begin < timeout:
+        pos = read_finger_pos(bus, node_id)
+        if pos is not None and any(abs(p - s) > threshold for p, s in zip(pos, start_pos)):
+            return time.perf_counter() - begin
+    logger.info(f'等待手指开始运动超时({timeout}s)')
+    return None
+
+
+if __name__ == "__main__":
+    # 初始化 modbus 总线
+    bus = setup_modbus()
+
+    if bus:
+        library = GestureLibrary.default()
+        library.save()
+        library = GestureLibrary.load()
+        for name in ('fist', 'open'):
+            latency = library.measure_motion_start(bus, name)
+            logger.info(f'手势{name}指令到开始运动的延迟: {latency}')
+            time.sleep(2)
+        close_modbus(bus)
@@ -0,0 +1,149 @@
+import json
+import os
+import logging
+
+from mobus_operator import read_registers, write_registers, NODE_ID
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+LIMITS_CACHE_FILE = 'roh_limits_cache.json' # 限位缓存文件
+ROH_FW_VERSION            = (1001) # R
+IDENTITY_REGISTER_COUNT   = 4 # ROH_FW_VERSION、ROH_FW_REVISION、ROH_HW_VERSION、ROH_BOOT_VERSION
+
+
+def read_device_identity(bus, node_id=NODE_ID):
+    """
+    读取固件版本、固件修订号、硬件版本、Boot 版本，生成缓存键。
+    :return: 形如 'hw=...,fw=...,rev=...,boot=...,node=...' 的字符串，读取失败返回 None
+    """
+    response = read_registers(bus=bus, start_address=ROH_FW_VERSION, register_count=IDENTITY_REGISTER_COUNT,
+                              node_id=node_id, wait_time=0)
+    if response is None or response.isError():
+        return None
+    fw_version, fw_revision, hw_version, boot_version = response.registers
+    return f'hw={hw_version:04X},fw={fw_version:04X},rev={fw_revision},boot={boot_version:04X},node={node_id}'
+
+
+class LimitsDiscovery:
+    """
+    寄存器限位探测：写入探测值后读回，得到设备实际钳位后的值，结果按硬件/固件/Boot 版本和设备ID持久化，
+    版本变化后自动失效重新探测。
+    """
+
+    def __init__(self, bus, node_id=NODE_ID, path=LIMITS_CACHE_FILE):
+        self.bus = bus
+        self.node_id = node_id
+        self.path = path
+        self.identity = read_device_identity(bus, node_id)
+        self.limits = {}
+        self._load()
+
+    def _load(self):
+        if self.identity is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f'读取限位缓存{self.path}失败: {e}')
+            return
+        self.limits = cache.get(self.identity, {})
+        stale = [key for key in cache if key != self.identity and key.endswith(f',node={self.node_id}')]
+        if stale:
+            logger.info(f'设备版本已变化，丢弃旧的限位缓存: {stale}')
+
+    def save(self):
+        if self.identity is None:
+            return
+        cache = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                cache = {}
+        # 同一设备ID只保留当前版本的缓存
+        cache = {key: value for key, value in cache.items() if not key.endswith(f',node={self.node_id}')}
+        cache[self.identity] = self.limits
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+
+    def probe(self, address, value):
+        """
+        写入 value 并读回，不做缓存。
+        :return: 读回的值，写入或读取失败返回 None
+        """
+        if not write_registers(bus=self.bus, start_address=address, data=value, node_id=self.node_id, wait_time=0):
+            return None
+        response = read_registers(bus=self.bus, start_address=address, register_count=1, node_id=self.node_id, wait_time=0)
+        if response is None or response.isError():
+            return None
+        return response.registers[0]
+
+    def get_limit(self, address, value):
+        """
+        获取写入 value 后设备钳位得到的值，优先使用缓存。
+        :return: 钳位后的值，探测失败返回 None
+        """
+        key = f'{address}:{value}'
+        if key in self.limits:
+            return self.limits[key]
+        result = self.probe(address, value)
+        if result is not None:
+            self.limits[key] = result
+            self.save()
+            logger.info(f'探测限位 {address} <- {value} ->{result}')
+        return result
+
+    def find_max_accepted(self, address, low, high, tolerance=0):
+        """
+        二分查找 [low, high] 内写入后原样读回（误差不超过 tolerance）的最大值，适用于范围未知的寄存器。
+        要求 low 可被接受，且接受区间连续。
+        :return: 最大可接受值，探测失败返回 None
+        """
+        key = f'{address}:max_accepted:{low}:{high}'
+        if key in self.limits:
+            return self.limits[key]
+        while low < high:
+            middle = (low + high + 1) // 2
+            result = self.probe(address, middle)
+            if result is None:
+                return None
+            if abs(result - middle) <= tolerance:
+                low = middle
+            else:
+                high = middle - 1
+        self.limits[key] = low
+        self.save()
+        logger.info(f'探测寄存器{address}最大可接受值: {low}')
+        return low
+
+    def find_min_accepted(self, address, low, high, tolerance=0):
+        """
+        二分查找 [low, high] 内写入后原样读回的最小值，要求 high 可被接受，且接受区间连续。
+        :return: 最小可接受值，探测失败返回 None
+        """
+        key = f'{address}:min_accepted:{low}:{high}'
+        if key in self.limits:
+            return self.limits[key]
+        while low < high:
+            middle = (low + high) // 2
+            result = self.probe(address, middle)
+            if result is None:
+                return None
+            if abs(result - middle) <= tolerance:
+                high = middle
+            else:
+                low = middle + 1
+        self.limits[key] = high
+        self.save()
+        logger.info(f'探测寄存器{address}最小可接受值: {high}')
+        return high
@@ -1,10 +1,29 @@
 import time
 import can
 import logging
+import os
+import random
+import struct
+import threading
+import weakref
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Future
+from queue import Full
 
 from pymodbus import FramerType
 from pymodbus.client import ModbusSerialClient
-from pymodbus.exceptions import ConnectionException
+from pymodbus.exceptions import ConnectionException, InvalidMessageReceivedException, ModbusIOException
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # Windows 下没有 fcntl，只能使用进程内锁
+
+try:
+    import serial
+except ImportError:
+    serial = None # RtuFastTransport 需要 pyserial
 
 # 设置日志级别为INFO，获取日志记录器实例
 logger = logging.getLogger(__name__)
@@ -33,7 +52,39 @@ BAUDRATE =115200
 FRAMER =FramerType.RTU
 
 WAIT_TIME = 1 # 延迟打印，方便查看
+ROH_NODE_ID               = (1005) # R/W
 ROH_SUB_EXCEPTION         = (1006) # R
+ROH_BEEP_SWITCH           = (1009) # R/W
+ROH_CALI_THUMB_POS4       = (1044) # R/W
+
+# 实时数据相关寄存器（完整定义见 modbus_pytest_v2.py）
+ROH_FINGER_STATUS0        = (1085) # R
+ROH_FINGER_CURRENT_LIMIT0 = (1095) # R/W
+ROH_FINGER_CURRENT0       = (1105) # R
+ROH_FINGER_POS_TARGET0    = (1135) # R/W
+ROH_FINGER_POS0           = (1145) # R
+ROH_FINGER_ANGLE_TARGET0  = (1155) # R/W
+ROH_FINGER_ANGLE0         = (1165) # R
+ROH_FINGER_FORCE0         = (1175) # R
+NUM_FINGERS               = 6 # 手指数量（大拇指弯曲、食指、中指、无名指、小指、大拇指旋转）
+
+# ROH_FINGER_STATUS* 手指状态
+STATUS_OPENING = 0X0  # 正在松开
+STATUS_CLOSING = 0X1  # 正在抓取
+STATUS_POS_REACHED = 0X2  # 位置到位
+STATUS_OVER_CURRENT = 0X3  # 电流超过限制
+STATUS_FORCE_REACHED = 0X4  # 力控到位
+STATUS_STUCK = 0X5  # 电机堵转
+
+roh_status_list = {
+        STATUS_OPENING: '正在松开',
+        STATUS_CLOSING: '正在抓取',
+        STATUS_POS_REACHED: '位置到位',
+        STATUS_OVER_CURRENT: '电流超过限制',
+        STATUS_FORCE_REACHED: '力控到位',
+        STATUS_STUCK: '电机堵转'
+    }
+
 # ROH 灵巧手错误代码
 EC01_ILLEGAL_FUNCTION = 0X1  # 无效的功能码
 EC02_ILLEGAL_DATA_ADDRESS = 0X2  # 无效的数据地址
@@ -67,7 +118,102 @@ roh_sub_exception_list = {
     }
     
 
-def get_exception(bus,response):
+SUB_EXCEPTION_CACHE_TTL = 0.05 # 子错误码缓存有效期（秒），同一批失败的事务共用一次查询
+SPIN_TIME = 0.002 # wait_until 在截止时刻前最后这段时间忙等，避免 sleep 的调度误差（秒）
+
+# 子错误码缓存 {(总线, 设备ID): (查询时间, 子错误码)}
+_sub_exception_cache = {}
+_sub_exception_lock = threading.Lock()
+_last_error = threading.local()
+
+
+class RohDeviceError(Exception):
+    """
+    结构化的设备异常响应。
+
+    属性：
+    function_code：出错请求的功能码。
+    exception_code：Modbus 异常码（EC01~EC04）。
+    sub_exception_code：EC04 时从 ROH_SUB_EXCEPTION 读出的具体错误代码，查询失败为 None。
+    start_address：出错请求的起始地址。
+    node_id：设备ID。
+    """
+
+    def __init__(self, function_code, exception_code, sub_exception_code=None, start_address=None, node_id=NODE_ID):
+        self.function_code = function_code
+        self.exception_code = exception_code
+        self.sub_exception_code = sub_exception_code
+        self.start_address = start_address
+        self.node_id = node_id
+        super().__init__(self.describe())
+
+    def describe(self):
+        """
+        返回错误类型的描述字符串（与原 get_exception 的格式一致）。
+        """
+        if self.exception_code > EC04_SERVER_DEVICE_FAILURE:
+            return roh_exception_list.get(UNKNOWN_FAILURE)
+        if self.exception_code == EC04_SERVER_DEVICE_FAILURE:
+            reason = roh_sub_exception_list.get(self.sub_exception_code, f'未知({self.sub_exception_code})')
+            return '设备故障，具体原因为' + reason
+        return roh_exception_list.get(self.exception_code)
+
+    def __repr__(self):
+        return (f'RohDeviceError(function_code={self.function_code}, exception_code={self.exception_code}, '
+                f'sub_exception_code={self.sub_exception_code}, start_address={self.start_address}, node_id={self.node_id})')
+
+
+def _fetch_sub_exception(bus, node_id):
+    """
+    读取 ROH_SUB_EXCEPTION，不做节拍延迟，也不走 read_registers 的错误处理，避免递归。
+    短时间内同一设备的多次失败共用一次查询结果。
+    """
+    key = (id(bus), node_id)
+    with _sub_exception_lock:
+        cached = _sub_exception_cache.get(key)
+        if cached is not None and time.perf_counter() - cached[0] < SUB_EXCEPTION_CACHE_TTL:
+            return cached[1]
+    sub_exception_code = None
+    try:
+        with bus_transaction(bus):
+            response = bus.read_holding_registers(address=ROH_SUB_EXCEPTION, count=1, slave=node_id)
+        if not response.isError():
+            sub_exception_code = response.registers[0]
+    except Exception as e:
+        logger.error(f'读取子错误码异常: {e}')
+    with _sub_exception_lock:
+        _sub_exception_cache[key] = (time.perf_counter(), sub_exception_code)
+    return sub_exception_code
+
+
+def _clear_sub_exception(bus, node_id):
+    # 事务成功后设备的子错误码可能已变化，丢弃缓存
+    if _sub_exception_cache:
+        with _sub_exception_lock:
+            _sub_exception_cache.pop((id(bus), node_id), None)
+
+
+def decode_exception(bus, response, start_address=None, node_id=NODE_ID):
+    """
+    将异常响应解析为 RohDeviceError，EC04 时立即查询子错误码。
+    """
+    error = RohDeviceError(function_code=response.function_code & 0x7F, exception_code=response.exception_code,
+                           start_address=start_address, node_id=node_id)
+    if response.exception_code == EC04_SERVER_DEVICE_FAILURE:
+        error.sub_exception_code = _fetch_sub_exception(bus, node_id)
+        error.args = (error.describe(),)
+    _last_error.error = error
+    return error
+
+
+def get_last_error():
+    """
+    返回当前线程最近一次 read_registers/write_registers 失败的 RohDeviceError，没有则为 None。
+    """
+    return getattr(_last_error, 'error', None)
+
+
+def get_exception(bus,response,node_id=NODE_ID):
     """
     根据传入的响应确定错误类型。
 
@@ -77,28 +223,26 @@ def get_exception(bus,response):
     返回：
     错误类型的描述字符串。
     """
-    strException = ''
-    if response.exception_code > EC04_SERVER_DEVICE_FAILURE:
-        strException = roh_exception_list.get(UNKNOWN_FAILURE)
-    elif response.exception_code == EC04_SERVER_DEVICE_FAILURE:
-        response2 = read_registers(bus=bus, start_address=ROH_SUB_EXCEPTION, register_count=1)
-        strException = '设备故障，具体原因为'+roh_sub_exception_list.get(response2.registers[0])
-    else:
-        strException = roh_exception_list.get(response.exception_code)
-        
-    return strException
-
-def setup_modbus():
+    return decode_exception(bus=bus, response=response, node_id=node_id).describe()
+
+def setup_modbus(port=PORT, node_id=NODE_ID, probe=False):
+    """
+    :param probe: 连接后探测 node_id 支持的写功能码（会读出并写回 ROH_BEEP_SWITCH），结果按 (串口, 设备ID) 缓存，
+                  同一串口重新连接后不再探测；从未探测过的设备只用 FC16
+    """
     try:
-        bus = ModbusSerialClient(port=PORT, framer=FRAMER, baudrate=BAUDRATE)
+        # 重试由 RetryPolicy 负责，关闭 pymodbus 自带的重试，避免每个丢失的帧都阻塞数秒
+        bus = ModbusSerialClient(port=port, framer=FRAMER, baudrate=BAUDRATE, retries=0)
         # logger.info(f'setup_modbus = {bus},bus.connect()={bus.connect()}')
         if not bus.connect():
-            logger.error(f"[port = {PORT}]Could not connect to Modbus device.")
+            logger.error(f"[port = {port}]Could not connect to Modbus device.")
             return None
-        logger.info(f"[port = {PORT}]Successfully connected to Modbus device.")
+        logger.info(f"[port = {port}]Successfully connected to Modbus device.")
+        if probe:
+            probe_function_codes(bus, node_id)
         return bus
     except ConnectionException as e:
-        logger.error(f"[port = {PORT}]Error during connection: {e}")
+        logger.error(f"[port = {port}]Error during connection: {e}")
         return None
 
 def close_modbus(bus):
@@ -114,38 +258,624 @@ def close_modbus(bus):
             logger.error(f"\nError closing modbus connection: {e}\n")
 
 
-def read_registers(bus, start_address, register_count=1,node_id =NODE_ID):
+# 每个串口一把进程内可重入锁，同一串口的所有 BusHandle 共享
+_port_locks = {}
+_port_locks_guard = threading.Lock()
+
+def _get_port_lock(port):
+    with _port_locks_guard:
+        if port not in _port_locks:
+            _port_locks[port] = threading.RLock()
+        return _port_locks[port]
+
+
+class BusHandle:
+    """
+    线程安全的总线句柄：包装 ModbusSerialClient，以整个事务（含 get_exception 中嵌套读取
+    ROH_SUB_EXCEPTION）为单位串行访问半双工总线，并在 POSIX 系统上对串口设备加 fcntl 咨询锁，
+    防止其它进程同时打开同一串口。未包装的方法和属性直接转发给底层客户端。
+    """
+
+    def __init__(self, client, port=PORT):
+        self.client = client
+        self.port = port
+        self.lock = _get_port_lock(port)
+        self._lock_fd = None
+        self._local = threading.local()
+        self.lock_stats = {
+            'transactions': 0,
+            'contended': 0,
+            'wait_total': 0.0,
+            'wait_max': 0.0,
+            'hold_total': 0.0,
+            'flock_time': 0.0,
+        }
+
+    def acquire_port(self):
+        """
+        获取串口的进程间咨询锁。
+        :return: 获取成功或当前平台不支持 fcntl 时返回 True，被其它进程占用时返回 False
+        """
+        if fcntl is None:
+            return True
+        begin = time.perf_counter()
+        try:
+            self._lock_fd = os.open(self.port, os.O_RDONLY | os.O_NONBLOCK | os.O_NOCTTY)
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.error(f"[port = {self.port}]串口已被其它进程占用")
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            return False
+        except OSError as e:
+            logger.error(f"[port = {self.port}]串口加锁失败: {e}")
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+            return False
+        finally:
+            self.lock_stats['flock_time'] = time.perf_counter() - begin
+        return True
+
+    def release_port(self):
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    @contextmanager
+    def transaction(self):
+        """
+        独占总线执行一个完整事务，可重入（嵌套事务不重复统计）。
+        """
+        if getattr(self._local, 'depth', 0):
+            self._local.depth += 1
+            try:
+                yield self.client
+            finally:
+                self._local.depth -= 1
+            return
+        begin = time.perf_counter()
+        contended = not self.lock.acquire(blocking=False)
+        if contended:
+            self.lock.acquire()
+        acquired = time.perf_counter()
+        self._local.depth = 1
+        try:
+            yield self.client
+        finally:
+            self._local.depth = 0
+            # 统计在释放锁之前更新，避免多线程同时修改计数
+            wait = acquired - begin
+            self.lock_stats['transactions'] += 1
+            self.lock_stats['contended'] += int(contended)
+            self.lock_stats['wait_total'] += wait
+            self.lock_stats['wait_max'] = max(self.lock_stats['wait_max'], wait)
+            self.lock_stats['hold_total'] += time.perf_counter() - acquired
+            self.lock.release()
+
+    def get_lock_stats(self):
+        """
+        :return: 锁开销统计（事务数、发生争用的次数、平均/最大等待时间、平均持有时间、fcntl 加锁耗时，单位秒）
+        """
+        stats = dict(self.lock_stats)
+        count = max(stats['transactions'], 1)
+        stats['wait_mean'] = stats['wait_total'] / count
+        stats['hold_mean'] = stats['hold_total'] / count
+        return stats
+
+    def read_holding_registers(self, *args, **kwargs):
+        with self.transaction() as client:
+            return client.read_holding_registers(*args, **kwargs)
+
+    def write_register(self, *args, **kwargs):
+        with self.transaction() as client:
+            return client.write_register(*args, **kwargs)
+
+    def write_registers(self, *args, **kwargs):
+        with self.transaction() as client:
+            return client.write_registers(*args, **kwargs)
+
+    def close(self):
+        with self.lock:
+            self.client.close()
+        self.release_port()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def open_bus_handle(port=PORT, node_id=NODE_ID, probe=False):
+    """
+    加进程间锁后连接串口，返回 BusHandle，可直接传给 read_registers/write_registers。
+    """
+    handle = BusHandle(client=None, port=port)
+    if not handle.acquire_port():
+        return None
+    client = setup_modbus(port=port, node_id=node_id, probe=probe)
+    if client is None:
+        handle.release_port()
+        return None
+    handle.client = client
+    return handle
+
+
+def bus_transaction(bus):
+    """
+    一次完整请求-响应期间独占总线：BusHandle 返回其事务上下文（线程锁与进程间锁），其它总线对象不加锁。
+    """
+    if isinstance(bus, BusHandle):
+        return bus.transaction()
+    return nullcontext(bus)
+
+
+def wait_until(deadline):
+    """
+    等待到 time.perf_counter() 的 deadline：先 sleep 到 deadline 前 SPIN_TIME，最后这段时间忙等。
+    """
+    delay = deadline - SPIN_TIME - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+    while time.perf_counter() < deadline:
+        pass
+
+
+# 失败类型
+FAILURE_TIMEOUT = 0X1  # 超时无响应
+FAILURE_CRC = 0X2  # CRC 校验或帧格式错误
+FAILURE_EXCEPTION_RESPONSE = 0X3  # 设备返回异常响应
+FAILURE_DISCONNECT = 0X4  # 串口断开
+
+roh_failure_list = {
+        FAILURE_TIMEOUT: '超时无响应',
+        FAILURE_CRC: 'CRC校验或帧格式错误',
+        FAILURE_EXCEPTION_RESPONSE: '设备返回异常响应',
+        FAILURE_DISCONNECT: '串口断开'
+    }
+
+# 功能码
+FC_READ_HOLDING_REGISTERS = 0x03
+FC_WRITE_SINGLE_REGISTER = 0x06
+FC_WRITE_MULTIPLE_REGISTERS = 0x10
+FC_READ_WRITE_REGISTERS = 0x17 # FC23，写入后读回
+
+RETRY_MAX = 3 # 瞬时故障的最大重试次数
+RETRY_BACKOFF_BASE = 0.005 # 退避基准时间（秒）
+RETRY_BACKOFF_MAX = 0.1 # 单次退避上限（秒）
+RTT_WINDOW = 256 # 每个功能码保留的往返时间样本数
+RTT_MIN_SAMPLES = 20 # 样本数不足时保持传输层已配置的超时
+RTT_TIMEOUT_FACTOR = 3 # 超时 = p99 往返时间 * 系数 + 余量
+RTT_TIMEOUT_MARGIN = 0.01 # 秒
+DEFAULT_TIMEOUT = 1.0 # 秒
+MIN_TIMEOUT = 0.02 # 秒
+MAX_TIMEOUT = 1.0 # 秒
+RTU_BITS_PER_BYTE = 10 # 8N1：起始位 + 8 数据位 + 停止位
+RTU_FRAME_GAP = 3.5 # 帧间隔（字符数），请求和响应各一个
+
+# 超时后无法确认设备是否已经执行的写入不重试：设备ID、自检级别、蜂鸣器等保存到 flash 的配置，
+# ROH_RECALIBRATE、ROH_START_INIT、ROH_RESET、ROH_POWER_OFF 命令，以及校准数据
+NO_RETRY_REGISTERS = frozenset(range(ROH_NODE_ID, ROH_CALI_THUMB_POS4 + 1))
+
+
+def classify_failure(failure):
+    """
+    对失败进行分类。
+    :param failure: 异常对象或 isError() 为真的响应对象
+    :return: FAILURE_* 之一
+    """
+    if isinstance(failure, ConnectionException):
+        return FAILURE_DISCONNECT
+    if isinstance(failure, InvalidMessageReceivedException):
+        return FAILURE_CRC
+    if isinstance(failure, ModbusIOException):
+        return FAILURE_TIMEOUT
+    if getattr(failure, 'exception_code', None) is not None:
+        return FAILURE_EXCEPTION_RESPONSE
+    return FAILURE_DISCONNECT
+
+
+def _frame_bytes(function_code, register_count):
+    """
+    :return: RTU 请求帧与正常响应帧的总字节数
+    """
+    if function_code == FC_READ_HOLDING_REGISTERS:
+        return 8 + 5 + register_count * 2
+    if function_code == FC_WRITE_MULTIPLE_REGISTERS:
+        return 9 + register_count * 2 + 8
+    if function_code == FC_READ_WRITE_REGISTERS:
+        return 13 + register_count * 2 + 5 + register_count * 2
+    return 8 + 8
+
+
+def get_bus_baudrate(bus):
+    """
+    :return: 传输层配置的波特率，无法获取时返回 BAUDRATE
+    """
+    client = bus.client if isinstance(bus, BusHandle) else bus
+    comm_params = getattr(client, 'comm_params', None)
+    baudrate = getattr(comm_params, 'baudrate', None) or getattr(client, 'baudrate', None)
+    return baudrate or BAUDRATE
+
+
+def frame_time(bus, function_code, register_count=1):
+    """
+    :return: 按波特率计算的一次请求-响应在线路上的传输时间（秒），不含设备处理时间
+    """
+    characters = _frame_bytes(function_code, register_count) + 2 * RTU_FRAME_GAP
+    return characters * RTU_BITS_PER_BYTE / get_bus_baudrate(bus)
+
+
+class RetryPolicy:
+    """
+    重试策略：只重试超时、CRC 错误和断线等瞬时故障，采用带抖动的指数退避；
+    设备异常响应默认不重试，但计入统计。默认只重试读取，写入在超时后可能已经生效，
+    retry_writes=True 时才重试，且 NO_RETRY_REGISTERS 中的配置和命令寄存器始终不重试。
+    超时时间 = (p99 设备开销 + 本帧线路传输时间) * 系数 + 余量，设备开销为往返时间减去按波特率计算的传输时间，
+    因此同一功能码的短帧样本不会把长帧的超时压得过低；超时的尝试也计入样本，超时会随之增大。
+    样本不足 RTT_MIN_SAMPLES 时不修改传输层（如 RtuFastTransport）自己配置的超时。
+    同一个策略对象可被多个线程共用。
+    """
+
+    def __init__(self, max_retries=RETRY_MAX, backoff_base=RETRY_BACKOFF_BASE, backoff_max=RETRY_BACKOFF_MAX,
+                 retry_on=(FAILURE_TIMEOUT, FAILURE_CRC, FAILURE_DISCONNECT), retry_writes=False):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_on = set(retry_on)
+        self.retry_writes = retry_writes
+        self._rtt = weakref.WeakKeyDictionary() # 总线 -> {功能码: 设备开销样本}，总线释放后自动清除
+        self._lock = threading.Lock()
+        self.stats = {failure: 0 for failure in roh_failure_list}
+        self.stats['retries'] = 0
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _record_rtt(self, bus, function_code, elapsed):
+        with self._lock:
+            self._rtt.setdefault(bus, {}).setdefault(function_code, deque(maxlen=RTT_WINDOW)).append(elapsed)
+
+    def rtt_p99(self, bus, function_code):
+        """
+        :return: 往返时间中扣除线路传输时间后的设备开销 p99（秒），样本不足时返回 None
+        """
+        with self._lock:
+            samples = sorted(self._rtt.get(bus, {}).get(function_code, ()))
+        if len(samples) < RTT_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+    def timeout_for(self, bus, function_code, register_count=1):
+        """
+        :return: 按设备开销和本帧传输时间计算的超时（秒），样本不足时返回 None，表示沿用传输层的超时
+        """
+        p99 = self.rtt_p99(bus, function_code)
+        if p99 is None:
+            return None
+        timeout = (p99 + frame_time(bus, function_code, register_count)) * RTT_TIMEOUT_FACTOR + RTT_TIMEOUT_MARGIN
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, timeout))
+
+    def retryable(self, function_code, start_address=None, register_count=1):
+        """
+        读取总是可以重试；写入只在 retry_writes=True 且不涉及 NO_RETRY_REGISTERS 时重试。
+        """
+        if function_code == FC_READ_HOLDING_REGISTERS:
+            return True
+        if not self.retry_writes or start_address is None:
+            return False
+        return NO_RETRY_REGISTERS.isdisjoint(range(start_address, start_address + register_count))
+
+    def execute(self, bus, function_code, request, start_address=None, register_count=1):
+        """
+        执行一次请求，必要时重试。
+        :param request: 无参可调用对象，返回 pymodbus 响应
+        :param start_address: 起始地址，写入时用于判断是否允许重试
+        :param register_count: 读取或写入的寄存器数量，用于按帧长计算超时
+        :return: 成功响应或设备异常响应
+        :raises: 重试耗尽后抛出最后一次的异常
+        """
+        attempt = 0
+        retryable = self.retryable(function_code, start_address, register_count)
+        wire_time = frame_time(bus, function_code, register_count)
+        while True:
+            timeout = self.timeout_for(bus, function_code, register_count)
+            if timeout is not None:
+                set_bus_timeout(bus, timeout)
+            begin = time.perf_counter()
+            try:
+                response = request()
+                if isinstance(response, ModbusIOException):
+                    raise response
+                if not response.isError():
+                    self._record_rtt(bus, function_code, max(time.perf_counter() - begin - wire_time, 0.0))
+                    return response
+                # 设备异常响应以返回值而不是异常的形式出现
+                failure = classify_failure(response)
+                self._count(failure)
+                if failure not in self.retry_on or attempt >= self.max_retries or not retryable:
+                    return response
+                logger.info(f'{roh_failure_list.get(failure)}，第{attempt + 1}次重试: {response}')
+            except Exception as e:
+                failure = classify_failure(e)
+                self._count(failure)
+                if failure == FAILURE_TIMEOUT:
+                    # 超时的尝试至少用掉了当前的超时，计入样本，持续偏慢时超时随之增大
+                    self._record_rtt(bus, function_code, max(time.perf_counter() - begin - wire_time, 0.0))
+                if failure not in self.retry_on or attempt >= self.max_retries or not retryable:
+                    raise
+                logger.info(f'{roh_failure_list.get(failure)}，第{attempt + 1}次重试: {e}')
+                if failure == FAILURE_DISCONNECT:
+                    try:
+                        bus.connect()
+                    except Exception:
+                        pass
+            time.sleep(self.backoff(attempt))
+            attempt += 1
+            self._count('retries')
+
+
+def get_bus_timeout(bus):
+    """
+    :return: 传输层当前的响应超时（秒），无法获取时返回 None
+    """
+    client = bus.client if isinstance(bus, BusHandle) else bus
+    serial_port = getattr(client, 'socket', None)
+    if serial_port is not None and hasattr(serial_port, 'timeout'):
+        return serial_port.timeout
+    comm_params = getattr(client, 'comm_params', None)
+    if comm_params is not None:
+        return comm_params.timeout_connect
+    return getattr(client, 'timeout', None)
+
+
+def set_bus_timeout(bus, timeout):
+    """
+    设置传输层的响应超时，值未变化时不重新配置串口。
+    """
+    client = bus.client if isinstance(bus, BusHandle) else bus
+    comm_params = getattr(client, 'comm_params', None)
+    if comm_params is not None and comm_params.timeout_connect != timeout:
+        comm_params.timeout_connect = timeout
+    serial_port = getattr(client, 'socket', None)
+    if serial_port is not None and hasattr(serial_port, 'timeout') and serial_port.timeout != timeout:
+        try:
+            serial_port.timeout = timeout
+        except Exception:
+            pass
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+FC_PROBE_ADDRESS = ROH_BEEP_SWITCH # 探测功能码时读出后原值写回，不改变设备状态
+
+# 每条总线上各设备支持的写功能码 {总线: {设备ID: {FC06: bool, FC23: bool}}}，总线释放后自动清除
+_function_code_support = weakref.WeakKeyDictionary()
+# 按 (串口, 设备ID) 缓存的探测结果，同一进程内重新连接同一串口时复用，不再发送探测帧
+_port_function_code_support = {}
+_function_code_stats = {}
+_function_code_lock = threading.Lock()
+
+
+def _record_function_code(function_code, elapsed):
+    with _function_code_lock:
+        stats = _function_code_stats.setdefault(function_code, {'count': 0, 'total': 0.0, 'max': 0.0})
+        stats['count'] += 1
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+
+
+def get_function_code_stats():
+    """
+    :return: 各写功能码的使用次数及平均、最大事务耗时（秒），用于在真机上确认 FC06 的延迟收益
+    """
+    with _function_code_lock:
+        return {function_code: dict(stats, mean=stats['total'] / stats['count'])
+                for function_code, stats in _function_code_stats.items()}
+
+
+def _support_key(bus):
+    # BusHandle 与其内部客户端共用探测结果
+    return bus.client if isinstance(bus, BusHandle) else bus
+
+
+def _bus_port(bus):
+    """
+    :return: 总线对应的串口名，无法获取时返回 None（此时探测结果只按总线对象缓存）
+    """
+    client = _support_key(bus)
+    comm_params = getattr(client, 'comm_params', None)
+    return getattr(comm_params, 'port', None) or getattr(client, 'port', None)
+
+
+def _cached_support(bus, node_id):
+    # 调用方需持有 _function_code_lock
+    key = _support_key(bus)
+    support = _function_code_support.get(key, {}).get(node_id)
+    if support is None:
+        port = _bus_port(bus)
+        support = _port_function_code_support.get((port, node_id)) if port is not None else None
+        if support is not None:
+            _function_code_support.setdefault(key, {})[node_id] = support
+    return support
+
+
+def function_code_supported(bus, function_code, node_id=NODE_ID):
+    """
+    查询已缓存的探测结果，不发送任何帧；未探测过的设备返回 False（退回 FC16）。
+    """
+    with _function_code_lock:
+        support = _cached_support(bus, node_id)
+    return bool(support and support[function_code])
+
+
+def probe_function_codes(bus, node_id=NODE_ID, force=False):
+    """
+    探测固件是否接受 FC06 和 FC23，每个串口上的每个设备只探测一次。
+    探测时读出 ROH_BEEP_SWITCH 后用对应功能码写回原值，因此需要在会话开始时显式调用
+    （或 setup_modbus(probe=True)），读写函数本身只查询缓存，不会在计时的事务中触发探测。
+    :return: {FC_WRITE_SINGLE_REGISTER: bool, FC_READ_WRITE_REGISTERS: bool}
+    """
+    key = _support_key(bus)
+    with _function_code_lock:
+        cached = _cached_support(bus, node_id)
+    if not force and cached is not None:
+        return cached
+    support = {FC_WRITE_SINGLE_REGISTER: False, FC_READ_WRITE_REGISTERS: False}
+    try:
+        with bus_transaction(bus):
+            response = bus.read_holding_registers(address=FC_PROBE_ADDRESS, count=1, slave=node_id)
+            if not response.isError():
+                value = response.registers[0]
+                if hasattr(bus, 'write_register'):
+                    response = bus.write_register(address=FC_PROBE_ADDRESS, value=value, slave=node_id)
+                    support[FC_WRITE_SINGLE_REGISTER] = not response.isError()
+                if hasattr(bus, 'readwrite_registers'):
+                    response = bus.readwrite_registers(read_address=FC_PROBE_ADDRESS, read_count=1,
+                                                       write_address=FC_PROBE_ADDRESS, values=[value], slave=node_id)
+                    support[FC_READ_WRITE_REGISTERS] = not response.isError() and response.registers[0] == value
+    except Exception as e:
+        logger.error(f'探测功能码异常: {e}')
+    with _function_code_lock:
+        _function_code_support.setdefault(key, {})[node_id] = support
+        port = _bus_port(bus)
+        if port is not None:
+            _port_function_code_support[(port, node_id)] = support
+    logger.info(f'[node_id = {node_id}]功能码支持情况: FC06={support[FC_WRITE_SINGLE_REGISTER]}, FC23={support[FC_READ_WRITE_REGISTERS]}')
+    return support
+
+
+def _single_value(data):
+    if isinstance(data, int):
+        return data
+    if len(data) == 1:
+        return data[0]
+    return None
+
+
+def _write_request(bus, start_address, data, node_id):
+    """
+    选择帧最短的写功能码：单个值用 FC06（已探测到固件支持时），多个值用 FC16。
+    :return: (功能码, 无参请求函数)
+    """
+    value = _single_value(data)
+    if value is not None and function_code_supported(bus, FC_WRITE_SINGLE_REGISTER, node_id):
+        return FC_WRITE_SINGLE_REGISTER, lambda: bus.write_register(address=start_address, value=value, slave=node_id)
+    values = [value] if value is not None else data
+    return FC_WRITE_MULTIPLE_REGISTERS, lambda: bus.write_registers(address=start_address, values=values, slave=node_id)
+
+
+def read_registers(bus, start_address, register_count=1,node_id =NODE_ID,wait_time=WAIT_TIME,retry_policy=DEFAULT_RETRY_POLICY):
+    """
+    读取保持寄存器。
+    :param wait_time: 读取成功后的延迟时间（秒），轮询场景可传 0 关闭延迟。
+    :param retry_policy: 重试策略，传 None 时不重试。
+    :return: 响应对象，异常响应的 roh_error 属性为解析后的 RohDeviceError，通讯异常时返回 None
+    """
     response = None
     try:
-        response = bus.read_holding_registers(address=start_address, count=register_count, slave=node_id)
-        if response.isError():
-            error_type = get_exception(bus=bus,response=response)
-            logger.error(f'[读寄存器失败: {error_type}\n')
-        time.sleep(WAIT_TIME)
+        with bus_transaction(bus):
+            request = lambda: bus.read_holding_registers(address=start_address, count=register_count, slave=node_id)
+            if retry_policy is not None:
+                response = retry_policy.execute(bus, FC_READ_HOLDING_REGISTERS, request, start_address, register_count)
+            else:
+                response = request()
+            if response.isError():
+                response.roh_error = decode_exception(bus=bus, response=response, start_address=start_address, node_id=node_id)
+                logger.error(f'[读寄存器失败: {response.roh_error}\n')
+                return response
+        _clear_sub_exception(bus, node_id)
+        if wait_time:
+            time.sleep(wait_time)
     except Exception as e:
         logger.error(f'异常: {e}')
     return response
 
 
-def write_registers(bus, start_address, data,node_id =NODE_ID):
+def write_registers(bus, start_address, data,node_id =NODE_ID,wait_time=WAIT_TIME,retry_policy=DEFAULT_RETRY_POLICY):
     """
-    向指定的寄存器地址写入数据。
+    向指定的寄存器地址写入数据，单个值自动使用 FC06，多个值使用 FC16。
     :param address: 要写入的寄存器地址。
     :param value: 要写入的值。
-    :return: 如果写入成功则返回True，否则返回False。
+    :param wait_time: 写入成功后的延迟时间（秒），实时控制场景可传 0 关闭延迟。
+    :param retry_policy: 重试策略，传 None 时不重试。
+    :return: 如果写入成功则返回True，否则返回False，失败原因可通过 get_last_error() 获取。
     """
     try:
-        response = bus.write_registers(address=start_address, values=data, slave=node_id)
-        if not response.isError():
-            time.sleep(WAIT_TIME)
-            return True
-        else:
-            error_type = get_exception(bus=bus,response=response)
-            logger.error(f'写寄存器失败: {error_type}\n')
-            return False
+        with bus_transaction(bus):
+            function_code, request = _write_request(bus, start_address, data, node_id)
+            begin = time.perf_counter()
+            if retry_policy is not None:
+                register_count = 1 if isinstance(data, int) else len(data)
+                response = retry_policy.execute(bus, function_code, request, start_address, register_count)
+            else:
+                response = request()
+            _record_function_code(function_code, time.perf_counter() - begin)
+            if response.isError():
+                error = decode_exception(bus=bus, response=response, start_address=start_address, node_id=node_id)
+                logger.error(f'写寄存器失败: {error}\n')
+                return False
+        _clear_sub_exception(bus, node_id)
+        if wait_time:
+            time.sleep(wait_time)
+        return True
     except Exception as e:
             logger.error(f'异常: {e}')
             return False
+
+
+def write_read_registers(bus, start_address, data, node_id=NODE_ID, retry_policy=DEFAULT_RETRY_POLICY):
+    """
+    写入后立即读回同一段寄存器。固件支持 FC23 时一帧完成，否则退回写 + 读两帧。
+    :return: 读回的寄存器值列表，失败返回 None，失败原因可通过 get_last_error() 获取。
+    """
+    values = [data] if isinstance(data, int) else list(data)
+    if not function_code_supported(bus, FC_READ_WRITE_REGISTERS, node_id):
+        if not write_registers(bus=bus, start_address=start_address, data=values, node_id=node_id,
+                               wait_time=0, retry_policy=retry_policy):
+            return None
+        response = read_registers(bus=bus, start_address=start_address, register_count=len(values),
+                                  node_id=node_id, wait_time=0, retry_policy=retry_policy)
+        return None if response is None or response.isError() else response.registers
+    try:
+        with bus_transaction(bus):
+            request = lambda: bus.readwrite_registers(read_address=start_address, read_count=len(values),
+                                                      write_address=start_address, values=values, slave=node_id)
+            begin = time.perf_counter()
+            if retry_policy is not None:
+                response = retry_policy.execute(bus, FC_READ_WRITE_REGISTERS, request, start_address, len(values))
+            else:
+                response = request()
+            _record_function_code(FC_READ_WRITE_REGISTERS, time.perf_counter() - begin)
+            if response.isError():
+                error = decode_exception(bus=bus, response=response, start_address=start_address, node_id=node_id)
+                logger.error(f'写读寄存器失败: {error}\n')
+                return None
+        _clear_sub_exception(bus, node_id)
+        return response.registers
+    except Exception as e:
+        logger.error(f'异常: {e}')
+        return None
+
+
+def write_verify_fingers(bus, start_address, value, node_id=NODE_ID, finger_count=NUM_FINGERS, wait_time=WAIT_TIME):
+    """
+    跨手指批量校验：把同一个值用一帧 FC16 写入 finger_count 个连续寄存器（每个手指一个），再用一帧 FC03 读回。
+    :return: 读回的寄存器值列表（按手指顺序），写入或读取失败返回 None
+    """
+    if not write_registers(bus=bus, start_address=start_address, data=[value] * finger_count,
+                           node_id=node_id, wait_time=wait_time):
+        return None
+    response = read_registers(bus=bus, start_address=start_address, register_count=finger_count,
+                              node_id=node_id, wait_time=0)
+    if response is None or response.isError():
+        return None
+    return response.registers
+
     
 def get_version(response):
     try:
@@ -172,6 +902,636 @@ def get_version(response):
             return "无法识别的响应类型"
     except Exception as e:
         return f"获取版本号时出现错误：{e}"
+
+
+# 事务调度优先级，数值越小越优先
+PRIORITY_SAFETY = 0 # 安全类：急停、复位等
+PRIORITY_CONTROL = 1 # 控制类：ROH_FINGER_POS_TARGET* 等运动指令
+PRIORITY_TELEMETRY = 2 # 遥测类：位置、力量、触觉数据轮询
+PRIORITY_DIAGNOSTICS = 3 # 诊断类：版本号、参数读取等
+
+roh_priority_list = {
+        PRIORITY_SAFETY: 'safety',
+        PRIORITY_CONTROL: 'control',
+        PRIORITY_TELEMETRY: 'telemetry',
+        PRIORITY_DIAGNOSTICS: 'diagnostics'
+    }
+
+SCHEDULER_QUEUE_SIZE = 64 # 每个优先级队列的最大长度
+SCHEDULER_CHUNK_SIZE = 32 # 长读取拆分成多帧，帧与帧之间允许高优先级事务插队
+LATENCY_WINDOW = 1000 # 延迟统计的滑动窗口大小
+
+
+class _Transaction:
+    def __init__(self, kind, start_address, node_id, register_count=0, data=None):
+        self.kind = kind
+        self.start_address = start_address
+        self.node_id = node_id
+        self.register_count = register_count
+        self.data = data
+        self.registers = [] # 读事务已读到的寄存器值（拆帧读取时逐帧追加）
+        self.future = Future()
+        self.enqueue_time = time.perf_counter()
+        self.start_time = None
+
+
+class _SchedulerBase:
+    """
+    调度器的公共部分：有界队列的提交、读写事务的创建、调度线程的启停。
+    子类实现 _queue_for()、_drain() 和 run_forever()。
+    """
+
+    thread_name = 'roh-scheduler'
+
+    def __init__(self, bus, queue_size=SCHEDULER_QUEUE_SIZE):
+        self.bus = bus
+        self.queue_size = queue_size
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _queue_for(self, transaction, priority):
+        """
+        :return: 事务应加入的队列。调用时需持有 self._condition。
+        """
+        raise NotImplementedError
+
+    def _rejected(self, transaction, priority):
+        """
+        队列已满、事务被拒绝时调用。调用时需持有 self._condition。
+        """
+
+    def _drain(self):
+        """
+        清空所有队列并取出进行中的事务。调用时需持有 self._condition。
+        :return: 未完成的事务列表
+        """
+        raise NotImplementedError
+
+    def submit(self, transaction, priority, block=True, timeout=None):
+        """
+        :return: concurrent.futures.Future，读事务结果为寄存器值列表（失败为 None），写事务结果为 True/False
+        :raises queue.Full: 队列已满且未在 timeout 内腾出空间
+        :raises RuntimeError: 调度器已停止
+        """
+        if priority not in roh_priority_list:
+            raise ValueError(f"Invalid priority value: {priority}")
+        with self._condition:
+            if self._stop_event.is_set():
+                raise RuntimeError('调度器已停止')
+            queue = self._queue_for(transaction, priority)
+            if len(queue) >= self.queue_size:
+                if not block or not self._condition.wait_for(
+                        lambda: self._stop_event.is_set() or len(queue) < self.queue_size, timeout):
+                    self._rejected(transaction, priority)
+                    raise Full(f'[node_id = {transaction.node_id}]{roh_priority_list.get(priority)} 队列已满')
+                if self._stop_event.is_set():
+                    raise RuntimeError('调度器已停止')
+            queue.append(transaction)
+            self._condition.notify_all()
+        return transaction.future
+
+    def read(self, start_address, register_count=1, node_id=NODE_ID, priority=PRIORITY_TELEMETRY, block=True, timeout=None):
+        transaction = _Transaction('read', start_address, node_id, register_count=register_count)
+        return self.submit(transaction, priority, block=block, timeout=timeout)
+
+    def write(self, start_address, data, node_id=NODE_ID, priority=PRIORITY_CONTROL, block=True, timeout=None):
+        transaction = _Transaction('write', start_address, node_id, data=data)
+        return self.submit(transaction, priority, block=block, timeout=timeout)
+
+    def run_forever(self):
+        raise NotImplementedError
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run_forever, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止调度线程，并让仍在排队或拆帧进行中的事务结束：排队的 Future 被取消，进行中的以 RuntimeError 结束。
+        """
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._condition:
+            pending = self._drain()
+            # 唤醒等待队列空间的提交方，它们会看到调度器已停止
+            self._condition.notify_all()
+        for transaction in pending:
+            if not transaction.future.cancel() and not transaction.future.done():
+                transaction.future.set_exception(RuntimeError('调度器已停止'))
+
+
+class TransactionScheduler(_SchedulerBase):
+    """
+    线程安全的事务调度器：按 safety > control > telemetry > diagnostics 的优先级串行访问总线。
+    每个优先级使用有界队列，长读取按 SCHEDULER_CHUNK_SIZE 拆帧，每帧之间重新选择优先级，
+    使控制指令在遥测数据占满总线时仍有确定的等待上限（最多一帧）。
+    """
+
+    thread_name = 'roh-transaction-scheduler'
+
+    def __init__(self, bus, queue_size=SCHEDULER_QUEUE_SIZE, chunk_size=SCHEDULER_CHUNK_SIZE):
+        super().__init__(bus, queue_size)
+        self.chunk_size = chunk_size
+        self._queues = {priority: deque() for priority in roh_priority_list}
+        self._active = {priority: None for priority in roh_priority_list}
+        self._metrics = {priority: {'count': 0,
+                                    'rejected': 0,
+                                    'wait': deque(maxlen=LATENCY_WINDOW),
+                                    'latency': deque(maxlen=LATENCY_WINDOW)} for priority in roh_priority_list}
+
+    def _queue_for(self, transaction, priority):
+        return self._queues[priority]
+
+    def _rejected(self, transaction, priority):
+        self._metrics[priority]['rejected'] += 1
+
+    def _drain(self):
+        pending = [transaction for transaction in self._active.values() if transaction is not None]
+        for priority, queue in self._queues.items():
+            pending.extend(queue)
+            queue.clear()
+            self._active[priority] = None
+        return pending
+
+    def _select(self):
+        """
+        选出当前最高优先级的事务：已拆帧的进行中事务或队首事务。调用时需持有 self._condition。
+        """
+        for priority in sorted(roh_priority_list):
+            if self._active[priority] is not None:
+                return priority, self._active[priority]
+            if self._queues[priority]:
+                transaction = self._queues[priority].popleft()
+                self._condition.notify_all()
+                return priority, transaction
+        return None, None
+
+    def _finish(self, priority, transaction, result):
+        now = time.perf_counter()
+        with self._condition:
+            metrics = self._metrics[priority]
+            metrics['count'] += 1
+            metrics['wait'].append(transaction.start_time - transaction.enqueue_time)
+            metrics['latency'].append(now - transaction.enqueue_time)
+            self._active[priority] = None
+        transaction.future.set_result(result)
+
+    def _set_active(self, priority, transaction):
+        with self._condition:
+            self._active[priority] = transaction
+
+    def _step(self, priority, transaction):
+        """
+        执行事务的一帧。
+        """
+        if transaction.start_time is None:
+            transaction.start_time = time.perf_counter()
+            if not transaction.future.set_running_or_notify_cancel():
+                self._set_active(priority, None)
+                return
+        if transaction.kind == 'write':
+            result = write_registers(bus=self.bus, start_address=transaction.start_address, data=transaction.data,
+                                     node_id=transaction.node_id, wait_time=0)
+            self._finish(priority, transaction, result)
+            return
+        offset = len(transaction.registers)
+        count = min(self.chunk_size, transaction.register_count - offset)
+        response = read_registers(bus=self.bus, start_address=transaction.start_address + offset,
+                                  register_count=count, node_id=transaction.node_id, wait_time=0)
+        if response is None or response.isError():
+            self._finish(priority, transaction, None)
+            return
+        transaction.registers.extend(response.registers)
+        if len(transaction.registers) >= transaction.register_count:
+            self._finish(priority, transaction, transaction.registers)
+        else:
+            self._set_active(priority, transaction)
+
+    def run_forever(self):
+        while not self._stop_event.is_set():
+            with self._condition:
+                priority, transaction = self._select()
+                if transaction is None:
+                    self._condition.wait(0.5)
+                    continue
+            try:
+                self._step(priority, transaction)
+            except Exception as e:
+                logger.error(f'调度事务异常: {e}')
+                self._set_active(priority, None)
+                if not transaction.future.done():
+                    transaction.future.set_exception(e)
+
+    def get_metrics(self):
+        """
+        :return: 各优先级的事务数、拒绝数、排队等待和总延迟（平均/p99/最大，单位秒）
+        """
+        result = {}
+        with self._condition:
+            for priority, metrics in self._metrics.items():
+                item = {'count': metrics['count'],
+                        'rejected': metrics['rejected'],
+                        'queue_depth': len(self._queues[priority])}
+                for key in ('wait', 'latency'):
+                    samples = sorted(metrics[key])
+                    if samples:
+                        item[f'{key}_mean'] = sum(samples) / len(samples)
+                        item[f'{key}_p99'] = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+                        item[f'{key}_max'] = samples[-1]
+                result[roh_priority_list.get(priority)] = item
+        return result
+
+
+MULTIDROP_WRITE_SETTLE_TIME = 0.005 # 写入后同一设备再次被访问前的默认间隔（秒）
+MULTIDROP_READ_SETTLE_TIME = 0.0 # 读取后同一设备再次被访问前的默认间隔（秒）
+
+
+class MultiDropScheduler(_SchedulerBase):
+    """
+    多设备共线调度器：同一条 RS-485 总线上挂多个灵巧手时，按设备ID轮转发送事务。
+    每个设备在写入（或读取）后有各自的稳定时间，期间总线让给其它空闲设备，而不是原地 sleep。
+    同一设备内仍按 safety > control > telemetry > diagnostics 的优先级选择事务。
+    """
+
+    thread_name = 'roh-multidrop-scheduler'
+
+    def __init__(self, bus, node_ids=(NODE_ID,), queue_size=SCHEDULER_QUEUE_SIZE,
+                 write_settle_time=MULTIDROP_WRITE_SETTLE_TIME, read_settle_time=MULTIDROP_READ_SETTLE_TIME):
+        super().__init__(bus, queue_size)
+        self.write_settle_time = write_settle_time
+        self.read_settle_time = read_settle_time
+        self._devices = {}
+        self._order = []
+        self._next = 0
+        self._start_time = time.perf_counter()
+        self._busy_time = 0.0
+        for node_id in node_ids:
+            self.add_device(node_id)
+
+    def add_device(self, node_id, write_settle_time=None, read_settle_time=None):
+        """
+        添加设备或修改设备的稳定时间。
+        """
+        with self._condition:
+            device = self._devices.get(node_id)
+            if device is None:
+                device = self._devices[node_id] = {
+                    'queues': {priority: deque() for priority in roh_priority_list},
+                    'ready_time': 0.0,
+                    'count': 0,
+                    'failures': 0,
+                    'registers': 0,
+                    'busy': 0.0,
+                    'done': deque(maxlen=LATENCY_WINDOW),
+                    'latency': deque(maxlen=LATENCY_WINDOW)}
+                self._order.append(node_id)
+            device['write_settle'] = self.write_settle_time if write_settle_time is None else write_settle_time
+            device['read_settle'] = self.read_settle_time if read_settle_time is None else read_settle_time
+
+    def _queue_for(self, transaction, priority):
+        if transaction.node_id not in self._devices:
+            self.add_device(transaction.node_id)
+        return self._devices[transaction.node_id]['queues'][priority]
+
+    def _drain(self):
+        pending = []
+        for device in self._devices.values():
+            for queue in device['queues'].values():
+                pending.extend(queue)
+                queue.clear()
+        return pending
+
+    def _select(self, now):
+        """
+        在已过稳定时间的设备中按轮转顺序选出优先级最高的事务。调用时需持有 self._condition。
+        :return: (设备ID, 事务, 下一个设备就绪的时间)
+        """
+        best = None
+        next_ready = None
+        count = len(self._order)
+        for index in range(count):
+            node_id = self._order[(self._next + index) % count]
+            device = self._devices[node_id]
+            pending = [priority for priority, queue in device['queues'].items() if queue]
+            if not pending:
+                continue
+            if device['ready_time'] > now:
+                next_ready = device['ready_time'] if next_ready is None else min(next_ready, device['ready_time'])
+                continue
+            priority = min(pending)
+            if best is None or priority < best[0]:
+                best = (priority, index, node_id)
+        if best is None:
+            return None, None, next_ready
+        _, index, node_id = best
+        self._next = (self._next + index + 1) % count
+        transaction = self._devices[node_id]['queues'][best[0]].popleft()
+        self._condition.notify_all()
+        return node_id, transaction, None
+
+    def _execute(self, node_id, transaction):
+        device = self._devices[node_id]
+        transaction.start_time = time.perf_counter()
+        if not transaction.future.set_running_or_notify_cancel():
+            return
+        if transaction.kind == 'write':
+            result = write_registers(bus=self.bus, start_address=transaction.start_address, data=transaction.data,
+                                     node_id=node_id, wait_time=0)
+            success = result
+            register_count = 1 if isinstance(transaction.data, int) else len(transaction.data)
+            settle_time = device['write_settle']
+        else:
+            response = read_registers(bus=self.bus, start_address=transaction.start_address,
+                                      register_count=transaction.register_count, node_id=node_id, wait_time=0)
+            success = response is not None and not response.isError()
+            result = response.registers if success else None
+            register_count = transaction.register_count
+            settle_time = device['read_settle']
+        now = time.perf_counter()
+        with self._condition:
+            device['ready_time'] = now + settle_time
+            device['count'] += 1
+            device['busy'] += now - transaction.start_time
+            self._busy_time += now - transaction.start_time
+            if success:
+                device['registers'] += register_count
+            else:
+                device['failures'] += 1
+            device['done'].append(now)
+            device['latency'].append(now - transaction.enqueue_time)
+        transaction.future.set_result(result)
+
+    def run_forever(self):
+        while not self._stop_event.is_set():
+            with self._condition:
+                node_id, transaction, next_ready = self._select(time.perf_counter())
+                if transaction is None:
+                    # 有事务但设备都在稳定期时只等到最早就绪的设备
+                    self._condition.wait(0.5 if next_ready is None else max(0.0, next_ready - time.perf_counter()))
+                    continue
+            try:
+                self._execute(node_id, transaction)
+            except Exception as e:
+                logger.error(f'[node_id = {node_id}]调度事务异常: {e}')
+                if not transaction.future.done():
+                    transaction.future.set_exception(e)
+
+    def start(self):
+        self._start_time = time.perf_counter()
+        super().start()
+
+    def get_metrics(self):
+        """
+        :return: 每个设备的事务数、失败数、寄存器数、吞吐量（事务/秒，按最近 LATENCY_WINDOW 个事务计算）、
+                 总线占用比例和延迟，以及整条总线的占用率 bus_utilization
+        """
+        result = {}
+        with self._condition:
+            elapsed = max(time.perf_counter() - self._start_time, 1e-9)
+            for node_id, device in self._devices.items():
+                done = device['done']
+                item = {'count': device['count'],
+                        'failures': device['failures'],
+                        'registers': device['registers'],
+                        'queue_depth': sum(len(queue) for queue in device['queues'].values()),
+                        'bus_share': device['busy'] / elapsed,
+                        'throughput': (len(done) - 1) / (done[-1] - done[0]) if len(done) > 1 and done[-1] > done[0] else 0.0}
+                samples = sorted(device['latency'])
+                if samples:
+                    item['latency_mean'] = sum(samples) / len(samples)
+                    item['latency_p99'] = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+                result[node_id] = item
+            result['bus_utilization'] = self._busy_time / elapsed
+        return result
+
+
+# Modbus CRC16 查找表（多项式 0xA001）
+def _make_crc16_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+_CRC16_TABLE = _make_crc16_table()
+
+def compute_crc(data):
+    """
+    查表计算 Modbus CRC16。
+    :return: CRC 值，帧中按低字节在前发送
+    """
+    crc = 0xFFFF
+    table = _CRC16_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+def _with_crc(pdu):
+    return pdu + struct.pack('<H', compute_crc(pdu))
+
+def build_read_frame(node_id, start_address, register_count):
+    return _with_crc(struct.pack('>BBHH', node_id, FC_READ_HOLDING_REGISTERS, start_address, register_count))
+
+def build_write_single_frame(node_id, address, value):
+    return _with_crc(struct.pack('>BBHH', node_id, FC_WRITE_SINGLE_REGISTER, address, value))
+
+def build_write_frame(node_id, start_address, values):
+    """
+    生成 FC16 写多个寄存器的完整 RTU 帧（含 CRC），可预先生成后直接发送。
+    """
+    count = len(values)
+    return _with_crc(struct.pack(f'>BBHHB{count}H', node_id, FC_WRITE_MULTIPLE_REGISTERS, start_address,
+                                 count, count * 2, *values))
+
+def build_read_write_frame(node_id, read_address, read_count, write_address, values):
+    """
+    生成 FC23 读写多个寄存器的完整 RTU 帧（含 CRC），设备先写入 values 再读取。
+    """
+    count = len(values)
+    return _with_crc(struct.pack(f'>BBHHHHB{count}H', node_id, FC_READ_WRITE_REGISTERS, read_address, read_count,
+                                 write_address, count, count * 2, *values))
+
+
+BROADCAST_NODE_ID = 0 # Modbus 广播地址，所有设备执行写入但不应答
+
+
+class FastResponse:
+    """
+    与 pymodbus 响应兼容的轻量响应对象，提供 registers、exception_code、function_code、isError()。
+    """
+    __slots__ = ('function_code', 'registers', 'exception_code', 'roh_error')
+
+    def __init__(self, function_code, registers=None, exception_code=None):
+        self.function_code = function_code
+        self.registers = registers
+        self.exception_code = exception_code
+
+    def isError(self):
+        return self.exception_code is not None
+
+
+class RtuFastTransport:
+    """
+    直接基于 pyserial 的精简 RTU 传输，用于高频遥测轮询。
+    读请求帧（地址、数量、CRC）按请求缓存，响应按确切长度读入预分配缓冲区并查表校验 CRC。
+    提供 read_holding_registers/write_register/write_registers/readwrite_registers，可直接传给 read_registers/write_registers，
+    便于与 pymodbus 路径对比测试。
+    """
+
+    def __init__(self, port=PORT, baudrate=BAUDRATE, timeout=0.1):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.socket = None
+        self._request_cache = {}
+        self._buffer = bytearray(256)
+        self._view = memoryview(self._buffer)
+
+    def connect(self):
+        if serial is None:
+            logger.error('未安装 pyserial，无法使用 RtuFastTransport')
+            return False
+        try:
+            self.socket = serial.Serial(port=self.port, baudrate=self.baudrate, timeout=self.timeout)
+            logger.info(f"[port = {self.port}]Fast RTU transport connected.")
+            return True
+        except serial.SerialException as e:
+            logger.error(f"[port = {self.port}]Error during connection: {e}")
+            return False
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def _read_exact(self, start, size):
+        end = start + size
+        while start < end:
+            received = self.socket.readinto(self._view[start:end])
+            if not received:
+                raise ModbusIOException(f'[port = {self.port}]等待响应超时')
+            start += received
+        return end
+
+    def transact(self, frame, function_code, node_id, response_length):
+        """
+        发送一帧并按确切长度接收响应。
+        :param response_length: 正常响应的总长度（含 CRC）
+        :return: 接收到的字节数，数据位于 self._buffer
+        """
+        port = self.socket
+        if port is None:
+            raise ConnectionException(f'[port = {self.port}]串口未连接')
+        port.reset_input_buffer()
+        port.write(frame)
+        # 先读 3 字节判断是否为异常响应（异常响应总长 5 字节）
+        length = self._read_exact(0, 3)
+        if self._buffer[1] & 0x80:
+            length = self._read_exact(length, 2)
+        else:
+            length = self._read_exact(length, response_length - 3)
+        if compute_crc(self._view[:length - 2]) != struct.unpack_from('<H', self._buffer, length - 2)[0]:
+            raise InvalidMessageReceivedException(f'[port = {self.port}]CRC 校验失败')
+        if self._buffer[0] != node_id or self._buffer[1] & 0x7F != function_code:
+            raise InvalidMessageReceivedException(f'[port = {self.port}]响应与请求不匹配')
+        return length
+
+    def read_holding_registers(self, address, count=1, slave=NODE_ID):
+        key = (slave, address, count)
+        frame = self._request_cache.get(key)
+        if frame is None:
+            frame = self._request_cache[key] = build_read_frame(slave, address, count)
+        self.transact(frame, FC_READ_HOLDING_REGISTERS, slave, 5 + count * 2)
+        if self._buffer[1] & 0x80:
+            return FastResponse(self._buffer[1], exception_code=self._buffer[2])
+        return FastResponse(FC_READ_HOLDING_REGISTERS, registers=list(struct.unpack_from(f'>{count}H', self._buffer, 3)))
+
+    def read_raw_into(self, address, count, out, slave=NODE_ID):
+        """
+        读取寄存器，把数据区的原始字节（大端）直接复制到 out，不生成寄存器列表，用于长时间高频录制。
+        :param out: 可写的缓冲区，长度为 count * 2
+        :return: 正常响应返回 True，异常响应返回 False
+        """
+        key = (slave, address, count)
+        frame = self._request_cache.get(key)
+        if frame is None:
+            frame = self._request_cache[key] = build_read_frame(slave, address, count)
+        self.transact(frame, FC_READ_HOLDING_REGISTERS, slave, 5 + count * 2)
+        if self._buffer[1] & 0x80:
+            return False
+        out[:] = self._view[3:3 + count * 2]
+        return True
+
+    def write_register(self, address, value, slave=NODE_ID):
+        return self.send_frame(build_write_single_frame(slave, address, value), FC_WRITE_SINGLE_REGISTER, slave)
+
+    def write_registers(self, address, values, slave=NODE_ID):
+        if isinstance(values, int):
+            values = [values]
+        return self.send_frame(build_write_frame(slave, address, values), FC_WRITE_MULTIPLE_REGISTERS, slave)
+
+    def readwrite_registers(self, read_address, read_count, write_address, values, slave=NODE_ID):
+        if isinstance(values, int):
+            values = [values]
+        frame = build_read_write_frame(slave, read_address, read_count, write_address, values)
+        self.transact(frame, FC_READ_WRITE_REGISTERS, slave, 5 + read_count * 2)
+        if self._buffer[1] & 0x80:
+            return FastResponse(self._buffer[1], exception_code=self._buffer[2])
+        return FastResponse(FC_READ_WRITE_REGISTERS,
+                            registers=list(struct.unpack_from(f'>{read_count}H', self._buffer, 3)))
+
+    def send_broadcast(self, frame):
+        """
+        发送广播帧（设备ID为 BROADCAST_NODE_ID），设备执行后不应答，不等待响应。
+        """
+        port = self.socket
+        if port is None:
+            raise ConnectionException(f'[port = {self.port}]串口未连接')
+        port.reset_input_buffer()
+        port.write(frame)
+        port.flush()
+
+    def send_frame(self, frame, function_code=FC_WRITE_MULTIPLE_REGISTERS, node_id=NODE_ID):
+        """
+        发送预先生成的写帧（FC06/FC16，正常响应均为 8 字节）。
+        """
+        self.transact(frame, function_code, node_id, 8)
+        if self._buffer[1] & 0x80:
+            return FastResponse(self._buffer[1], exception_code=self._buffer[2])
+        return FastResponse(function_code)
+
+
+def benchmark_read(bus, start_address, register_count=1, iterations=1000, node_id=NODE_ID):
+    """
+    对比测试用：连续读取 iterations 次，统计单次事务耗时。
+    :return: 成功/失败次数及平均、p50、p99、最大耗时（秒）
+    """
+    samples = []
+    failures = 0
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        response = read_registers(bus=bus, start_address=start_address, register_count=register_count,
+                                  node_id=node_id, wait_time=0, retry_policy=None)
+        if response is None or response.isError():
+            failures += 1
+            continue
+        samples.append(time.perf_counter() - begin)
+    samples.sort()
+    result = {'success': len(samples), 'failures': failures}
+    if samples:
+        result['mean'] = sum(samples) / len(samples)
+        result['p50'] = samples[len(samples) // 2]
+        result['p99'] = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        result['max'] = samples[-1]
+    return result
             
 if __name__ == "__main__":
     # 初始化 modbus 总线
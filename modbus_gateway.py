@@ -0,0 +1,460 @@
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+import logging
+from collections import deque
+
+from pymodbus.client import ModbusTcpClient
+
+from mobus_operator import setup_modbus, close_modbus, PORT
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+GATEWAY_HOST = '127.0.0.1' # 仅监听本机
+GATEWAY_PORT = 5020 # Modbus TCP 端口
+MAX_READ_COUNT = 125 # FC03 单帧最多读取的寄存器数量
+MAX_WRITE_COUNT = 123 # FC16 单帧最多写入的寄存器数量
+MAX_PDU_SIZE = 253 # Modbus PDU 的最大长度（字节）
+MAX_MBAP_LENGTH = MAX_PDU_SIZE + 1 # MBAP 长度字段的最大值（单元号 + PDU）
+STATS_CHUNK_SIZE = MAX_PDU_SIZE - 3 # FC_GET_STATS 每帧返回的 JSON 字节数（功能码 + 总长度之后）
+STATS_INTERVAL = 10 # 统计信息打印周期（秒）
+REQUEST_TIMEOUT = 10 # 客户端等待网关处理的超时时间（秒）
+PRIORITY_AGING_TIME = 0.5 # 队首请求每等待该时间，调度时优先级提升一级，避免低优先级客户端饿死
+
+# 客户端优先级，数值越小越优先
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# 功能码
+FC_READ_HOLDING_REGISTERS = 0x03
+FC_WRITE_SINGLE_REGISTER = 0x06
+FC_WRITE_MULTIPLE_REGISTERS = 0x10
+FC_SET_PRIORITY = 0x41 # 自定义功能码：设置当前连接的优先级
+FC_GET_STATS = 0x42 # 自定义功能码：按偏移分页获取网关统计信息（JSON）
+
+# 网关返回的异常码
+EC01_ILLEGAL_FUNCTION = 0x01
+EC03_ILLEGAL_DATA_VALUE = 0x03
+EC04_SERVER_DEVICE_FAILURE = 0x04
+EC0B_GATEWAY_TARGET_FAILED = 0x0B # 目标设备无响应
+
+MBAP_FORMAT = '>HHHB' # 事务号、协议号、长度、单元号
+MBAP_SIZE = struct.calcsize(MBAP_FORMAT)
+
+
+class GatewayRequest:
+    def __init__(self, client, unit_id, function_code, address=0, count=0, values=None):
+        self.client = client
+        self.unit_id = unit_id
+        self.function_code = function_code
+        self.address = address
+        self.count = count
+        self.values = values
+        self.registers = None
+        self.exception_code = None
+        self.enqueue_time = time.perf_counter()
+        self.done = threading.Event()
+
+    def finish(self, registers=None, exception_code=None):
+        self.registers = registers
+        self.exception_code = exception_code
+        self.done.set()
+
+
+class GatewayClient:
+    """
+    每个 TCP 连接对应一个客户端，拥有独立的请求队列和优先级。
+    """
+
+    def __init__(self, name, priority=PRIORITY_NORMAL):
+        self.name = name
+        self.priority = priority
+        self.queue = deque()
+        self.request_count = 0
+        self.stats_payload = None # 分页读取统计信息时的快照，偏移为 0 时重新生成
+
+
+class ModbusGateway:
+    """
+    串口网关：独占串口，按客户端优先级 + 同级轮转的方式调度请求，
+    并把同一设备上相邻或重叠的读请求合并成一个 FC03 帧。
+    高优先级客户端持续有请求时，低优先级客户端队首每等待 PRIORITY_AGING_TIME 提升一级，
+    最多提升到 PRIORITY_HIGH 后参与同级轮转，因此等待时间有上限；合并只考虑各客户端的队首。
+    """
+
+    def __init__(self, bus, max_read_count=MAX_READ_COUNT):
+        self.bus = bus
+        self.max_read_count = max_read_count
+        self.clients = []
+        self._rr_index = {}
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.start_time = time.perf_counter()
+        self.stats = {
+            'requests': 0,
+            'frames': 0,
+            'coalesced': 0,
+            'errors': 0,
+            'cancelled': 0,
+            'max_queue_depth': 0,
+            'busy_time': 0.0,
+        }
+
+    def register_client(self, name, priority=PRIORITY_NORMAL):
+        client = GatewayClient(name=name, priority=priority)
+        with self._condition:
+            self.clients.append(client)
+        logger.info(f'[gateway]客户端{name}已连接')
+        return client
+
+    def unregister_client(self, client):
+        with self._condition:
+            self.clients.remove(client)
+            for request in client.queue:
+                request.finish(exception_code=EC0B_GATEWAY_TARGET_FAILED)
+            client.queue.clear()
+        logger.info(f'[gateway]客户端{client.name}已断开')
+
+    def queue_depth(self):
+        return sum(len(client.queue) for client in self.clients)
+
+    def submit(self, request):
+        with self._condition:
+            request.client.queue.append(request)
+            request.client.request_count += 1
+            self.stats['requests'] += 1
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self.queue_depth())
+            self._condition.notify()
+        return request
+
+    def cancel(self, request):
+        """
+        取消仍在队列中、尚未发送到串口的请求。
+        :return: 已取消返回 True；请求已被取出执行时返回 False，调用方应等待其结果
+        """
+        with self._condition:
+            try:
+                request.client.queue.remove(request)
+            except ValueError:
+                return False
+            self.stats['cancelled'] += 1
+            return True
+
+    def _effective_priority(self, client, now):
+        waited = now - client.queue[0].enqueue_time
+        return max(client.priority - int(waited / PRIORITY_AGING_TIME), PRIORITY_HIGH)
+
+    def _count(self, key, value=1):
+        with self._condition:
+            self.stats[key] += value
+
+    def _next_batch(self):
+        """
+        选出下一帧要处理的请求：按老化后的优先级取最高一级，在其中轮转选择一个客户端的队首，
+        若为读请求，再合并其它客户端队首中可以拼接的读请求。
+        调用时需持有 self._condition。
+        """
+        ready = [client for client in self.clients if client.queue]
+        if not ready:
+            return []
+        now = time.perf_counter()
+        priorities = {id(client): self._effective_priority(client, now) for client in ready}
+        priority = min(priorities.values())
+        candidates = [client for client in ready if priorities[id(client)] == priority]
+        index = self._rr_index.get(priority, 0) % len(candidates)
+        self._rr_index[priority] = index + 1
+        head = candidates[index].queue.popleft()
+        batch = [head]
+        if head.function_code != FC_READ_HOLDING_REGISTERS:
+            return batch
+        start = head.address
+        end = head.address + head.count
+        for client in ready:
+            if not client.queue:
+                continue
+            other = client.queue[0]
+            if other.function_code != FC_READ_HOLDING_REGISTERS or other.unit_id != head.unit_id:
+                continue
+            # 只合并重叠或相邻的区间，避免把非法地址夹进合并帧
+            if other.address > end or other.address + other.count < start:
+                continue
+            new_start = min(start, other.address)
+            new_end = max(end, other.address + other.count)
+            if new_end - new_start > self.max_read_count:
+                continue
+            start, end = new_start, new_end
+            batch.append(client.queue.popleft())
+        return batch
+
+    def _execute_read(self, batch):
+        start = min(request.address for request in batch)
+        end = max(request.address + request.count for request in batch)
+        response = self.bus.read_holding_registers(address=start, count=end - start, slave=batch[0].unit_id)
+        self._count('frames')
+        if response.isError():
+            if len(batch) > 1:
+                # 合并帧出错时逐个重发，让异常只落在真正出错的请求上
+                for request in batch:
+                    self._execute_read([request])
+                return
+            self._count('errors')
+            batch[0].finish(exception_code=response.exception_code)
+            return
+        self._count('coalesced', len(batch) - 1)
+        for request in batch:
+            offset = request.address - start
+            request.finish(registers=response.registers[offset:offset + request.count])
+
+    def _execute_write(self, request):
+        if request.function_code == FC_WRITE_SINGLE_REGISTER:
+            response = self.bus.write_register(address=request.address, value=request.values[0], slave=request.unit_id)
+        else:
+            response = self.bus.write_registers(address=request.address, values=request.values, slave=request.unit_id)
+        self._count('frames')
+        if response.isError():
+            self._count('errors')
+            request.finish(exception_code=response.exception_code)
+        else:
+            request.finish()
+
+    def _execute(self, batch):
+        begin = time.perf_counter()
+        try:
+            if batch[0].function_code == FC_READ_HOLDING_REGISTERS:
+                self._execute_read(batch)
+            else:
+                self._execute_write(batch[0])
+        except Exception as e:
+            logger.error(f'[gateway]串口事务异常: {e}')
+            self._count('errors')
+            for request in batch:
+                if not request.done.is_set():
+                    request.finish(exception_code=EC0B_GATEWAY_TARGET_FAILED)
+        self._count('busy_time', time.perf_counter() - begin)
+
+    def run_forever(self):
+        last_stats_time = time.perf_counter()
+        while not self._stop_event.is_set():
+            with self._condition:
+                batch = self._next_batch()
+                if not batch:
+                    self._condition.wait(0.5)
+                    batch = self._next_batch()
+            if batch:
+                self._execute(batch)
+            if time.perf_counter() - last_stats_time >= STATS_INTERVAL:
+                last_stats_time = time.perf_counter()
+                logger.info(f'[gateway]统计信息: {self.get_stats()}')
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run_forever, name='roh-modbus-gateway', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_stats(self):
+        elapsed = max(time.perf_counter() - self.start_time, 1e-9)
+        with self._condition:
+            return {
+                'uptime': round(elapsed, 3),
+                'requests': self.stats['requests'],
+                'frames': self.stats['frames'],
+                'coalesced': self.stats['coalesced'],
+                'errors': self.stats['errors'],
+                'cancelled': self.stats['cancelled'],
+                'requests_per_second': round(self.stats['requests'] / elapsed, 3),
+                'frames_per_second': round(self.stats['frames'] / elapsed, 3),
+                'bus_utilization': round(self.stats['busy_time'] / elapsed, 3),
+                'queue_depth': self.queue_depth(),
+                'max_queue_depth': self.stats['max_queue_depth'],
+                'clients': {client.name: {'priority': client.priority,
+                                          'requests': client.request_count,
+                                          'queue_depth': len(client.queue)} for client in self.clients},
+            }
+
+
+def _exception_pdu(function_code, exception_code):
+    return struct.pack('>BB', function_code | 0x80, exception_code)
+
+
+class GatewayRequestHandler(socketserver.BaseRequestHandler):
+    """
+    Modbus TCP 连接处理：解析 MBAP 帧，提交给网关后按原事务号回复。
+    """
+
+    def _recv_exact(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def handle(self):
+        gateway = self.server.gateway
+        client = gateway.register_client(name=f'{self.client_address[0]}:{self.client_address[1]}')
+        try:
+            while True:
+                header = self._recv_exact(MBAP_SIZE)
+                if header is None:
+                    break
+                transaction_id, protocol_id, length, unit_id = struct.unpack(MBAP_FORMAT, header)
+                if length > MAX_MBAP_LENGTH:
+                    # 长度字段非法时无法再找到下一帧的边界，断开连接
+                    logger.error(f'[gateway]客户端{client.name}帧长度非法: {length}')
+                    break
+                pdu = self._recv_exact(length - 1) if length > 1 else b''
+                if pdu is None:
+                    break
+                if not pdu:
+                    # 没有功能码的空帧无法回复异常响应，丢弃
+                    logger.error(f'[gateway]客户端{client.name}发送了空帧，已丢弃')
+                    continue
+                response_pdu = self._handle_pdu(gateway, client, unit_id, pdu)
+                self.request.sendall(struct.pack(MBAP_FORMAT, transaction_id, protocol_id,
+                                                 len(response_pdu) + 1, unit_id) + response_pdu)
+        except (ConnectionError, OSError) as e:
+            logger.error(f'[gateway]客户端{client.name}连接异常: {e}')
+        finally:
+            gateway.unregister_client(client)
+
+    def _handle_pdu(self, gateway, client, unit_id, pdu):
+        function_code = pdu[0]
+        try:
+            if function_code == FC_READ_HOLDING_REGISTERS:
+                address, count = struct.unpack_from('>HH', pdu, 1)
+                if not 1 <= count <= MAX_READ_COUNT:
+                    return _exception_pdu(function_code, EC03_ILLEGAL_DATA_VALUE)
+                request = GatewayRequest(client, unit_id, function_code, address=address, count=count)
+            elif function_code == FC_WRITE_SINGLE_REGISTER:
+                address, value = struct.unpack_from('>HH', pdu, 1)
+                request = GatewayRequest(client, unit_id, function_code, address=address, count=1, values=[value])
+            elif function_code == FC_WRITE_MULTIPLE_REGISTERS:
+                address, count, byte_count = struct.unpack_from('>HHB', pdu, 1)
+                if not 1 <= count <= MAX_WRITE_COUNT or byte_count != count * 2 or len(pdu) != 6 + byte_count:
+                    return _exception_pdu(function_code, EC03_ILLEGAL_DATA_VALUE)
+                values = list(struct.unpack_from(f'>{count}H', pdu, 6))
+                request = GatewayRequest(client, unit_id, function_code, address=address, count=count, values=values)
+            elif function_code == FC_SET_PRIORITY:
+                client.priority = pdu[1]
+                logger.info(f'[gateway]客户端{client.name}优先级设置为{client.priority}')
+                return pdu[:2]
+            elif function_code == FC_GET_STATS:
+                # 统计信息可能超过单帧 PDU 的长度，按偏移分页返回同一份快照
+                offset = struct.unpack_from('>H', pdu, 1)[0] if len(pdu) >= 3 else 0
+                if offset == 0 or client.stats_payload is None:
+                    client.stats_payload = json.dumps(gateway.get_stats()).encode('utf-8')
+                payload = client.stats_payload
+                if offset > len(payload):
+                    return _exception_pdu(function_code, EC03_ILLEGAL_DATA_VALUE)
+                return struct.pack('>BH', function_code, len(payload)) + payload[offset:offset + STATS_CHUNK_SIZE]
+            else:
+                return _exception_pdu(function_code, EC01_ILLEGAL_FUNCTION)
+        except (struct.error, IndexError):
+            return _exception_pdu(function_code, EC03_ILLEGAL_DATA_VALUE)
+
+        gateway.submit(request)
+        if not request.done.wait(REQUEST_TIMEOUT):
+            if gateway.cancel(request):
+                # 请求从队列中移除后才回复失败，之后不会再发送到串口
+                return _exception_pdu(function_code, EC0B_GATEWAY_TARGET_FAILED)
+            # 请求已经在串口上执行，等待真实结果，避免回复失败后写入仍然生效
+            request.done.wait()
+        if request.exception_code is not None:
+            return _exception_pdu(function_code, request.exception_code)
+        if function_code == FC_READ_HOLDING_REGISTERS:
+            return struct.pack(f'>BB{request.count}H', function_code, request.count * 2, *request.registers)
+        if function_code == FC_WRITE_SINGLE_REGISTER:
+            return pdu[:5]
+        return struct.pack('>BHH', function_code, request.address, request.count)
+
+
+class GatewayServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, gateway, host=GATEWAY_HOST, port=GATEWAY_PORT):
+        super().__init__((host, port), GatewayRequestHandler)
+        self.gateway = gateway
+
+
+def _raw_request(sock, pdu, unit_id=0):
+    sock.sendall(struct.pack(MBAP_FORMAT, 0, 0, len(pdu) + 1, unit_id) + pdu)
+    header = b''
+    while len(header) < MBAP_SIZE:
+        header += sock.recv(MBAP_SIZE - len(header))
+    length = struct.unpack(MBAP_FORMAT, header)[2]
+    payload = b''
+    while len(payload) < length - 1:
+        payload += sock.recv(length - 1 - len(payload))
+    return payload
+
+
+def connect_gateway(host=GATEWAY_HOST, port=GATEWAY_PORT, priority=PRIORITY_NORMAL):
+    """
+    连接本机网关，返回的客户端可以直接传给 read_registers/write_registers。
+    """
+    client = ModbusTcpClient(host=host, port=port)
+    if not client.connect():
+        logger.error(f'[gateway = {host}:{port}]Could not connect to gateway.')
+        return None
+    if priority != PRIORITY_NORMAL:
+        _raw_request(client.socket, struct.pack('>BB', FC_SET_PRIORITY, priority))
+    return client
+
+
+def query_gateway_stats(host=GATEWAY_HOST, port=GATEWAY_PORT):
+    """
+    获取网关的吞吐量和队列深度统计信息，超过单帧长度时按偏移分页读取。
+    """
+    data = b''
+    with socket.create_connection((host, port), timeout=REQUEST_TIMEOUT) as sock:
+        while True:
+            payload = _raw_request(sock, struct.pack('>BH', FC_GET_STATS, len(data)))
+            if payload[0] != FC_GET_STATS:
+                raise ValueError(f'Gateway rejected stats request: {payload.hex()}')
+            length = struct.unpack_from('>H', payload, 1)[0]
+            data += payload[3:]
+            if len(data) >= length or len(payload) <= 3:
+                break
+    return json.loads(data[:length].decode('utf-8'))
+
+
+if __name__ == "__main__":
+    # 初始化 modbus 总线，网关独占串口
+    bus = setup_modbus()
+
+    if bus:
+        gateway = ModbusGateway(bus=bus)
+        gateway.start()
+        server = GatewayServer(gateway=gateway)
+        logger.info(f'[port = {PORT}]网关已启动，监听 {GATEWAY_HOST}:{GATEWAY_PORT}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info('用户手动终止，停止网关...')
+        finally:
+            server.server_close()
+            gateway.stop()
+            close_modbus(bus)
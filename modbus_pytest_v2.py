@@ -1,7 +1,12 @@
 import logging
 import time
 import pytest
-from mobus_operator import setup_modbus,close_modbus,read_registers,write_registers
+from mobus_operator import setup_modbus,close_modbus,read_registers,write_registers,write_verify_fingers,probe_function_codes
+from limits_cache import LimitsDiscovery
+from register_model import RegisterModel
+from node_discovery import wait_for_node
+from motion_wait import wait_converged, POS_TOLERANCE, ANGLE_TOLERANCE
+from stall_detector import StallDetector
 
 # 设置日志级别为INFO，获取日志记录器实例
 logger = logging.getLogger(__name__)
@@ -375,9 +380,28 @@ FINGER_FORCE_G4 = 100 #小拇指弯曲力量控制 G 值\*100（uint16）
 
 # WAIT_TIME = 0.1 # 延迟打印，方便查看
 
+NUM_FINGERS = 6 # 手指数量
+REGISTER_MODEL = RegisterModel() # 寄存器写入语义参考模型
+VECTORIZED_VERIFY = False # 为 True 时 P/I/D/G、电流限制、速度寄存器改用跨手指批量校验，跳过逐个手指的写测试（缩短回归时间）
+
+per_finger_verify = pytest.mark.skipif(VECTORIZED_VERIFY, reason='已由跨手指批量校验覆盖')
+vectorized_verify = pytest.mark.skipif(not VECTORIZED_VERIFY, reason='逐个手指校验模式')
+
+@pytest.fixture(scope='session', autouse=True)
+def probe_session():
+    """
+    整个测试会话只探测一次写功能码，结果按 (串口, 设备ID) 缓存，各用例新建的连接直接复用
+    """
+    bus = setup_modbus()
+    if bus is not None:
+        probe_function_codes(bus)
+        close_modbus(bus)
+    yield
+
 class TestModbusProtocol:
     TEST_START = 0X0
     TEST_END = 0X3
+    limits = None # 角度限位缓存，整个测试会话共用
 
     roh_test_status_list = {
         TEST_START: '开始测试',
@@ -408,6 +432,7 @@ class TestModbusProtocol:
         if self.bus is None:
             logger.error("Could not connect to  modbus. Skipping tests.")
             pytest.skip("Could not connect to modbus. Skipping tests.")
+        self.detector = StallDetector()
         yield
         try:
             close_modbus(self.bus)
@@ -489,21 +514,21 @@ class TestModbusProtocol:
             pytest.fail(f'读取寄存器<{ROH_NODE_ID}>失败,发生异常')
             
     def wait_device_reboot(self, max_attempts=60, delay_time=1,target_node_id = 2):
-        attempt_count = 0
-        while attempt_count < max_attempts:
-            logger.info(f'等待设备重启中...{attempt_count}')
-            time.sleep(delay_time)
-            self.bus = setup_modbus()
+        # 用短超时轮询目标设备ID，设备一上线就返回，最长等待 max_attempts * delay_time 秒
+        deadline = time.perf_counter() + max_attempts * delay_time
+        while time.perf_counter() < deadline:
+            logger.info(f'等待设备重启中...')
             if self.bus is None:
-                attempt_count += 1
-                continue
-            # if(attempt_count % 5 == 0):
-            response = read_registers(bus=self.bus,start_address=ROH_NODE_ID,register_count=1,node_id=target_node_id)
-            if(self.isNotNone(response=response)):
-                logger.info(f'wait_device_reboot-->check = {response.registers[0]}')
+                self.bus = setup_modbus()
+                if self.bus is None:
+                    time.sleep(delay_time)
+                    continue
+            node_id = wait_for_node(self.bus, hints=[target_node_id], timeout=deadline - time.perf_counter())
+            if node_id is not None:
+                logger.info(f'wait_device_reboot-->check = {node_id}')
                 logger.info(f'设备已启动')
-                break
-            attempt_count += 1
+                return
+        logger.error(f'等待设备{target_node_id}重启超时')
         # attempt_count = 0
         # while attempt_count < max_attempts:
         #     logger.info(f'等待设备重启中...{attempt_count}')
@@ -696,6 +721,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_P0}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_P0}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_P0(self):
         self.print_test_info(status=self.TEST_START, info='write finger P0,The normal range is [100,50000], and the out-of-range values fall within {0,1,99,50001,65535}')
         verify_sets = [
@@ -744,6 +770,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_P1}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_P1}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_P1(self):
         self.print_test_info(status=self.TEST_START, info='write finger P1,The normal range is [100,50000], and the out-of-range values fall within {0,1,99,50001,65535}')
         verify_sets = [
@@ -793,6 +820,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_P2}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_P2}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_P2(self):
         self.print_test_info(status=self.TEST_START, info='write finger P2,The normal range is [100,50000], and the out-of-range values fall within {0,1,99,50001,65535}')
         verify_sets = [
@@ -841,6 +869,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_P3}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_P3}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_P3(self):
         self.print_test_info(status=self.TEST_START, info='write finger P3,The normal range is [100,50000], and the out-of-range values fall within {0,1,99,50001,65535}')
         verify_sets = [
@@ -889,6 +918,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_P4}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_P4}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_P4(self):
         self.print_test_info(status=self.TEST_START, info='write finger P4,The normal range is [100,50000], and the out-of-range values fall within {0,1,99,50001,65535}')
         verify_sets = [
@@ -937,6 +967,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_P5}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_P5}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_P5(self):
         self.print_test_info(status=self.TEST_START, info='write finger P5,The normal range is [100,50000], and the out-of-range values fall within {0,1,99,50001,65535}')
         verify_sets = [
@@ -986,6 +1017,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_I0}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_I0}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_I0(self):
         self.print_test_info(status=self.TEST_START, info='write finger I0,The normal range is [0,10000], and the out-of-range values fall within {10001,65535}')
         verify_sets = [
@@ -1031,6 +1063,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_I1}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_I1}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_I1(self):
         self.print_test_info(status=self.TEST_START, info='write finger I1,The normal range is [0,10000], and the out-of-range values fall within {10001,65535}')
         verify_sets = [
@@ -1076,6 +1109,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_I2}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_I2}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_I2(self):
         self.print_test_info(status=self.TEST_START, info='write finger I2,The normal range is [0,10000], and the out-of-range values fall within {10001,65535}')
         verify_sets = [
@@ -1121,6 +1155,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_I3}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_I3}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_I3(self):
         self.print_test_info(status=self.TEST_START, info='write finger I3,The normal range is [0,10000], and the out-of-range values fall within {10001,65535}')
         verify_sets = [
@@ -1166,6 +1201,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_I4}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_I4}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_I4(self):
         self.print_test_info(status=self.TEST_START, info='write finger I4,The normal range is [0,10000], and the out-of-range values fall within {10001,65535}')
         verify_sets = [
@@ -1211,6 +1247,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_I5}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_I5}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_I5(self):
         self.print_test_info(status=self.TEST_START, info='write finger I5,The normal range is [0,10000], and the out-of-range values fall within {10001,65535}')
         verify_sets = [
@@ -1257,6 +1294,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_D0}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_D0}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_D0(self):
         self.print_test_info(status=self.TEST_START, info='write finger D0,The normal range is [0,50000], and the out-of-range values fall within {50001,65535}')
         verify_sets = [
@@ -1302,6 +1340,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_D1}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_D1}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_D1(self):
         self.print_test_info(status=self.TEST_START, info='write finger D1,The normal range is [0,50000], and the out-of-range values fall within {50001,65535}')
         verify_sets = [
@@ -1347,6 +1386,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_D2}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_D2}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_D2(self):
         self.print_test_info(status=self.TEST_START, info='write finger D2,The normal range is [0,50000], and the out-of-range values fall within {50001,65535}')
         verify_sets = [
@@ -1392,6 +1432,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_D3}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_D3}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_D3(self):
         self.print_test_info(status=self.TEST_START, info='write finger D3,The normal range is [0,50000], and the out-of-range values fall within {50001,65535}')
         verify_sets = [
@@ -1437,6 +1478,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_D4}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_D4}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_D4(self):
         self.print_test_info(status=self.TEST_START, info='write finger D4,The normal range is [0,50000], and the out-of-range values fall within {50001,65535}')
         verify_sets = [
@@ -1482,6 +1524,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_D5}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_D5}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_D5(self):
         self.print_test_info(status=self.TEST_START, info='write finger D5,The normal range is [0,50000], and the out-of-range values fall within {50001,65535}')
         verify_sets = [
@@ -1527,6 +1570,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_G0}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_G0}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_G0(self):
         self.print_test_info(status=self.TEST_START, info='write finger G0,The normal range is [1,100], and the out-of-range values fall within {0,101,65535}')
         verify_sets = [
@@ -1574,6 +1618,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_G1}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_G1}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_G1(self):
         self.print_test_info(status=self.TEST_START, info='write finger G1,The normal range is [1,100], and the out-of-range values fall within {0,101,65535}')
         verify_sets = [
@@ -1620,6 +1665,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_G2}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_G2}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_G2(self):
         self.print_test_info(status=self.TEST_START, info='write finger G2,The normal range is [1,100], and the out-of-range values fall within {0,101,65535}')
         verify_sets = [
@@ -1666,6 +1712,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_G3}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_G3}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_G3(self):
         self.print_test_info(status=self.TEST_START, info='write finger G3,The normal range is [1,100], and the out-of-range values fall within {0,101,65535}')
         verify_sets = [
@@ -1712,6 +1759,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_G4}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_G4}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_G4(self):
         self.print_test_info(status=self.TEST_START, info='write finger G4,The normal range is [1,100], and the out-of-range values fall within {0,101,65535}')
         verify_sets = [
@@ -1758,6 +1806,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_G5}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_G5}>失败,发生异常')
   
+    @per_finger_verify
     def test_write_finger_G5(self):
         self.print_test_info(status=self.TEST_START, info='write finger G5,The normal range is [1,100], and the out-of-range values fall within {0,101,65535}')
         verify_sets = [
@@ -1865,6 +1914,7 @@ class TestModbusProtocol:
             pytest.fail(f'读取寄存器<{ROH_FINGER_CURRENT_LIMIT0}>失败,发生异常')
     
     # @pytest.mark.skip('1200边界值写入后,读出来是1178,需要研发修改')        
+    @per_finger_verify
     def test_write_current_limit0(self):
         self.print_test_info(status=self.TEST_START, info='write finger current limit0,The normal range is [0,1299], and the out-of-range values fall within {1300,65535}')
         verify_sets = [
@@ -1911,6 +1961,7 @@ class TestModbusProtocol:
             pytest.fail(f'读取寄存器<{ROH_FINGER_CURRENT_LIMIT1}>失败,发生异常')
     
     # @pytest.mark.skip('1200边界值写入后,读出来是1178,需要研发修改')        
+    @per_finger_verify
     def test_write_current_limit1(self):
         self.print_test_info(status=self.TEST_START, info='write finger current limit1,The normal range is [0,1299], and the out-of-range values fall within {1300,65535}')
         verify_sets = [
@@ -1957,6 +2008,7 @@ class TestModbusProtocol:
             pytest.fail(f'读取寄存器<{ROH_FINGER_CURRENT_LIMIT2}>失败,发生异常')
     
     # @pytest.mark.skip('1200边界值写入后,读出来是1178,需要研发修改')        
+    @per_finger_verify
     def test_write_current_limit2(self):
         self.print_test_info(status=self.TEST_START, info='write finger current limit2,The normal range is [0,1299], and the out-of-range values fall within {1300,65535}')
         verify_sets = [
@@ -2003,6 +2055,7 @@ class TestModbusProtocol:
             pytest.fail(f'读取寄存器<{ROH_FINGER_CURRENT_LIMIT3}>失败,发生异常')
     
     # @pytest.mark.skip('1200边界值写入后,读出来是1178,需要研发修改')        
+    @per_finger_verify
     def test_write_current_limit3(self):
         self.print_test_info(status=self.TEST_START, info='write finger current limit3,The normal range is [0,1299], and the out-of-range values fall within {1300,65535}')
         verify_sets = [
@@ -2049,6 +2102,7 @@ class TestModbusProtocol:
             pytest.fail(f'读取寄存器<{ROH_FINGER_CURRENT_LIMIT4}>失败,发生异常')
     
     # @pytest.mark.skip('1200边界值写入后,读出来是1178,需要研发修改')        
+    @per_finger_verify
     def test_write_current_limit4(self):
         self.print_test_info(status=self.TEST_START, info='write finger current limit4,The normal range is [0,1299], and the out-of-range values fall within {1300,65535}')
         verify_sets = [
@@ -2095,6 +2149,7 @@ class TestModbusProtocol:
             pytest.fail(f'读取寄存器<{ROH_FINGER_CURRENT_LIMIT5}>失败,发生异常')
     
     # @pytest.mark.skip('1200边界值写入后,读出来是1178,需要研发修改')        
+    @per_finger_verify
     def test_write_current_limit5(self):
         self.print_test_info(status=self.TEST_START, info='write finger current limit5,The normal range is [0,1299], and the out-of-range values fall within {1300,65535}')
         verify_sets = [
@@ -2450,6 +2505,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_SPEED0}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_SPEED0}>失败,发生异常')
             
+    @per_finger_verify
     def test_write_finger_speed0(self):
         self.print_test_info(status=self.TEST_START, info='write finger speed0,The normal range is [0,65535]')
         verify_sets = [
@@ -2489,6 +2545,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_SPEED1}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_SPEED1}>失败,发生异常')
             
+    @per_finger_verify
     def test_write_finger_speed1(self):
         self.print_test_info(status=self.TEST_START, info='write finger speed1,The normal range is [0,65535]')
         verify_sets = [
@@ -2528,6 +2585,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_SPEED2}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_SPEED2}>失败,发生异常')
             
+    @per_finger_verify
     def test_write_finger_speed2(self):
         self.print_test_info(status=self.TEST_START, info='write finger speed2,The normal range is [0,65535]')
         verify_sets = [
@@ -2567,6 +2625,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_SPEED3}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_SPEED3}>失败,发生异常')
             
+    @per_finger_verify
     def test_write_finger_speed3(self):
         self.print_test_info(status=self.TEST_START, info='write finger speed3,The normal range is [0,65535]')
         verify_sets = [
@@ -2606,6 +2665,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_SPEED4}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_SPEED4}>失败,发生异常')
             
+    @per_finger_verify
     def test_write_finger_speed4(self):
         self.print_test_info(status=self.TEST_START, info='write finger speed4,The normal range is [0,65535]')
         verify_sets = [
@@ -2645,6 +2705,7 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_SPEED5}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_SPEED5}>失败,发生异常')
             
+    @per_finger_verify
     def test_write_finger_speed5(self):
         self.print_test_info(status=self.TEST_START, info='write finger speed5,The normal range is [0,65535]')
         verify_sets = [
@@ -2674,6 +2735,98 @@ class TestModbusProtocol:
         except Exception as e:
             logger.error(f"恢复默认值发生了异常: {e}")
             
+    def wait_settle(self, address, target, tolerance):
+        """
+        代替固定的 WAIT_TIME：高速轮询位置/角度反馈，到位即返回并记录到位耗时，未到位只记录不判失败
+        （各测试只判定目标寄存器的读回值）。
+        等待期间每次轮询后用 StallDetector 检查电流和状态，出现堵转或电流超限立即终止。
+        """
+        self.detector.reset()
+        result = wait_converged(self.bus, address, [target], tolerance, on_poll=lambda: self.detector.poll(self.bus),
+                                abort=self.detector.fault_event)
+        assert not self.detector.fault_event.is_set(), f'等待寄存器{address}到位时手指{sorted(self.detector.faulted)}故障\n'
+        if result.converged:
+            logger.info(f'寄存器{address}到达目标{target}, 到位耗时{result.elapsed:.3f}s')
+        else:
+            logger.info(f'寄存器{address}未到达目标{target}, 当前{result.values}, 等待{result.elapsed:.3f}s')
+        return result
+            
+    def verify_fingers(self, start_address, name, verify_sets, default_value):
+        """
+        跨手指批量校验：每个校验值用一帧 FC16 写入 6 个手指的连续寄存器，再用一帧 FC03 读回，逐个手指判断并单独报告失败。
+        超出范围（写进去不生效,底层不报错）的值由参考模型 RegisterModel 判定。
+        """
+        failures = []
+        stored = REGISTER_MODEL.stores(start_address, verify_sets)
+        for index,value in enumerate(verify_sets):
+            try:
+                registers = write_verify_fingers(self.bus, start_address=start_address, value=value)
+                assert registers is not None, f'批量写读寄存器<{start_address}>失败，写入值为{value}'
+                for finger,read_value in enumerate(registers):
+                    address = start_address + finger
+                    if not stored[index]:
+                        if read_value == value:
+                            failures.append(f"{name}{finger}: 超出范围的值{value}未被检测出")
+                        else:
+                            logger.info(f"{name}{finger}: 成功检测出超出范围的值{value}")
+                    elif read_value != value:
+                        failures.append(f"{name}{finger}: 从寄存器{address}读出的值{read_value}与写入的值{value}不匹配")
+                    else:
+                        logger.info(f"{name}{finger}: 从寄存器{address}读出的值{read_value}与写入的值{value}匹配成功")
+            except Exception as e:
+                logger.error(f"批量写寄存器<{start_address}>失败,发生异常: {e}")
+                failures.append(f'{name}0~{name}{NUM_FINGERS - 1}: 写入值{value}时发生异常: {e}')
+                
+        # 恢复默认值
+        logger.info('恢复默认值')
+        try:
+            write_response = write_registers(self.bus, start_address=start_address, data=[default_value] * NUM_FINGERS)
+            assert write_response, f"恢复默认值失败\n"
+            logger.info("恢复默认值成功\n")
+        except Exception as e:
+            logger.error(f"恢复默认值发生了异常: {e}")
+            
+        if failures:
+            for failure in failures:
+                logger.error(failure)
+            pytest.fail('\n'.join(failures))
+            
+    @vectorized_verify
+    def test_write_finger_P_all(self):
+        self.print_test_info(status=self.TEST_START, info='write finger P0~P5,The normal range is [100,50000], and the out-of-range values fall within {0,1,99,50001,65535}')
+        verify_sets = [0, 1, 99, 100, 25000, 50000, 50001, 65535]
+        self.verify_fingers(ROH_FINGER_P0, 'P', verify_sets, default_value=FINGER_P0)
+        
+    @vectorized_verify
+    def test_write_finger_I_all(self):
+        self.print_test_info(status=self.TEST_START, info='write finger I0~I5,The normal range is [0,10000], and the out-of-range values fall within {10001,65535}')
+        verify_sets = [0, 5000, 10000, 10001, 65535]
+        self.verify_fingers(ROH_FINGER_I0, 'I', verify_sets, default_value=FINGER_I0)
+        
+    @vectorized_verify
+    def test_write_finger_D_all(self):
+        self.print_test_info(status=self.TEST_START, info='write finger D0~D5,The normal range is [0,50000], and the out-of-range values fall within {50001,65535}')
+        verify_sets = [0, 25000, 50000, 50001, 65535]
+        self.verify_fingers(ROH_FINGER_D0, 'D', verify_sets, default_value=FINGER_D0)
+        
+    @vectorized_verify
+    def test_write_finger_G_all(self):
+        self.print_test_info(status=self.TEST_START, info='write finger G0~G5,The normal range is [1,100], and the out-of-range values fall within {0,101,65535}')
+        verify_sets = [0, 1, 50, 100, 101, 65535]
+        self.verify_fingers(ROH_FINGER_G0, 'G', verify_sets, default_value=FINGER_G0)
+        
+    @vectorized_verify
+    def test_write_current_limit_all(self):
+        self.print_test_info(status=self.TEST_START, info='write finger current limit0~5,The normal range is [0,1299], and the out-of-range values fall within {1300,65535}')
+        verify_sets = [0, 600, 1299, 1300, 65535]
+        self.verify_fingers(ROH_FINGER_CURRENT_LIMIT0, 'CURRENT_LIMIT', verify_sets, default_value=FINGER_CURRENT_LIMIT0)
+        
+    @vectorized_verify
+    def test_write_finger_speed_all(self):
+        self.print_test_info(status=self.TEST_START, info='write finger speed0~5,The normal range is [0,65535]')
+        verify_sets = [0, 1, 32767, 65535]
+        self.verify_fingers(ROH_FINGER_SPEED0, 'SPEED', verify_sets, default_value=FINGER_SPEED0)
+            
     def test_read_finger_pos_target0(self):                                                                                                                                                                                                                                                                                                                                                                                                           
         self.print_test_info(status=self.TEST_START,info='read finger pos target0')
         try:
@@ -2686,6 +2839,7 @@ class TestModbusProtocol:
             
     def test_write_finger_pos_target0(self):
         self.print_test_info(status=self.TEST_START, info='write finger pos target0,The normal range is [0,65535]')
+        model = self.get_register_model()
         verify_sets = [
             # 0, 
             # 1,
@@ -2697,10 +2851,11 @@ class TestModbusProtocol:
         
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET0, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET0, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET0, register_count=1)
-                assert abs(read_response.registers[0] - data) <= FINGER_POS_TARGET_MAX_LOSS, f"从寄存器{ROH_FINGER_POS_TARGET0}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n"
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET0, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_POS0, read_response.registers[0], POS_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_POS_TARGET0, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_POS_TARGET0}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_POS_TARGET0}>失败,发生异常: {e}")
@@ -2727,6 +2882,7 @@ class TestModbusProtocol:
             
     def test_write_finger_pos_target1(self):
         self.print_test_info(status=self.TEST_START, info='write finger pos target1,The normal range is [0,65535]')
+        model = self.get_register_model()
         verify_sets = [
             0, 
             1,
@@ -2737,10 +2893,11 @@ class TestModbusProtocol:
         
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET1, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET1, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET1, register_count=1)
-                assert abs(read_response.registers[0] - data) <= FINGER_POS_TARGET_MAX_LOSS, f"从寄存器{ROH_FINGER_POS_TARGET1}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n"
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET1, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_POS1, read_response.registers[0], POS_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_POS_TARGET1, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_POS_TARGET1}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_POS_TARGET1}>失败,发生异常: {e}")
@@ -2767,6 +2924,7 @@ class TestModbusProtocol:
             
     def test_write_finger_pos_target2(self):
         self.print_test_info(status=self.TEST_START, info='write finger pos target2,The normal range is [0,65535]')
+        model = self.get_register_model()
         verify_sets = [
             0, 
             1,
@@ -2777,10 +2935,11 @@ class TestModbusProtocol:
         
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET2, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET2, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET2, register_count=1)
-                assert abs(read_response.registers[0] - data) <= FINGER_POS_TARGET_MAX_LOSS, f"从寄存器{ROH_FINGER_POS_TARGET2}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n"
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET2, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_POS2, read_response.registers[0], POS_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_POS_TARGET2, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_POS_TARGET2}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_POS_TARGET2}>失败,发生异常: {e}")
@@ -2807,6 +2966,7 @@ class TestModbusProtocol:
             
     def test_write_finger_pos_target3(self):
         self.print_test_info(status=self.TEST_START, info='write finger pos target3,The normal range is [0,65535]')
+        model = self.get_register_model()
         verify_sets = [
             0, 
             1,
@@ -2817,10 +2977,11 @@ class TestModbusProtocol:
         
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET3, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET3, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET3, register_count=1)
-                assert abs(read_response.registers[0] - data) <= FINGER_POS_TARGET_MAX_LOSS, f"从寄存器{ROH_FINGER_POS_TARGET3}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n"
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET3, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_POS3, read_response.registers[0], POS_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_POS_TARGET3, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_POS_TARGET3}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_POS_TARGET3}>失败,发生异常: {e}")
@@ -2847,6 +3008,7 @@ class TestModbusProtocol:
             
     def test_write_finger_pos_target4(self):
         self.print_test_info(status=self.TEST_START, info='write finger pos target4,The normal range is [0,65535]')
+        model = self.get_register_model()
         verify_sets = [
             0, 
             1,
@@ -2857,10 +3019,11 @@ class TestModbusProtocol:
         
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET4, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET4, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET4, register_count=1)
-                assert abs(read_response.registers[0] - data) <= FINGER_POS_TARGET_MAX_LOSS, f"从寄存器{ROH_FINGER_POS_TARGET4}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n"
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET4, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_POS4, read_response.registers[0], POS_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_POS_TARGET4, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_POS_TARGET4}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_POS_TARGET4}>失败,发生异常: {e}")
@@ -2887,6 +3050,7 @@ class TestModbusProtocol:
     
     def test_write_finger_pos_target5(self): #从寄存器1140读出的值728与写入的值0比较
         self.print_test_info(status=self.TEST_START, info='write finger pos target5,The normal range is [0,65535]')
+        model = self.get_register_model()
         verify_sets = [
             0, 
             1,
@@ -2898,13 +3062,11 @@ class TestModbusProtocol:
         
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET5, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_POS_TARGET5, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET5, register_count=1)
-                if index in(0,1,2):
-                    assert read_response.registers[0] == FINGER_POS_TARGET5, f"从寄存器{ROH_FINGER_POS_TARGET5}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n"
-                else:    
-                    assert abs(read_response.registers[0] - data) <= FINGER_POS_TARGET_MAX_LOSS, f"从寄存器{ROH_FINGER_POS_TARGET5}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n"
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET5, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_POS5, read_response.registers[0], POS_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_POS_TARGET5, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_POS_TARGET5}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_POS_TARGET5}>失败,发生异常: {e}")
@@ -2979,42 +3141,65 @@ class TestModbusProtocol:
             logger.error(f"读取寄存器<{ROH_FINGER_POS5}>失败,发生异常: {e}")
             pytest.fail(f'读取寄存器<{ROH_FINGER_POS5}>失败,发生异常')
             
+    def get_limits(self):
+        """
+        角度限位只和设备及固件版本有关，探测结果持久化到磁盘，同一版本的设备只探测一次。
+        """
+        if TestModbusProtocol.limits is None:
+            TestModbusProtocol.limits = LimitsDiscovery(bus=self.bus)
+        TestModbusProtocol.limits.bus = self.bus
+        return TestModbusProtocol.limits
+
+    def get_register_model(self):
+        """
+        用 LimitsDiscovery 已探测的限位生成寄存器写入语义模型，各手指目标寄存器的期望读回值都由模型给出。
+        """
+        return RegisterModel.from_limits(self.get_limits())
+
+    def assert_target(self, model, address, value, read_value):
+        """
+        按参考模型判定写入 value 后读回的 read_value：超出限位的值应钳位到限位，范围内的值允许精度损失。
+        """
+        _, expected, tolerance = model.predict(address, value)
+        expected, tolerance = int(expected), int(tolerance)
+        assert abs(read_value - expected) <= tolerance, f'从寄存器{address}读出的值{read_value}与写入的值{value}比较，精度损失不符合要求(期望{expected}±{tolerance})\n'
+        
     def get_min_angle(self,addr):
         values = 0
-        if write_registers(bus=self.bus,start_address=addr,data=values):
-           response = read_registers(bus=self.bus,start_address=addr,register_count=1)
-           logger.info(f'get min angle : {addr} ->{response.registers[0]}')
-           return response.registers[0]
+        result = self.get_limits().get_limit(address=addr, value=values)
+        if result is not None:
+           logger.info(f'get min angle : {addr} ->{result}')
+           return result
         else:
             logger.info(f'get min angle : {addr} 尝试获取最小值失败')
             return 0
         
     def get_max_angle(self,addr):
         values = 32767
-        if write_registers(bus=self.bus,start_address=addr,data=values):
-           response = read_registers(bus=self.bus,start_address=addr,register_count=1)
-           logger.info(f'get max angle : {addr} ->{response.registers[0]}')
-           return response.registers[0]
+        result = self.get_limits().get_limit(address=addr, value=values)
+        if result is not None:
+           logger.info(f'get max angle : {addr} ->{result}')
+           return result
         else:
             logger.info(f'get max angle : {addr} 尝试获取最大值失败')
             return 32767
         
     def get_max_negative_angle(self,addr):
         values = 32768
-        if write_registers(bus=self.bus,start_address=addr,data=values):
-           response = read_registers(bus=self.bus,start_address=addr,register_count=1)
-           logger.info(f'get max negative angle : {addr} ->{response.registers[0]}')
-           return response.registers[0]
+        result = self.get_limits().get_limit(address=addr, value=values)
+        if result is not None:
+           logger.info(f'get max negative angle : {addr} ->{result}')
+           return result
         else:
             logger.info(f'get max negative angle : {addr} 尝试获取最大负值失败')
             return 32768
         
     def get_min_negative_angle(self,addr):
         values = 65535
-        if write_registers(bus=self.bus,start_address=addr,data=values):
-           response = read_registers(bus=self.bus,start_address=addr,register_count=1)
-           logger.info(f'get min negative angle : {addr} ->{response.registers[0]}')
-           return response.registers[0]
+        result = self.get_limits().get_limit(address=addr, value=values)
+        if result is not None:
+           logger.info(f'get min negative angle : {addr} ->{result}')
+           return result
         else:
             logger.info(f'get max negative angle : {addr} 尝试获取最小负值失败')
             return 65535
@@ -3036,6 +3221,7 @@ class TestModbusProtocol:
         NORMAL_ANGLE= int(MIN_ANGLE + (MAX_ANGLE - MIN_ANGLE)/2)
         MIN_NEG_ANGLE = self.get_min_negative_angle(addr=ROH_FINGER_ANGLE_TARGET0)
         MAX_NEG_ANGLE = self.get_max_negative_angle(addr=ROH_FINGER_ANGLE_TARGET0)
+        model = self.get_register_model()
         # NORMAL_NEG_ANGLE= int(MIN_NEG_ANGLE + (MAX_NEG_ANGLE - MIN_NEG_ANGLE)/2)
         verify_sets = [
             0, 
@@ -3050,21 +3236,11 @@ class TestModbusProtocol:
         ]
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET0, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET0, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET0, register_count=1)
-                if index == 0:
-                    assert read_response.registers[0] == MIN_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET0}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (1,2,3):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET0}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index == 4:
-                    assert read_response.registers[0] == MAX_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET0}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index == 5:
-                     assert read_response.registers[0] == MAX_NEG_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET0}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (6,7):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET0}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                else:
-                    assert read_response.registers[0] == MIN_NEG_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET0}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET0, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_ANGLE0, read_response.registers[0], ANGLE_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_ANGLE_TARGET0, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_ANGLE_TARGET0}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_ANGLE_TARGET0}>失败,发生异常: {e}")
@@ -3096,6 +3272,7 @@ class TestModbusProtocol:
         NORMAL_ANGLE= int(MIN_ANGLE + (MAX_ANGLE - MIN_ANGLE)/2)
         MIN_NEG_ANGLE = self.get_min_negative_angle(addr=ROH_FINGER_ANGLE_TARGET1)
         MAX_NEG_ANGLE = self.get_max_negative_angle(addr=ROH_FINGER_ANGLE_TARGET1)
+        model = self.get_register_model()
         verify_sets = [
             0, 
             MIN_ANGLE,
@@ -3109,19 +3286,11 @@ class TestModbusProtocol:
         ]
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET1, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET1, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET1, register_count=1)
-                if index == 0:
-                    assert read_response.registers[0] == MIN_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET1}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (1,2,3):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET1}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index == 4 :
-                    assert read_response.registers[0] == MAX_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET1}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (6,7):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET1}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                else:
-                    assert read_response.registers[0] == MIN_NEG_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET1}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET1, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_ANGLE1, read_response.registers[0], ANGLE_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_ANGLE_TARGET1, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_ANGLE_TARGET1}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_ANGLE_TARGET1}>失败,发生异常: {e}")
@@ -3154,6 +3323,7 @@ class TestModbusProtocol:
         NORMAL_ANGLE= int(MIN_ANGLE + (MAX_ANGLE - MIN_ANGLE)/2)
         MIN_NEG_ANGLE = self.get_min_negative_angle(addr=ROH_FINGER_ANGLE_TARGET2)
         MAX_NEG_ANGLE = self.get_max_negative_angle(addr=ROH_FINGER_ANGLE_TARGET2)
+        model = self.get_register_model()
         verify_sets = [
             0, 
             MIN_ANGLE,
@@ -3167,19 +3337,11 @@ class TestModbusProtocol:
         ]
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET2, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET2, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET2, register_count=1)
-                if index == 0:
-                    assert read_response.registers[0] == MIN_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET2}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (1,2,3):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET2}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index == 4 :
-                    assert read_response.registers[0] == MAX_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET2}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (6,7):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET2}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                else:
-                    assert read_response.registers[0] == MIN_NEG_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET2}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET2, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_ANGLE2, read_response.registers[0], ANGLE_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_ANGLE_TARGET2, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_ANGLE_TARGET2}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_ANGLE_TARGET2}>失败,发生异常: {e}")
@@ -3212,6 +3374,7 @@ class TestModbusProtocol:
         NORMAL_ANGLE= int(MIN_ANGLE + (MAX_ANGLE - MIN_ANGLE)/2)
         MIN_NEG_ANGLE = self.get_min_negative_angle(addr=ROH_FINGER_ANGLE_TARGET3)
         MAX_NEG_ANGLE = self.get_max_negative_angle(addr=ROH_FINGER_ANGLE_TARGET3)
+        model = self.get_register_model()
         verify_sets = [
             0, 
             MIN_ANGLE,
@@ -3225,19 +3388,11 @@ class TestModbusProtocol:
         ]
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET3, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET3, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET3, register_count=1)
-                if index == 0:
-                    assert read_response.registers[0] == MIN_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET3}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (1,2,3):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET3}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index == 4 :
-                    assert read_response.registers[0] == MAX_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET3}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (6,7):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET3}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                else:
-                    assert read_response.registers[0] == MIN_NEG_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET3}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET3, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_ANGLE3, read_response.registers[0], ANGLE_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_ANGLE_TARGET3, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_ANGLE_TARGET3}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_ANGLE_TARGET3}>失败,发生异常: {e}")
@@ -3270,6 +3425,7 @@ class TestModbusProtocol:
         NORMAL_ANGLE= int(MIN_ANGLE + (MAX_ANGLE - MIN_ANGLE)/2)
         MIN_NEG_ANGLE = self.get_min_negative_angle(addr=ROH_FINGER_ANGLE_TARGET4)
         MAX_NEG_ANGLE = self.get_max_negative_angle(addr=ROH_FINGER_ANGLE_TARGET4)
+        model = self.get_register_model()
         verify_sets = [
             0, 
             MIN_ANGLE,
@@ -3283,19 +3439,11 @@ class TestModbusProtocol:
         ]
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET4, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET4, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET4, register_count=1)
-                if index == 0:
-                    assert read_response.registers[0] == MIN_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET4}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (1,2,3):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET4}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index == 4 :
-                    assert read_response.registers[0] == MAX_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET4}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (6,7):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET4}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                else:
-                    assert read_response.registers[0] == MIN_NEG_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET4}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET4, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_ANGLE4, read_response.registers[0], ANGLE_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_ANGLE_TARGET4, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_ANGLE_TARGET4}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_ANGLE_TARGET4}>失败,发生异常: {e}")
@@ -3328,6 +3476,7 @@ class TestModbusProtocol:
         NORMAL_ANGLE= int(MIN_ANGLE + (MAX_ANGLE - MIN_ANGLE)/2)
         MIN_NEG_ANGLE = self.get_min_negative_angle(addr=ROH_FINGER_ANGLE_TARGET5)
         MAX_NEG_ANGLE = self.get_max_negative_angle(addr=ROH_FINGER_ANGLE_TARGET5)
+        model = self.get_register_model()
         verify_sets = [
             0, 
             MIN_ANGLE,
@@ -3341,19 +3490,11 @@ class TestModbusProtocol:
         ]
         for index,value in enumerate(verify_sets):
             try:
-                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET5, data=value)
+                response = write_registers(self.bus, start_address=ROH_FINGER_ANGLE_TARGET5, data=value, wait_time=0)
                 data = value
-                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET5, register_count=1)
-                if index == 0:
-                    assert read_response.registers[0] == MIN_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET5}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (1,2,3):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET5}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index == 4 :
-                    assert read_response.registers[0] == MAX_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET5}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                elif index in (6,7):
-                    assert abs(read_response.registers[0] - data) <= FINGER_ANGLE_TARGET_MAX_LOSS,f'从寄存器{ROH_FINGER_ANGLE_TARGET5}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
-                else:
-                    assert read_response.registers[0] == MIN_NEG_ANGLE,f'从寄存器{ROH_FINGER_ANGLE_TARGET5}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失不符合要求\n'
+                read_response = read_registers(bus=self.bus, start_address=ROH_FINGER_ANGLE_TARGET5, register_count=1, wait_time=0)
+                self.wait_settle(ROH_FINGER_ANGLE5, read_response.registers[0], ANGLE_TOLERANCE)
+                self.assert_target(model, ROH_FINGER_ANGLE_TARGET5, data, read_response.registers[0])
                 logger.info(f"从寄存器{ROH_FINGER_ANGLE_TARGET5}读出的值{read_response.registers[0]}与写入的值{data}比较，精度损失符合要求\n")
             except Exception as e:
                     logger.error(f"写寄存器<{ROH_FINGER_ANGLE_TARGET5}>失败,发生异常: {e}")
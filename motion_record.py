@@ -0,0 +1,151 @@
+import time
+import logging
+
+import numpy as np
+
+from mobus_operator import (setup_modbus, close_modbus, read_registers, write_registers, bus_transaction, wait_until,
+                            NODE_ID, NUM_FINGERS, ROH_FINGER_POS0, ROH_FINGER_POS_TARGET0)
+from motion_wait import wait_converged, POS_TOLERANCE
+from trajectory import TrajectoryStreamer, TRAJECTORY_START_DELAY
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+RECORD_RATE = 200 # 录制采样率（Hz），回放时每个样本一帧 FC16
+RECORD_FILE = 'roh_motion.npz' # 默认录制文件
+REPLAY_TOLERANCE = 0.005 # 回放时发送时刻与录制时刻的允许偏差（p99，秒），已按时间缩放
+
+
+class MotionRecording:
+    """
+    一段录制的动作：t 为相对第一个样本的时间（秒），pos 形状为 (样本数, 6) 的 uint16。
+    """
+
+    def __init__(self, t, pos, node_id=NODE_ID, rate=RECORD_RATE):
+        self.t = t
+        self.pos = pos
+        self.node_id = node_id
+        self.rate = rate
+
+    @property
+    def duration(self):
+        return float(self.t[-1]) if len(self.t) else 0.0
+
+    def save(self, path=RECORD_FILE):
+        np.savez_compressed(path, t=self.t, pos=self.pos, node_id=self.node_id, rate=self.rate)
+
+    @classmethod
+    def load(cls, path=RECORD_FILE):
+        with np.load(path) as data:
+            return cls(data['t'], data['pos'], int(data['node_id']), float(data['rate']))
+
+    def __repr__(self):
+        return f'MotionRecording(samples={len(self.t)}, duration={self.duration:.3f}, rate={self.rate})'
+
+
+def record(bus, duration, rate=RECORD_RATE, node_id=NODE_ID):
+    """
+    按固定采样率录制 ROH_FINGER_POS0~5（示教或脚本运行期间），样本直接写入预分配的数组。
+    RtuFastTransport 把响应的原始字节复制进数组，不生成寄存器列表；落后超过一个周期的采样点跳过。
+    :return: MotionRecording
+    """
+    capacity = int(duration * rate) + 1
+    t = np.empty(capacity, dtype=np.float64)
+    pos = np.empty((capacity, NUM_FINGERS), dtype='>u2')
+    row_size = NUM_FINGERS * 2
+    raw = memoryview(pos).cast('B')
+    fast = hasattr(bus, 'read_raw_into')
+    period = 1 / rate
+    perf_counter = time.perf_counter
+    begin = perf_counter() + TRAJECTORY_START_DELAY
+    count = failures = 0
+    for index in range(capacity):
+        deadline = begin + index * period
+        if perf_counter() > deadline + period:
+            continue
+        wait_until(deadline)
+        now = perf_counter()
+        if fast:
+            try:
+                with bus_transaction(bus):
+                    ok = bus.read_raw_into(ROH_FINGER_POS0, NUM_FINGERS, raw[count * row_size:(count + 1) * row_size],
+                                           node_id)
+            except Exception:
+                ok = False
+        else:
+            response = read_registers(bus=bus, start_address=ROH_FINGER_POS0, register_count=NUM_FINGERS,
+                                      node_id=node_id, wait_time=0, retry_policy=None)
+            ok = response is not None and not response.isError()
+            if ok:
+                pos[count] = response.registers
+        if not ok:
+            failures += 1
+            continue
+        t[count] = now
+        count += 1
+    if failures:
+        logger.error(f'[node_id = {node_id}]录制时{failures}次读取失败')
+    recording = MotionRecording(t[:count] - t[0] if count else t[:0], pos[:count].astype(np.uint16), node_id, rate)
+    logger.info(f'[node_id = {node_id}]录制完成: {recording}')
+    return recording
+
+
+def replay(bus, recording, time_scale=1.0, node_id=None, tolerance=REPLAY_TOLERANCE):
+    """
+    先移动到第一个样本的位置，再按录制的时刻把位置作为 ROH_FINGER_POS_TARGET0~5 流式发送。
+    回放期间每个节拍都占用总线，这里不读取中间位置，只在结束后确认停在最后一个样本的位置；
+    需要比对完整轨迹时，在回放的同时用 record() 从另一个线程或进程（BusHandle）采样，再调用 compare_traces()。
+    :param time_scale: 时间缩放，2 表示以一半速度回放
+    :return: (StreamStats, 发送时刻偏差在 tolerance 以内且最终位置与最后一个样本一致)
+    """
+    node_id = recording.node_id if node_id is None else node_id
+    if not len(recording.t):
+        return None, False
+    start = recording.pos[0].tolist()
+    if write_registers(bus=bus, start_address=ROH_FINGER_POS_TARGET0, data=start, node_id=node_id, wait_time=0):
+        wait_converged(bus, ROH_FINGER_POS0, start, POS_TOLERANCE, node_id=node_id)
+    stats = TrajectoryStreamer(bus, node_id).play(recording.t, recording.pos, time_scale=time_scale)
+    summary = stats.summary()
+    within = stats.sent > 0 and summary['jitter_p99'] <= tolerance
+    if not within:
+        logger.error(f'[node_id = {node_id}]回放时刻偏差超出 {tolerance}s: {summary}')
+    final = wait_converged(bus, ROH_FINGER_POS0, recording.pos[-1].tolist(), POS_TOLERANCE, node_id=node_id)
+    if not final.converged:
+        logger.error(f'[node_id = {node_id}]回放结束位置与录制不一致: {final.values} != {recording.pos[-1].tolist()}')
+    return stats, within and final.converged
+
+
+def compare_traces(reference, measured, time_scale=1.0):
+    """
+    比对两段同时开始的录制（如原始录制与回放期间的录制），把 measured 按时间插值到 reference 的采样时刻。
+    :param time_scale: 回放时使用的时间缩放
+    :return: 形状 (6,) 的每根手指最大位置偏差，measured 为空时返回 None
+    """
+    if not len(reference.t) or not len(measured.t):
+        return None
+    t = reference.t * time_scale
+    errors = np.empty(NUM_FINGERS)
+    for finger in range(NUM_FINGERS):
+        replayed = np.interp(t, measured.t, measured.pos[:, finger].astype(np.float64))
+        errors[finger] = np.max(np.abs(replayed - reference.pos[:, finger]))
+    return errors
+
+
+if __name__ == "__main__":
+    # 初始化 modbus 总线
+    bus = setup_modbus()
+
+    if bus:
+        # 录制 10 秒示教动作，保存后按原速回放
+        logger.info('开始录制')
+        recording = record(bus, 10)
+        recording.save()
+        replay(bus, MotionRecording.load())
+        close_modbus(bus)
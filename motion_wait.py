@@ -0,0 +1,107 @@
+import time
+import logging
+
+from mobus_operator import read_registers, NODE_ID, ROH_FINGER_ANGLE_TARGET0, ROH_FINGER_ANGLE0
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+CONVERGE_TIMEOUT = 3 # 等待到位的超时时间（秒）
+CONVERGE_POLL_PERIOD = 0 # 轮询间隔（秒），0 表示总线允许的最高速率
+STABLE_SAMPLES = 3 # 连续多少个样本在误差范围内且不再变化才视为到位
+STALL_TIME = 0.3 # 开始运动后超过该时间位置变化不超过误差但未到达目标时视为停住（被阻挡），提前返回（秒）
+POS_TOLERANCE = 655 # ROH_FINGER_POS* 到位误差，约为全行程的 1%
+ANGLE_TOLERANCE = 100 # ROH_FINGER_ANGLE* 到位误差
+
+
+def _distance(value, target, wrap=False):
+    # 角度寄存器按 int16 取差值，负半区也能正确比较；位置寄存器 0 和 65535 是行程的两端，不能回绕
+    if wrap:
+        return abs(((value - target + 32768) & 0xFFFF) - 32768)
+    return abs(value - target)
+
+
+def _is_angle(address):
+    return (ROH_FINGER_ANGLE_TARGET0 <= address < ROH_FINGER_ANGLE_TARGET0 + 10 or
+            ROH_FINGER_ANGLE0 <= address < ROH_FINGER_ANGLE0 + 10)
+
+
+class ConvergenceResult:
+    def __init__(self, converged, elapsed, values, samples):
+        self.converged = converged # 是否到位
+        self.elapsed = elapsed # 到位耗时（秒），从开始等待到首次进入稳定区间；未到位时为总等待时间
+        self.values = values # 最后一次读到的值
+        self.samples = samples # 轮询次数
+
+    def __repr__(self):
+        return f'ConvergenceResult(converged={self.converged}, elapsed={self.elapsed:.3f}, values={self.values}, samples={self.samples})'
+
+
+def wait_converged(bus, address, targets, tolerance, node_id=NODE_ID, timeout=CONVERGE_TIMEOUT,
+                   poll_period=CONVERGE_POLL_PERIOD, stable_samples=STABLE_SAMPLES, stall_time=STALL_TIME,
+                   begin=None, abort=None, on_poll=None):
+    """
+    指令发出后高速轮询从 address 开始的一段反馈寄存器，全部进入 targets 的误差范围并保持稳定即返回。
+    停住判断（stall_time）从观察到第一次运动开始计时，指令生效前的静止只受 timeout 限制。
+    :param targets: 每个寄存器的目标值
+    :param begin: 计时起点（time.perf_counter()），默认为调用时刻，可传入发出指令的时刻
+    :param abort: threading.Event，置位时立即返回未到位（如 StallDetector.fault_event）
+    :param on_poll: 每次轮询后调用，如 lambda: detector.poll(bus)，在同一线程内更新 abort
+    :return: ConvergenceResult
+    """
+    begin = time.perf_counter() if begin is None else begin
+    wrap = _is_angle(address)
+    previous = None
+    anchor = None
+    started = False
+    last_move_time = begin
+    stable = 0
+    first_stable_time = None
+    values = None
+    samples = 0
+    while True:
+        response = read_registers(bus=bus, start_address=address, register_count=len(targets),
+                                  node_id=node_id, wait_time=0)
+        now = time.perf_counter()
+        if response is not None and not response.isError():
+            samples += 1
+            values = response.registers
+            moving = previous is None or any(_distance(v, p, wrap) > tolerance for v, p in zip(values, previous))
+            within = all(_distance(v, t, wrap) <= tolerance for v, t in zip(values, targets))
+            if anchor is None or any(_distance(v, a, wrap) > tolerance for v, a in zip(values, anchor)):
+                # 第一个样本只作为参考点，之后偏离超过误差才算开始运动
+                started = anchor is not None
+                anchor = values
+                last_move_time = now
+            if not within:
+                stable = 0
+                first_stable_time = None
+            elif first_stable_time is None or moving:
+                # 进入误差范围（或在范围内仍有跳变），重新开始计数
+                stable = 1
+                first_stable_time = now
+            else:
+                stable += 1
+            previous = values
+            if stable >= stable_samples:
+                return ConvergenceResult(True, first_stable_time - begin, values, samples)
+            if started and not within and now - last_move_time >= stall_time:
+                logger.info(f'[node_id = {node_id}]寄存器{address}停在{values}, 目标{targets}')
+                return ConvergenceResult(False, now - begin, values, samples)
+        if on_poll is not None:
+            on_poll()
+        if abort is not None and abort.is_set():
+            logger.info(f'[node_id = {node_id}]寄存器{address}等待到位被中止, 当前{values}, 目标{targets}')
+            return ConvergenceResult(False, now - begin, values, samples)
+        if now - begin >= timeout:
+            logger.info(f'[node_id = {node_id}]寄存器{address}等待到位超时({timeout}s), 当前{values}, 目标{targets}')
+            return ConvergenceResult(False, now - begin, values, samples)
+        if poll_period:
+            time.sleep(poll_period)
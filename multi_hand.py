@@ -0,0 +1,130 @@
+import threading
+import time
+import logging
+
+from mobus_operator import (setup_modbus, close_modbus, write_registers, build_write_frame, wait_until, NODE_ID,
+                            FC_WRITE_MULTIPLE_REGISTERS, ROH_FINGER_POS_TARGET0)
+from gesture_library import read_finger_pos, MOTION_START_THRESHOLD, MOTION_START_TIMEOUT
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+SYNC_LEAD_TIME = 0.02 # 所有线程就绪后到统一发送时刻的提前量（秒）
+SYNC_BARRIER_TIMEOUT = 5 # 等待其它线程到达屏障的最长时间（秒），超时则所有线程都不发送
+
+
+class Hand:
+    def __init__(self, bus, node_id=NODE_ID, name=None):
+        self.bus = bus
+        self.node_id = node_id
+        self.name = name if name is not None else f'{id(bus):x}:{node_id}'
+
+
+def _send(hand, frame, start_address, values):
+    if hasattr(hand.bus, 'send_frame'):
+        try:
+            return not hand.bus.send_frame(frame, FC_WRITE_MULTIPLE_REGISTERS, hand.node_id).isError()
+        except Exception as e:
+            logger.error(f'[node_id = {hand.node_id}]发送运动指令异常: {e}')
+            return False
+    return write_registers(bus=hand.bus, start_address=start_address, data=values, node_id=hand.node_id, wait_time=0)
+
+
+class SynchronizedMotion:
+    """
+    多手同步运动：预先为每只手生成 FC16 帧，同一总线上的手由一个线程背靠背发送，
+    不同串口各用一个线程，所有线程在屏障处会合后等待同一个发送时刻，再通过位置遥测测量实际启动偏差。
+    """
+
+    def __init__(self, hands, start_address=ROH_FINGER_POS_TARGET0):
+        names = [hand.name for hand in hands]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate hand names: {names}")
+        self.hands = hands
+        self.start_address = start_address
+        # 按总线分组，同一条总线只能串行发送
+        self.groups = {}
+        for hand in hands:
+            self.groups.setdefault(id(hand.bus), []).append(hand)
+
+    def move(self, targets, lead_time=SYNC_LEAD_TIME, measure=True, threshold=MOTION_START_THRESHOLD,
+             timeout=MOTION_START_TIMEOUT, barrier_timeout=SYNC_BARRIER_TIMEOUT):
+        """
+        任一线程在屏障前出错或等待超时，屏障被破坏，所有线程都放弃发送，避免只有部分手运动。
+        :param targets: 与 hands 一一对应的 6 个目标值
+        :return: {'issue_time': {手: 发送时刻}, 'issue_skew': 发送偏差,
+                  'motion_start': {手: 开始运动时刻}, 'motion_skew': 启动偏差}，时刻为 time.perf_counter()
+        """
+        if len(targets) != len(self.hands):
+            raise ValueError(f"Invalid targets: {targets}")
+        frames = {hand.name: (build_write_frame(hand.node_id, self.start_address, values), list(values))
+                  for hand, values in zip(self.hands, targets)}
+        state = {}
+        barrier = threading.Barrier(len(self.groups),
+                                    action=lambda: state.__setitem__('deadline', time.perf_counter() + lead_time))
+        issue_time = {}
+        motion_start = {}
+        lock = threading.Lock()
+
+        def run_group(group):
+            try:
+                start_pos = {hand.name: read_finger_pos(hand.bus, hand.node_id) for hand in group} if measure else {}
+                barrier.wait(barrier_timeout)
+                wait_until(state['deadline'])
+                for hand in group:
+                    frame, values = frames[hand.name]
+                    sent_time = time.perf_counter()
+                    if _send(hand, frame, self.start_address, values):
+                        with lock:
+                            issue_time[hand.name] = sent_time
+                pending = [hand for hand in group if hand.name in issue_time and start_pos.get(hand.name) is not None]
+                while pending and time.perf_counter() - state['deadline'] < timeout:
+                    for hand in list(pending):
+                        pos = read_finger_pos(hand.bus, hand.node_id)
+                        if pos is not None and any(abs(p - s) > threshold for p, s in zip(pos, start_pos[hand.name])):
+                            with lock:
+                                motion_start[hand.name] = time.perf_counter()
+                            pending.remove(hand)
+            except threading.BrokenBarrierError:
+                logger.error(f'{[hand.name for hand in group]}同步屏障失效（其它线程出错或等待超时），取消发送')
+            except Exception as e:
+                # 让仍在屏障处等待的线程立即放弃，而不是一直阻塞
+                barrier.abort()
+                logger.error(f'{[hand.name for hand in group]}同步运动异常: {e}')
+
+        threads = [threading.Thread(target=run_group, args=(group,), name=f'roh-sync-{index}', daemon=True)
+                   for index, group in enumerate(self.groups.values())]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        result = {'issue_time': issue_time,
+                  'issue_skew': max(issue_time.values()) - min(issue_time.values()) if issue_time else None,
+                  'motion_start': motion_start,
+                  'motion_skew': None}
+        if measure and len(motion_start) == len(self.hands):
+            result['motion_skew'] = max(motion_start.values()) - min(motion_start.values())
+        logger.info(f"同步运动: 发送偏差 {result['issue_skew']}, 启动偏差 {result['motion_skew']}")
+        return result
+
+
+if __name__ == "__main__":
+    # 两只手接在两个串口上（左手 COM3，右手 COM4），设备ID均为默认值
+    left = setup_modbus(port='COM3')
+    right = setup_modbus(port='COM4')
+
+    if left and right:
+        motion = SynchronizedMotion([Hand(left, name='left'), Hand(right, name='right')])
+        motion.move([[65535, 65535, 65535, 65535, 65535, 0]] * 2)
+        time.sleep(2)
+        motion.move([[0, 0, 0, 0, 0, 0]] * 2)
+    for bus in (left, right):
+        if bus:
+            close_modbus(bus)
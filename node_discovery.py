@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from mobus_operator import (RtuFastTransport, PORT, NODE_ID, FAILURE_EXCEPTION_RESPONSE, classify_failure,
+                            get_bus_timeout, set_bus_timeout)
+
+try:
+    from serial.tools import list_ports
+except ImportError:
+    list_ports = None
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+ROH_PROTOCOL_VERSION      = (1000) # R
+DISCOVERY_TIMEOUT = 0.02 # 单个设备ID的等待时间（秒），115200bps 下一次单寄存器读往返约 2ms
+DISCOVERY_ID_RANGE = range(1, 248) # Modbus 合法的设备ID
+NODE_CACHE_FILE = 'roh_node_cache.json' # 每个串口上次发现的设备ID
+REBOOT_POLL_PERIOD = 0.05 # 等待设备重启时的轮询间隔（秒）
+
+
+def probe_node(bus, node_id):
+    """
+    读取 ROH_PROTOCOL_VERSION 判断设备ID是否在线，收到正常响应或设备异常响应都视为在线；
+    超时（旧版 pymodbus 以返回值而不是异常的形式给出 ModbusIOException）、CRC 错误等视为不在线。
+    """
+    try:
+        response = bus.read_holding_registers(address=ROH_PROTOCOL_VERSION, count=1, slave=node_id)
+    except Exception:
+        return False
+    if isinstance(response, Exception):
+        return False
+    return not response.isError() or classify_failure(response) == FAILURE_EXCEPTION_RESPONSE
+
+
+def _ordered_ids(hints, id_range):
+    order = []
+    for node_id in list(hints) + list(id_range):
+        if node_id not in order:
+            order.append(node_id)
+    return order
+
+
+def sweep(bus, hints=(), find_all=False, id_range=DISCOVERY_ID_RANGE, timeout=DISCOVERY_TIMEOUT):
+    """
+    按提示ID优先的顺序扫描设备ID。
+    :param find_all: 为 False 时找到第一个设备即返回
+    :return: 在线的设备ID列表
+    """
+    found = []
+    original_timeout = get_bus_timeout(bus)
+    set_bus_timeout(bus, timeout)
+    try:
+        for node_id in _ordered_ids(hints, id_range):
+            if probe_node(bus, node_id):
+                found.append(node_id)
+                if not find_all:
+                    break
+    finally:
+        if original_timeout is not None:
+            set_bus_timeout(bus, original_timeout)
+    return found
+
+
+def wait_for_node(bus, hints, timeout=60, poll_period=REBOOT_POLL_PERIOD, probe_timeout=DISCOVERY_TIMEOUT):
+    """
+    设备重启（如修改设备ID）后按短超时轮询提示的设备ID，设备一上线就返回，代替固定间隔的重连等待。
+    :return: 上线的设备ID，超时返回 None
+    """
+    deadline = time.perf_counter() + timeout
+    original_timeout = get_bus_timeout(bus)
+    set_bus_timeout(bus, probe_timeout)
+    try:
+        while time.perf_counter() < deadline:
+            for node_id in hints:
+                if probe_node(bus, node_id):
+                    return node_id
+            time.sleep(poll_period)
+    finally:
+        if original_timeout is not None:
+            set_bus_timeout(bus, original_timeout)
+    return None
+
+
+def open_probe_bus(port, timeout=DISCOVERY_TIMEOUT):
+    bus = RtuFastTransport(port=port, timeout=timeout)
+    return bus if bus.connect() else None
+
+
+def list_serial_ports():
+    if list_ports is None:
+        return [PORT]
+    return [info.device for info in list_ports.comports()]
+
+
+class NodeDiscovery:
+    """
+    设备ID发现：在每个串口上用短超时扫描 1~247，多个串口并行，结果按串口缓存，下次优先探测缓存和提示的ID。
+    """
+
+    def __init__(self, ports=None, path=NODE_CACHE_FILE, timeout=DISCOVERY_TIMEOUT, bus_factory=open_probe_bus):
+        self.ports = ports if ports is not None else list_serial_ports()
+        self.path = path
+        self.timeout = timeout
+        self.bus_factory = bus_factory
+        self.lock = threading.Lock()
+        self.cache = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f'读取设备ID缓存{path}失败: {e}')
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, indent=2, sort_keys=True)
+
+    def discover_port(self, port, hints=(), find_all=False):
+        bus = self.bus_factory(port, self.timeout)
+        if bus is None:
+            return []
+        begin = time.perf_counter()
+        try:
+            with self.lock:
+                cached = self.cache.get(port, [])
+            found = sweep(bus, hints=list(hints) + cached + [NODE_ID], find_all=find_all, timeout=self.timeout)
+        finally:
+            bus.close()
+        logger.info(f'[port = {port}]发现设备ID {found}, 耗时 {time.perf_counter() - begin:.3f}s')
+        if found:
+            with self.lock:
+                self.cache[port] = found
+        return found
+
+    def discover(self, hints=(), find_all=False):
+        """
+        并行扫描所有串口。
+        :return: {串口: [设备ID, ...]}
+        """
+        if not self.ports:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(self.ports)) as executor:
+            results = executor.map(lambda port: self.discover_port(port, hints, find_all), self.ports)
+            result = dict(zip(self.ports, results))
+        self.save()
+        return result
+
+
+if __name__ == "__main__":
+    discovery = NodeDiscovery()
+    logger.info(f'设备ID: {discovery.discover(find_all=True)}')
@@ -0,0 +1,190 @@
+import itertools
+import time
+import logging
+
+import numpy as np
+
+from mobus_operator import setup_modbus, close_modbus, read_registers, write_registers, NODE_ID, NUM_FINGERS
+from register_model import RegisterModel
+from step_response import StepResponseSuite, step_metrics, ROH_FINGER_P0, PID_REGISTER_COUNT
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+PID_GAIN_COUNT = 4 # P、I、D、G，每个增益 10 个寄存器（6 个手指 + 4 个保留）
+SWEEP_GRID = [[5000, 15000, 25000, 40000], # P
+              [0, 200, 1000], # I
+              [5000, 25000, 45000], # D
+              [100]] # G
+SWEEP_START = 0 # 阶跃起点
+SWEEP_TARGET = 32768 # 阶跃终点（50% 行程）
+SWEEP_DURATION = 1.0 # 每次阶跃的采样时长（秒）
+REFINE_FACTORS = (0.7, 1.4) # 自适应细化时对 Pareto 前沿上每个增益的缩放系数
+REFINE_ROUNDS = 1 # 自适应细化轮数
+
+
+def gain_address(gain, finger):
+    return ROH_FINGER_P0 + gain * 10 + finger
+
+
+def pareto_front(results, x='rise_time', y='overshoot'):
+    """
+    两个指标的 Pareto 前沿，默认为速度（上升时间）与超调量，两者都越小越好，指标为 nan 的结果不参与。
+    :return: 按 x 排序的非支配结果
+    """
+    points = [r for r in results if not np.isnan(r[x]) and not np.isnan(r[y])]
+    points.sort(key=lambda r: (r[x], r[y]))
+    front = []
+    for result in points:
+        # 已按 x 排序，只要 y 比前沿上所有点都小就不被支配
+        if not front or result[y] < front[-1][y]:
+            front.append(result)
+    return front
+
+
+class PidSweep:
+    """
+    PID 参数扫描：6 个手指的 PID 寄存器相互独立，每轮给每个手指分配各自的候选参数，
+    用一帧 FC16 写入全部增益后对 6 个手指同时做一次阶跃，扫描时间约为逐个手指测试的 1/6。
+    每个手指分别维护上升时间与超调量的 Pareto 前沿，并可围绕前沿自适应细化。
+    """
+
+    def __init__(self, bus, node_id=NODE_ID, model=None, start=SWEEP_START, target=SWEEP_TARGET,
+                 duration=SWEEP_DURATION):
+        self.bus = bus
+        self.node_id = node_id
+        self.model = model if model is not None else RegisterModel()
+        self.start = start
+        self.target = target
+        self.duration = duration
+        self.suite = StepResponseSuite(bus, node_id)
+
+    def read_block(self):
+        """
+        :return: ROH_FINGER_P0 开始的 36 个寄存器，读取失败返回 None
+        """
+        response = read_registers(bus=self.bus, start_address=ROH_FINGER_P0, register_count=PID_REGISTER_COUNT,
+                                  node_id=self.node_id, wait_time=0)
+        if response is None or response.isError():
+            return None
+        return list(response.registers)
+
+    def write_gains(self, block, gains):
+        """
+        在读回的整段寄存器上替换各手指的增益，一帧 FC16 写入，保留寄存器原样写回。
+        :param gains: {手指: (P, I, D, G)}
+        """
+        data = list(block)
+        for finger, values in gains.items():
+            for gain, value in enumerate(values):
+                data[gain * 10 + finger] = value
+        return write_registers(bus=self.bus, start_address=ROH_FINGER_P0, data=data, node_id=self.node_id,
+                               wait_time=0)
+
+    def clip(self, finger, gains):
+        """
+        按参考模型把增益限制在设备接受的范围内，超出范围的值设备会忽略。
+        """
+        clipped = []
+        for gain, value in enumerate(gains):
+            rule = self.model.rule(gain_address(gain, finger))
+            clipped.append(int(min(max(round(value), rule.low), rule.high)))
+        return tuple(clipped)
+
+    def evaluate(self, queues, block):
+        """
+        每轮从每个手指的候选队列中各取一组参数，写入后同时阶跃，队列已空的手指保持原参数、不参与本轮。
+        :param queues: {手指: [(P, I, D, G), ...]}
+        :param block: 扫描前读回的 PID 寄存器，作为写入的底稿
+        :return: 结果列表，每项为一个手指一组参数的指标
+        """
+        results = []
+        queues = {finger: list(candidates) for finger, candidates in queues.items() if candidates}
+        rounds = max((len(candidates) for candidates in queues.values()), default=0)
+        for index in range(rounds):
+            gains = {finger: candidates[index] for finger, candidates in queues.items() if index < len(candidates)}
+            if not self.write_gains(block, gains):
+                logger.error(f'[node_id = {self.node_id}]写入PID参数失败: {gains}')
+                continue
+            fingers = sorted(gains)
+            recording = self.suite.run_step(fingers, self.start, self.target, self.duration)
+            if recording is None or not len(recording.t):
+                logger.error(f'[node_id = {self.node_id}]阶跃测试失败: {gains}')
+                continue
+            # 以实际起始位置计算指标，大拇指旋转等有下限的手指不会从 start 开始
+            metrics = step_metrics(recording.t, recording.pos[:, fingers], recording.pos[0, fingers],
+                                   recording.target[fingers])
+            for column, finger in enumerate(fingers):
+                result = {'finger': finger, 'gains': gains[finger]}
+                result.update({name: float(value[column]) for name, value in metrics.items()})
+                results.append(result)
+            logger.info(f'[node_id = {self.node_id}]第{index + 1}/{rounds}轮完成')
+        return results
+
+    def neighbours(self, finger, front, evaluated, factors=REFINE_FACTORS):
+        """
+        对前沿上的每组参数逐个缩放单个增益，生成未测试过的邻近候选。
+        """
+        candidates = []
+        for result in front:
+            for gain, factor in itertools.product(range(PID_GAIN_COUNT), factors):
+                values = list(result['gains'])
+                values[gain] *= factor
+                candidate = self.clip(finger, values)
+                if candidate not in evaluated and candidate not in candidates:
+                    candidates.append(candidate)
+        return candidates
+
+    def run(self, grid=SWEEP_GRID, fingers=range(NUM_FINGERS), rounds=REFINE_ROUNDS):
+        """
+        先扫描网格，再围绕每个手指的 Pareto 前沿细化 rounds 轮，结束后恢复原来的 PID 参数。
+        :return: (全部结果, {手指: Pareto 前沿})
+        """
+        block = self.read_block()
+        if block is None:
+            logger.error(f'[node_id = {self.node_id}]读取PID参数失败')
+            return [], {}
+        begin = time.perf_counter()
+        evaluated = {finger: [] for finger in fingers}
+        queues = {}
+        for finger in fingers:
+            for candidate in itertools.product(*grid):
+                candidate = self.clip(finger, candidate)
+                if candidate not in queues.setdefault(finger, []):
+                    queues[finger].append(candidate)
+        results = []
+        try:
+            for _ in range(rounds + 1):
+                for finger, candidates in queues.items():
+                    evaluated[finger].extend(candidates)
+                results.extend(self.evaluate(queues, block))
+                queues = {finger: self.neighbours(finger, pareto_front([r for r in results if r['finger'] == finger]),
+                                                  evaluated[finger])
+                          for finger in fingers}
+        finally:
+            if not write_registers(bus=self.bus, start_address=ROH_FINGER_P0, data=block, node_id=self.node_id,
+                                   wait_time=0):
+                logger.error(f'[node_id = {self.node_id}]恢复PID参数失败: {block}')
+        fronts = {finger: pareto_front([r for r in results if r['finger'] == finger]) for finger in fingers}
+        logger.info(f'[node_id = {self.node_id}]PID扫描完成, {len(results)}组结果, 耗时 {time.perf_counter() - begin:.1f}s')
+        return results, fronts
+
+
+if __name__ == "__main__":
+    # 初始化 modbus 总线
+    bus = setup_modbus()
+
+    if bus:
+        results, fronts = PidSweep(bus=bus).run()
+        for finger, front in fronts.items():
+            for result in front:
+                logger.info(f"手指{finger} P,I,D,G={result['gains']}: 上升时间 {result['rise_time']:.3f}s, "
+                            f"超调 {result['overshoot']:.1f}%")
+        close_modbus(bus)
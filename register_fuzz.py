@@ -0,0 +1,349 @@
+import json
+import random
+import time
+import logging
+
+from mobus_operator import setup_modbus, close_modbus, NODE_ID, NUM_FINGERS, ROH_FINGER_POS_TARGET0, ROH_FINGER_ANGLE_TARGET0
+from register_model import RegisterModel, RULE_READ_ONLY, RULE_WRITE_ONLY, RULE_ANGLE_TARGET, ANGLE_PROBE_VALUES
+from limits_cache import LimitsDiscovery
+from roh_simulator import RohSimulator, ROH_START_INIT, ROH_RESET
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+# 操作类型，每个操作为 (类型, 起始地址, 参数)：写操作的参数为值列表，读操作的参数为寄存器数量
+OP_WRITE = 0X0  # FC16 写一段寄存器
+OP_READ = 0X1  # FC03 读一段寄存器并与参考语义比对
+OP_START_INIT = 0X2  # 写 ROH_START_INIT
+OP_RESET = 0X3  # 写 ROH_RESET
+
+roh_fuzz_op_list = {
+        OP_WRITE: '写',
+        OP_READ: '读',
+        OP_START_INIT: '开始初始化',
+        OP_RESET: '复位'
+    }
+
+ROH_NODE_ID               = (1005) # R/W
+ROH_RECALIBRATE           = (1012) # W
+ROH_POWER_OFF             = (1015) # W
+
+# 会让设备失联或停机的寄存器不参与模糊测试
+FUZZ_EXCLUDED_ADDRESSES = {ROH_NODE_ID, ROH_RECALIBRATE, ROH_POWER_OFF, ROH_START_INIT, ROH_RESET}
+# 保留和校准寄存器只读不写，避免破坏设备的校准数据
+FUZZ_EXCLUDED_ADDRESSES |= set(range(1016, 1045))
+FUZZ_EXCLUDED_ADDRESSES |= {start + finger for start in range(1045, 1185, 10) for finger in range(NUM_FINGERS, 10)}
+FUZZ_MAX_SPAN = 16 # 单个读写操作最多覆盖的寄存器数量
+FUZZ_SEQUENCE_LENGTH = 50 # 每个序列的操作数量
+FUZZ_INTERESTING_RATIO = 0.7 # 从边界值中取值的概率
+FUZZ_COMMAND_RATIO = 0.02 # 插入 ROH_START_INIT/ROH_RESET 的概率
+FUZZ_FAILURE_FILE = 'roh_fuzz_failures.json' # 最小化后的失败序列，供真机重放
+RESET_WAIT = 2 # 真机复位后等待重新上线的时间（秒）
+
+# 互相联动的寄存器：写角度目标会改变位置目标，反之亦然，写入后对方的值视为未知
+COUPLED_REGISTERS = {}
+for _finger in range(NUM_FINGERS):
+    COUPLED_REGISTERS[ROH_FINGER_POS_TARGET0 + _finger] = ROH_FINGER_ANGLE_TARGET0 + _finger
+    COUPLED_REGISTERS[ROH_FINGER_ANGLE_TARGET0 + _finger] = ROH_FINGER_POS_TARGET0 + _finger
+
+
+def format_operation(operation):
+    kind, address, payload = operation
+    return f'{roh_fuzz_op_list.get(kind)}({address}, {payload})'
+
+
+def run_sequence(bus, operations, model, node_id=NODE_ID, reset_wait=0):
+    """
+    在总线上执行操作序列，并用参考模型维护的影子寄存器判定每一步的结果。
+    影子寄存器初始为未知，只比对序列中写入过的寄存器，因此同样适用于真机。
+    :return: 第一个不一致的 (下标, 描述)，全部一致返回 None
+    """
+    shadow = {}
+    for index, (kind, address, payload) in enumerate(operations):
+        try:
+            if kind == OP_READ:
+                response = bus.read_holding_registers(address=address, count=payload, slave=node_id)
+                if response.isError():
+                    return index, f'读取失败, exception_code={response.exception_code}'
+                for offset, value in enumerate(response.registers):
+                    expected = shadow.get(address + offset)
+                    if expected is not None and abs(value - expected[0]) > expected[1]:
+                        return index, f'寄存器{address + offset}读出{value}, 参考语义为{expected[0]}(误差{expected[1]})'
+                continue
+            if kind in (OP_START_INIT, OP_RESET):
+                response = bus.write_registers(address=address, values=[1], slave=node_id)
+                if response.isError():
+                    return index, f'命令失败, exception_code={response.exception_code}'
+                if kind == OP_RESET:
+                    shadow.clear()
+                    if reset_wait:
+                        time.sleep(reset_wait)
+                else:
+                    for finger in range(NUM_FINGERS):
+                        shadow.pop(ROH_FINGER_POS_TARGET0 + finger, None)
+                        shadow.pop(ROH_FINGER_ANGLE_TARGET0 + finger, None)
+                continue
+            response = bus.write_registers(address=address, values=payload, slave=node_id)
+        except Exception as e:
+            return index, f'通讯异常: {e}'
+        updates = []
+        frame_accepted = True
+        for offset, value in enumerate(payload):
+            accepted, expected, tolerance = model.table(address + offset)
+            frame_accepted = frame_accepted and accepted[value]
+            updates.append((address + offset, expected[value], tolerance[value]))
+        if response.isError() == frame_accepted:
+            return index, f'参考语义{"接受" if frame_accepted else "拒绝"}该帧, 设备{"拒绝" if frame_accepted else "接受"}'
+        if not frame_accepted:
+            continue
+        for target_address, expected, tolerance in updates:
+            if target_address in COUPLED_REGISTERS:
+                shadow.pop(COUPLED_REGISTERS[target_address], None)
+            if expected >= 0 and model.rule(target_address).kind != RULE_WRITE_ONLY:
+                shadow[target_address] = (expected, tolerance)
+    return None
+
+
+class RegisterFuzzer:
+    """
+    基于参考模型的寄存器模糊测试：随机生成包含多寄存器 FC16 写、读回比对以及 ROH_START_INIT/ROH_RESET 的操作序列，
+    在本地模拟器上全速执行，失败序列用 ddmin 最小化后保存，可在真机上重放。
+    """
+
+    def __init__(self, model=None, seed=None, max_span=FUZZ_MAX_SPAN, node_id=NODE_ID):
+        self.model = model if model is not None else RegisterModel()
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.random = random.Random(self.seed)
+        self.max_span = max_span
+        self.node_id = node_id
+        rules = self.model.rules
+        self.writable = sorted(address for address, rule in rules.items()
+                               if rule.kind != RULE_READ_ONLY and address not in FUZZ_EXCLUDED_ADDRESSES)
+        self._writable_set = set(self.writable)
+        self.readable = sorted(address for address, rule in rules.items() if rule.kind != RULE_WRITE_ONLY)
+        self.interesting = {}
+        for address in self.writable:
+            rule = rules[address]
+            candidates = {0, 1, 65535, 32767, 32768, rule.low - 1, rule.low, rule.high, rule.high + 1, rule.default}
+            self.interesting[address] = sorted(value for value in candidates if 0 <= value <= 65535)
+
+    def random_value(self, address):
+        if self.random.random() < FUZZ_INTERESTING_RATIO:
+            return self.random.choice(self.interesting[address])
+        return self.random.randrange(65536)
+
+    def _span_length(self, address, valid):
+        length = 1
+        limit = self.random.randint(1, self.max_span)
+        while length < limit and address + length in valid:
+            length += 1
+        return length
+
+    def random_operation(self):
+        choice = self.random.random()
+        if choice < FUZZ_COMMAND_RATIO:
+            return (OP_RESET, ROH_RESET, 1) if self.random.random() < 0.5 else (OP_START_INIT, ROH_START_INIT, 1)
+        if choice < 0.5:
+            address = self.random.choice(self.writable)
+            length = self._span_length(address, self._writable_set)
+            return OP_WRITE, address, [self.random_value(address + offset) for offset in range(length)]
+        address = self.random.choice(self.readable)
+        return OP_READ, address, self._span_length(address, self.model.rules)
+
+    def generate(self, length=FUZZ_SEQUENCE_LENGTH):
+        return [self.random_operation() for _ in range(length)]
+
+    def shrink(self, operations, fails):
+        """
+        ddmin 最小化失败序列。
+        :param fails: 可调用对象，fails(operations) 为 True 表示该序列仍然失败
+        :return: 最小失败序列
+        """
+        granularity = 2
+        while len(operations) >= 2:
+            chunk = -(-len(operations) // granularity)
+            reduced = False
+            for start in range(0, len(operations), chunk):
+                complement = operations[:start] + operations[start + chunk:]
+                if complement and fails(complement):
+                    operations = complement
+                    granularity = max(granularity - 1, 2)
+                    reduced = True
+                    break
+            if not reduced:
+                if granularity >= len(operations):
+                    break
+                granularity = min(len(operations), granularity * 2)
+        # 再逐个缩短多寄存器写操作
+        for index, (kind, address, payload) in enumerate(operations):
+            if kind != OP_WRITE:
+                continue
+            for offset, value in enumerate(payload):
+                candidate = operations[:index] + [(kind, address + offset, [value])] + operations[index + 1:]
+                if fails(candidate):
+                    operations = candidate
+                    break
+        return operations
+
+    def fuzz(self, simulator=None, sequences=1000, length=FUZZ_SEQUENCE_LENGTH):
+        """
+        在模拟器上执行 sequences 个随机序列。
+        :return: 统计信息，failures 为最小化后的失败序列列表
+        """
+        if simulator is None:
+            # 固定时钟：模糊测试只关心寄存器语义，不推进运动
+            simulator = RohSimulator(model=self.model, node_id=self.node_id, clock=lambda: 0.0)
+
+        def fails(operations):
+            simulator.reset()
+            return run_sequence(simulator, operations, self.model, node_id=self.node_id) is not None
+
+        failures = []
+        operation_count = 0
+        begin = time.perf_counter()
+        for _ in range(sequences):
+            operations = self.generate(length)
+            simulator.reset()
+            result = run_sequence(simulator, operations, self.model, node_id=self.node_id)
+            if result is None:
+                operation_count += len(operations)
+                continue
+            index, message = result
+            operation_count += index + 1
+            minimal = self.shrink(operations[:index + 1], fails)
+            logger.error(f'[seed = {self.seed}]发现不一致: {message}, 最小序列: '
+                         f'{[format_operation(operation) for operation in minimal]}')
+            failures.append(minimal)
+        elapsed = time.perf_counter() - begin
+        return {'seed': self.seed, 'sequences': sequences, 'operations': operation_count,
+                'ops_per_second': operation_count / elapsed if elapsed else 0.0, 'failures': failures}
+
+
+def save_failures(failures, path=FUZZ_FAILURE_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(failures, f)
+
+
+def load_failures(path=FUZZ_FAILURE_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [[tuple(operation) for operation in operations] for operations in json.load(f)]
+
+
+def written_addresses(operations, model):
+    """
+    :return: 序列中写到的、可读回的寄存器地址（升序）
+    """
+    addresses = set()
+    for kind, address, payload in operations:
+        if kind == OP_WRITE:
+            addresses.update(range(address, address + len(payload)))
+    return sorted(address for address in addresses if model.rule(address).kind not in (RULE_READ_ONLY, RULE_WRITE_ONLY))
+
+
+def _spans(addresses, max_span=FUZZ_MAX_SPAN):
+    """
+    把升序地址合并为连续区间 (起始地址, 数量)，每段最多 max_span 个寄存器。
+    """
+    spans = []
+    for address in addresses:
+        if spans and spans[-1][0] + spans[-1][1] == address and spans[-1][1] < max_span:
+            spans[-1][1] += 1
+        else:
+            spans.append([address, 1])
+    return [tuple(span) for span in spans]
+
+
+def snapshot_registers(bus, addresses, node_id=NODE_ID):
+    """
+    按连续区间读出 addresses 的当前值。
+    :return: {地址: 值}，读取失败的区间不包含在内
+    """
+    snapshot = {}
+    for start, count in _spans(addresses):
+        try:
+            response = bus.read_holding_registers(address=start, count=count, slave=node_id)
+        except Exception as e:
+            logger.error(f'[node_id = {node_id}]读取寄存器{start}~{start + count - 1}原值异常: {e}')
+            continue
+        if response.isError():
+            logger.error(f'[node_id = {node_id}]读取寄存器{start}~{start + count - 1}原值失败')
+            continue
+        snapshot.update(zip(range(start, start + count), response.registers))
+    return snapshot
+
+
+def restore_registers(bus, snapshot, node_id=NODE_ID):
+    """
+    按连续区间把 snapshot 中的值写回。
+    :return: 全部写回成功返回 True
+    """
+    restored = True
+    for start, count in _spans(sorted(snapshot)):
+        values = [snapshot[address] for address in range(start, start + count)]
+        try:
+            response = bus.write_registers(address=start, values=values, slave=node_id)
+            failed = response.isError()
+        except Exception as e:
+            logger.error(f'[node_id = {node_id}]恢复寄存器{start}~{start + count - 1}异常: {e}')
+            failed = True
+        if failed:
+            logger.error(f'[node_id = {node_id}]恢复寄存器{start}~{start + count - 1}失败')
+            restored = False
+    return restored
+
+
+def discover_model(bus, operations, node_id=NODE_ID, limits=None):
+    """
+    用 LimitsDiscovery 探测（或读取缓存）序列中写到的角度目标寄存器的限位，生成与该设备一致的参考模型。
+    """
+    limits = limits if limits is not None else LimitsDiscovery(bus, node_id=node_id)
+    model = RegisterModel()
+    for address in written_addresses(operations, model):
+        if model.rule(address).kind == RULE_ANGLE_TARGET:
+            for value in ANGLE_PROBE_VALUES:
+                limits.get_limit(address, value)
+    return RegisterModel.from_limits(limits)
+
+
+def replay(bus, operations, model=None, node_id=NODE_ID, reset_wait=RESET_WAIT, limits=None):
+    """
+    在真机上重放失败序列。未指定 model 时先用 LimitsDiscovery 探测到的限位生成参考模型；
+    序列写到的寄存器在重放（以及限位探测）之前读出原值，重放结束后写回。
+    :param limits: LimitsDiscovery 实例，默认按 bus 新建
+    :return: 第一个不一致的 (下标, 描述)，真机与参考语义一致返回 None
+    """
+    snapshot = snapshot_registers(bus, written_addresses(operations, model or RegisterModel()), node_id=node_id)
+    try:
+        if model is None:
+            model = discover_model(bus, operations, node_id=node_id, limits=limits)
+        result = run_sequence(bus, operations, model, node_id=node_id, reset_wait=reset_wait)
+    finally:
+        restore_registers(bus, snapshot, node_id=node_id)
+    if result is None:
+        logger.info(f'[node_id = {node_id}]重放{len(operations)}个操作, 与参考语义一致')
+    else:
+        index, message = result
+        logger.error(f'[node_id = {node_id}]重放第{index}个操作{format_operation(operations[index])}不一致: {message}')
+    return result
+
+
+if __name__ == "__main__":
+    fuzzer = RegisterFuzzer()
+    stats = fuzzer.fuzz(sequences=2000)
+    logger.info(f"[seed = {stats['seed']}]执行{stats['operations']}个操作, {stats['ops_per_second']:.0f} ops/s, "
+                f"失败{len(stats['failures'])}个")
+    if stats['failures']:
+        save_failures(stats['failures'])
+        # 初始化 modbus 总线，在真机上重放最小失败序列
+        bus = setup_modbus()
+        if bus:
+            for operations in stats['failures']:
+                replay(bus, operations)
+            close_modbus(bus)
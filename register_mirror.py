@@ -0,0 +1,336 @@
+import struct
+import threading
+import time
+import logging
+from multiprocessing import shared_memory
+
+from mobus_operator import (setup_modbus, close_modbus, read_registers, NODE_ID, NUM_FINGERS,
+                            ROH_FINGER_STATUS0, ROH_FINGER_POS0, ROH_FINGER_FORCE0)
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+MIRROR_NAME = 'roh_register_mirror' # 共享内存名称
+MIRROR_START_ADDRESS = 1000 # 镜像的起始寄存器地址
+MIRROR_END_ADDRESS = 2999 # 镜像的结束寄存器地址（包含）
+MIRROR_REGISTER_COUNT = MIRROR_END_ADDRESS - MIRROR_START_ADDRESS + 1
+POLL_PERIOD = 0.02 # 轮询周期（秒）
+
+MAX_POLL_SPANS = 16 # 轮询区间的最大数量
+
+# 默认轮询区间 (起始地址, 寄存器数量)，单帧覆盖状态、电流、速度、位置、角度、力量
+# 映像按整个 1000~2999 分配，以便按需配置其它轮询区间（如 PID、配置寄存器），
+# 不在任何轮询区间内的地址始终为 0，读取方应通过 span_status()/is_valid() 判断数据是否有效
+DEFAULT_POLL_SPANS = [
+    (ROH_FINGER_STATUS0, 100)
+]
+
+# 共享内存头部：序号(uint64)、发布时间戳(double)、轮询次数(uint64)、失败次数(uint64)
+# 序号为奇数表示正在写入，读取方需要重试（seqlock）
+HEADER_FORMAT = '<QdQQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# 轮询区间状态表，每个区间：起始地址(uint16)、寄存器数量(uint16)、最近一次成功时的轮询次数(uint64)、
+# 最近一次成功的时间戳(double)、连续失败次数(uint64)，寄存器数量为 0 表示未使用
+SPAN_FORMAT = '<HHQdQ'
+SPAN_SIZE = struct.calcsize(SPAN_FORMAT)
+SPAN_TABLE_SIZE = MAX_POLL_SPANS * SPAN_SIZE
+IMAGE_OFFSET = HEADER_SIZE + SPAN_TABLE_SIZE
+IMAGE_SIZE = MIRROR_REGISTER_COUNT * 2
+SHM_SIZE = IMAGE_OFFSET + IMAGE_SIZE
+
+
+class RegisterMirror:
+    """
+    寄存器镜像守护进程：独占串口轮询灵巧手，将最新的寄存器映像(1000~2999, uint16)发布到共享内存，
+    其它进程通过 RegisterMirrorReader 读取，不会增加 RS-485 总线负载。
+    同名共享内存已存在时默认报错（可能有另一个守护进程在运行），确认是异常退出的遗留后以 attach=True 复用。
+    """
+
+    def __init__(self, bus, node_id=NODE_ID, poll_spans=None, poll_period=POLL_PERIOD, name=MIRROR_NAME,
+                 attach=False):
+        self.bus = bus
+        self.node_id = node_id
+        self.poll_spans = list(poll_spans) if poll_spans is not None else DEFAULT_POLL_SPANS
+        if len(self.poll_spans) > MAX_POLL_SPANS:
+            raise ValueError(f"Too many poll spans: {len(self.poll_spans)} > {MAX_POLL_SPANS}")
+        for start_address, register_count in self.poll_spans:
+            if (register_count < 1 or start_address < MIRROR_START_ADDRESS
+                    or start_address + register_count - 1 > MIRROR_END_ADDRESS):
+                raise ValueError(f"Invalid poll span: ({start_address}, {register_count})")
+        self.poll_period = poll_period
+        self.name = name
+        self.attach = attach
+        self.shm = None
+        self.seq = 0
+        self.poll_count = 0
+        self.error_count = 0
+        # 每个轮询区间的 [最近一次成功时的轮询次数, 最近一次成功的时间戳, 连续失败次数]
+        self.span_state = [[0, 0.0, 0] for _ in self.poll_spans]
+        self.listeners = []
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def open(self):
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=SHM_SIZE)
+        except FileExistsError:
+            if not self.attach:
+                raise FileExistsError(f"Shared memory '{self.name}' already exists, another mirror may be running; "
+                                      f"use attach=True to reuse a stale one")
+            # 确认是上次守护进程异常退出后遗留的共享内存，复用
+            self.shm = shared_memory.SharedMemory(name=self.name)
+            if self.shm.size < SHM_SIZE:
+                self.shm.close()
+                self.shm = None
+                raise ValueError(f"Shared memory '{self.name}' too small for the current layout")
+            logger.info(f'[mirror = {self.name}]复用已存在的共享内存')
+        self.shm.buf[:SHM_SIZE] = bytes(SHM_SIZE)
+        for index, (start_address, register_count) in enumerate(self.poll_spans):
+            struct.pack_into(SPAN_FORMAT, self.shm.buf, HEADER_SIZE + index * SPAN_SIZE,
+                             start_address, register_count, 0, 0.0, 0)
+        self._image = self.shm.buf[IMAGE_OFFSET:SHM_SIZE].cast('H')
+        logger.info(f'[mirror = {self.name}]共享内存已创建, 大小 {SHM_SIZE} 字节')
+
+    def close(self):
+        self.stop()
+        if self.shm is not None:
+            self._image.release()
+            try:
+                self.shm.close()
+            except BufferError:
+                # 仍有外部持有映像的 memoryview，映射会在其释放后由垃圾回收关闭，这里只负责删除名称
+                logger.error(f'[mirror = {self.name}]共享内存仍被引用，延迟关闭')
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = None
+            logger.info(f'[mirror = {self.name}]共享内存已释放')
+
+    def add_listener(self, callback):
+        """
+        注册轮询回调，每次发布后以 callback(mirror, timestamp) 调用，用于在轮询线程上挂接实时检测。
+        """
+        self.listeners.append(callback)
+
+    def _write_header(self, timestamp):
+        struct.pack_into(HEADER_FORMAT, self.shm.buf, 0, self.seq, timestamp, self.poll_count, self.error_count)
+
+    def publish(self, spans):
+        """
+        以 seqlock 方式发布一次轮询结果，同时更新轮询区间状态表。
+        :param spans: [(起始地址, 寄存器值列表), ...]
+        """
+        self.seq += 1  # 奇数：写入中
+        self._write_header(time.time())
+        for start_address, registers in spans:
+            offset = start_address - MIRROR_START_ADDRESS
+            # 映像按本机字节序存放，读取方可直接 cast('H') 零拷贝访问
+            struct.pack_into(f'={len(registers)}H', self.shm.buf, IMAGE_OFFSET + offset * 2, *registers)
+        for index, ((start_address, register_count), state) in enumerate(zip(self.poll_spans, self.span_state)):
+            struct.pack_into(SPAN_FORMAT, self.shm.buf, HEADER_SIZE + index * SPAN_SIZE,
+                             start_address, register_count, *state)
+        timestamp = time.time()
+        self.seq += 1  # 偶数：写入完成
+        self._write_header(timestamp)
+        return timestamp
+
+    def poll_once(self):
+        spans = []
+        self.poll_count += 1
+        for (start_address, register_count), state in zip(self.poll_spans, self.span_state):
+            response = read_registers(bus=self.bus, start_address=start_address, register_count=register_count,
+                                      node_id=self.node_id, wait_time=0)
+            if response is None or response.isError():
+                self.error_count += 1
+                state[2] += 1
+                continue
+            state[0] = self.poll_count
+            state[1] = time.time()
+            state[2] = 0
+            spans.append((start_address, response.registers))
+        timestamp = self.publish(spans)
+        for callback in self.listeners:
+            try:
+                callback(self, timestamp)
+            except Exception as e:
+                logger.error(f'镜像回调异常: {e}')
+
+    def register(self, address):
+        """
+        读取守护进程本地的镜像值（轮询线程内使用，无需 seqlock）。
+        """
+        return self._image[address - MIRROR_START_ADDRESS]
+
+    def registers(self, start_address, register_count):
+        """
+        读取守护进程本地的一段镜像值（轮询线程内使用），返回拷贝，避免外部视图阻止 close() 释放共享内存。
+        """
+        offset = start_address - MIRROR_START_ADDRESS
+        return self._image[offset:offset + register_count].tolist()
+
+    def span_ok(self, start_address, register_count=1):
+        """
+        本次轮询中覆盖该地址段的区间是否读取成功（轮询线程内使用）。
+        """
+        for (span_start, span_count), state in zip(self.poll_spans, self.span_state):
+            if span_start <= start_address and start_address + register_count <= span_start + span_count:
+                return state[0] == self.poll_count
+        return False
+
+    def run_forever(self):
+        next_time = time.perf_counter()
+        while not self._stop_event.is_set():
+            self.poll_once()
+            next_time += self.poll_period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                # 总线跟不上轮询周期时不追赶，避免突发请求
+                next_time = time.perf_counter()
+
+    def start(self):
+        if self.shm is None:
+            self.open()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run_forever, name='roh-register-mirror', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class RegisterMirrorReader:
+    """
+    寄存器镜像读取方，可在任意数量的进程中使用。
+    """
+
+    def __init__(self, name=MIRROR_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+        try:
+            # Python 3.13 之前附加方也会注册到 resource_tracker，进程退出时会误删共享内存
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        except Exception:
+            pass
+        self._image = self.shm.buf[IMAGE_OFFSET:SHM_SIZE].cast('H')
+
+    def close(self):
+        self._image.release()
+        try:
+            self.shm.close()
+        except BufferError:
+            logger.error('共享内存仍被 view() 返回的视图引用，延迟关闭')
+
+    def header(self):
+        """
+        :return: (序号, 发布时间戳, 轮询次数, 失败次数)
+        """
+        return struct.unpack_from(HEADER_FORMAT, self.shm.buf, 0)
+
+    def generation(self):
+        return struct.unpack_from('<Q', self.shm.buf, 0)[0]
+
+    def span_status(self, max_retries=1000):
+        """
+        一致地读取轮询区间状态表。
+        :return: [(起始地址, 寄存器数量, 最近一次成功时的轮询次数, 最近一次成功的时间戳, 连续失败次数), ...]
+        """
+        for _ in range(max_retries):
+            generation = self.generation()
+            if generation % 2:
+                continue
+            spans = [span for span in struct.iter_unpack(SPAN_FORMAT, self.shm.buf[HEADER_SIZE:IMAGE_OFFSET])
+                     if span[1]]
+            if self.generation() == generation:
+                return spans
+        raise TimeoutError('读取寄存器镜像失败，写入方持续占用')
+
+    def is_valid(self, start_address, register_count=1, max_age=None):
+        """
+        地址段是否被某个轮询区间覆盖，且该区间最近一次轮询成功（并在 max_age 秒以内）。
+        """
+        _, _, poll_count, _ = self.header()
+        for span_start, span_count, last_poll, timestamp, _ in self.span_status():
+            if span_start <= start_address and start_address + register_count <= span_start + span_count:
+                if not last_poll or last_poll != poll_count:
+                    return False
+                return max_age is None or time.time() - timestamp <= max_age
+        return False
+
+    def view(self):
+        """
+        零拷贝访问整个映像（索引为 地址-1000），需配合 generation()/validate() 判断一致性。
+        """
+        return self._image
+
+    def validate(self, generation):
+        return generation % 2 == 0 and self.generation() == generation
+
+    def read(self, start_address, register_count=1, max_retries=1000):
+        """
+        一致地读取一段寄存器。
+        :return: 寄存器值列表，与 response.registers 格式相同
+        """
+        offset = start_address - MIRROR_START_ADDRESS
+        for _ in range(max_retries):
+            generation = self.generation()
+            if generation % 2:
+                continue
+            registers = self._image[offset:offset + register_count].tolist()
+            if self.generation() == generation:
+                return registers
+        raise TimeoutError('读取寄存器镜像失败，写入方持续占用')
+
+    def snapshot(self, into, max_retries=1000):
+        """
+        将整个映像一致地拷贝到调用方预分配的缓冲区（如 array('H', bytes(IMAGE_SIZE))），避免每次分配内存。
+        :return: 快照对应的发布时间戳
+        """
+        target = memoryview(into).cast('B')
+        source = self.shm.buf[IMAGE_OFFSET:SHM_SIZE]
+        try:
+            for _ in range(max_retries):
+                generation, timestamp, _, _ = self.header()
+                if generation % 2:
+                    continue
+                target[:] = source
+                if self.generation() == generation:
+                    return timestamp
+        finally:
+            source.release()
+            target.release()
+        raise TimeoutError('读取寄存器镜像失败，写入方持续占用')
+
+    def finger_pos(self):
+        return self.read(ROH_FINGER_POS0, NUM_FINGERS)
+
+    def finger_force(self):
+        return self.read(ROH_FINGER_FORCE0, NUM_FINGERS)
+
+
+if __name__ == "__main__":
+    # 初始化 modbus 总线，独占串口后持续发布寄存器镜像
+    bus = setup_modbus()
+
+    if bus:
+        mirror = RegisterMirror(bus=bus)
+        mirror.open()
+        try:
+            mirror.run_forever()
+        except KeyboardInterrupt:
+            logger.info('用户手动终止，停止寄存器镜像...')
+        finally:
+            mirror.close()
+            close_modbus(bus)
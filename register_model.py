@@ -0,0 +1,210 @@
+import logging
+
+import numpy as np
+
+from mobus_operator import NUM_FINGERS
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+# 寄存器写入语义
+RULE_FREE = 0X0  # 全范围 [0,65535] 原样保存
+RULE_RANGE_IGNORE = 0X1  # 范围内原样保存，超出范围写进去不生效,底层不报错
+RULE_RANGE_REJECT = 0X2  # 范围内原样保存，超出范围返回异常
+RULE_BOOL = 0X3  # 非 0 保存为 1
+RULE_POS_TARGET = 0X4  # 位置目标：低于下限钳位到下限，其余允许 FINGER_POS_TARGET_MAX_LOSS 的精度损失
+RULE_ANGLE_TARGET = 0X5  # 角度目标：正负两个半区分别钳位到设备限位，允许 FINGER_ANGLE_TARGET_MAX_LOSS 的精度损失
+RULE_READ_ONLY = 0X6  # 只读，写入返回异常
+RULE_WRITE_ONLY = 0X7  # 只写（命令类寄存器），范围内接受，读回无意义
+
+roh_rule_list = {
+        RULE_FREE: '全范围',
+        RULE_RANGE_IGNORE: '超范围忽略',
+        RULE_RANGE_REJECT: '超范围报错',
+        RULE_BOOL: '布尔',
+        RULE_POS_TARGET: '位置目标',
+        RULE_ANGLE_TARGET: '角度目标',
+        RULE_READ_ONLY: '只读',
+        RULE_WRITE_ONLY: '只写'
+    }
+
+FINGER_POS_TARGET_MAX_LOSS = 32 # 位置最大精度损失
+FINGER_ANGLE_TARGET_MAX_LOSS = 5 # 角度最大精度损失
+HALF_RANGE = 32768 # 角度寄存器正负半区分界
+
+# 角度限位 (最小角度, 最大角度, 最大负角度, 最小负角度)，对应写入 0/32767/32768/65535 后读回的值；
+# 真实值与设备和固件有关，应通过 from_limits() 用 LimitsDiscovery 的探测结果覆盖
+DEFAULT_ANGLE_LIMITS = (0, 32767, 32768, 65535)
+ANGLE_PROBE_VALUES = (0, 32767, 32768, 65535) # 探测角度限位时依次写入的值，读回结果按顺序组成 angle_limits
+
+
+class RegisterRule:
+    def __init__(self, kind, low=0, high=65535, default=0, tolerance=0):
+        self.kind = kind
+        self.low = low
+        self.high = high
+        self.default = default
+        self.tolerance = tolerance
+        self.angle_limits = DEFAULT_ANGLE_LIMITS
+
+
+def _finger_rules(rules, start_address, kind, low=0, high=65535, defaults=0, tolerance=0, count=NUM_FINGERS):
+    for finger in range(count):
+        default = defaults[finger] if isinstance(defaults, (list, tuple)) else defaults
+        rules[start_address + finger] = RegisterRule(kind, low=low, high=high, default=default, tolerance=tolerance)
+
+
+def default_rules():
+    """
+    根据测试用例整理出的寄存器写入语义（地址、范围、默认值与 modbus_pytest_v2.py 一致）。
+    """
+    rules = {}
+    for address in range(1000, 1008):
+        rules[address] = RegisterRule(RULE_READ_ONLY)
+    rules[1000] = RegisterRule(RULE_READ_ONLY, default=0x0100) # ROH_PROTOCOL_VERSION
+    rules[1005] = RegisterRule(RULE_RANGE_REJECT, low=2, high=247, default=2) # ROH_NODE_ID
+    rules[1008] = RegisterRule(RULE_RANGE_REJECT, low=0, high=2, default=1) # ROH_SELF_TEST_LEVEL
+    rules[1009] = RegisterRule(RULE_BOOL, default=1) # ROH_BEEP_SWITCH
+    rules[1010] = RegisterRule(RULE_WRITE_ONLY, low=1, high=65535, default=500) # ROH_BEEP_PERIOD
+    rules[1011] = RegisterRule(RULE_FREE) # ROH_BUTTON_PRESS_CNT
+    for address in range(1012, 1016): # ROH_RECALIBRATE、ROH_START_INIT、ROH_RESET、ROH_POWER_OFF
+        rules[address] = RegisterRule(RULE_WRITE_ONLY)
+    _finger_rules(rules, 1045, RULE_RANGE_IGNORE, low=100, high=50000, defaults=25000) # ROH_FINGER_P0~5
+    _finger_rules(rules, 1055, RULE_RANGE_IGNORE, low=0, high=10000, defaults=200) # ROH_FINGER_I0~5
+    _finger_rules(rules, 1065, RULE_RANGE_IGNORE, low=0, high=50000, defaults=25000) # ROH_FINGER_D0~5
+    _finger_rules(rules, 1075, RULE_RANGE_IGNORE, low=1, high=100, defaults=100) # ROH_FINGER_G0~5
+    _finger_rules(rules, 1085, RULE_READ_ONLY) # ROH_FINGER_STATUS0~5
+    _finger_rules(rules, 1095, RULE_RANGE_IGNORE, low=0, high=1299, defaults=1299) # ROH_FINGER_CURRENT_LIMIT0~5
+    _finger_rules(rules, 1105, RULE_READ_ONLY) # ROH_FINGER_CURRENT0~5
+    _finger_rules(rules, 1115, RULE_FREE, count=5) # ROH_FINGER_FORCE_TARGET0~4
+    _finger_rules(rules, 1120, RULE_READ_ONLY, count=5) # ROH_FINGER_FORCE_TARGET5~9
+    _finger_rules(rules, 1125, RULE_FREE, defaults=65535) # ROH_FINGER_SPEED0~5
+    _finger_rules(rules, 1135, RULE_POS_TARGET, tolerance=FINGER_POS_TARGET_MAX_LOSS) # ROH_FINGER_POS_TARGET0~5
+    rules[1140] = RegisterRule(RULE_POS_TARGET, low=728, default=728, tolerance=FINGER_POS_TARGET_MAX_LOSS)
+    _finger_rules(rules, 1145, RULE_READ_ONLY) # ROH_FINGER_POS0~5
+    _finger_rules(rules, 1155, RULE_ANGLE_TARGET, tolerance=FINGER_ANGLE_TARGET_MAX_LOSS,
+                  defaults=[32367, 32367, 32367, 32367, 32367, 0]) # ROH_FINGER_ANGLE_TARGET0~5
+    _finger_rules(rules, 1165, RULE_READ_ONLY) # ROH_FINGER_ANGLE0~5
+    _finger_rules(rules, 1175, RULE_READ_ONLY) # ROH_FINGER_FORCE0~5
+    _finger_rules(rules, 1225, RULE_RANGE_IGNORE, low=100, high=50000, defaults=[5000, 10000, 10000, 10000, 10000], count=5) # ROH_FINGER_FORCE_P0~4
+    _finger_rules(rules, 1235, RULE_RANGE_IGNORE, low=0, high=10000, defaults=200, count=5) # ROH_FINGER_FORCE_I0~4
+    _finger_rules(rules, 1245, RULE_RANGE_IGNORE, low=0, high=50000, defaults=[5000, 10000, 10000, 10000, 10000], count=5) # ROH_FINGER_FORCE_D0~4
+    _finger_rules(rules, 1255, RULE_RANGE_IGNORE, low=1, high=100, defaults=100, count=5) # ROH_FINGER_FORCE_G0~4
+    for address in range(2000, 3000): # ROH_FINGER_FORCE_EX0~9
+        rules[address] = RegisterRule(RULE_READ_ONLY)
+    for address in range(1016, 1045): # ROH_RESERVED0~3、ROH_CALI_END0~9、ROH_CALI_START0~9、ROH_CALI_THUMB_POS0~4
+        rules[address] = RegisterRule(RULE_FREE)
+    # 每组 10 个寄存器中 6~9 为保留的手指位置，读写属性与所在组一致，使跨组的单帧读取不会返回非法地址
+    for start in range(1045, 1185, 10):
+        kind = RULE_READ_ONLY if rules[start].kind == RULE_READ_ONLY else RULE_FREE
+        for address in range(start + NUM_FINGERS, start + 10):
+            rules.setdefault(address, RegisterRule(kind))
+    return rules
+
+
+class RegisterModel:
+    """
+    寄存器写入语义的参考模型（golden oracle），对候选值数组做向量化预测，模拟器和测试判定共用。
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules if rules is not None else default_rules()
+        self._tables = {}
+
+    @classmethod
+    def from_limits(cls, limits):
+        """
+        用 LimitsDiscovery 的探测结果设置角度寄存器的限位。
+        """
+        model = cls()
+        for address, rule in model.rules.items():
+            if rule.kind != RULE_ANGLE_TARGET:
+                continue
+            probed = [limits.limits.get(f'{address}:{value}') for value in ANGLE_PROBE_VALUES]
+            if None not in probed:
+                rule.angle_limits = tuple(probed)
+        return model
+
+    def is_valid_address(self, address):
+        return address in self.rules
+
+    def rule(self, address):
+        return self.rules.get(address, RegisterRule(RULE_FREE))
+
+    def predict(self, address, values, current=None):
+        """
+        预测向 address 写入 values 后设备的行为。
+        :param values: 候选写入值（标量或数组）
+        :param current: 写入前寄存器的值，默认为寄存器默认值
+        :return: (accepted, expected, tolerance) 三个与 values 同形状的数组：
+                 写入是否被设备接受（不返回异常）、读回的期望值、读回允许的误差
+        """
+        rule = self.rule(address)
+        values = np.asarray(values, dtype=np.int64)
+        current = np.full(values.shape, rule.default if current is None else current, dtype=np.int64)
+        tolerance = np.zeros(values.shape, dtype=np.int64)
+        in_range = (values >= rule.low) & (values <= rule.high)
+        accepted = np.ones(values.shape, dtype=bool)
+        kind = rule.kind
+        if kind == RULE_FREE:
+            expected = values
+        elif kind == RULE_RANGE_IGNORE:
+            expected = np.where(in_range, values, current)
+        elif kind in (RULE_RANGE_REJECT, RULE_WRITE_ONLY):
+            accepted = in_range
+            expected = np.where(in_range, values, current)
+        elif kind == RULE_BOOL:
+            expected = (values != 0).astype(np.int64)
+        elif kind == RULE_POS_TARGET:
+            expected = np.maximum(values, rule.low)
+            tolerance = np.where(values > rule.low, rule.tolerance, 0)
+        elif kind == RULE_ANGLE_TARGET:
+            min_angle, max_angle, max_neg_angle, min_neg_angle = rule.angle_limits
+            positive = values < HALF_RANGE
+            low = np.where(positive, min_angle, max_neg_angle)
+            high = np.where(positive, max_angle, min_neg_angle)
+            expected = np.clip(values, low, high)
+            tolerance = np.where(expected == values, rule.tolerance, 0)
+        else: # RULE_READ_ONLY
+            accepted = np.zeros(values.shape, dtype=bool)
+            expected = current
+        return accepted, expected, tolerance
+
+    def table(self, address):
+        """
+        对全部 65536 个取值一次性向量化预测，返回查表用的 (accepted, expected, tolerance) 三个列表，
+        expected 为 -1 表示写入不生效、保持原值。规则参数相同的寄存器共用一张表。
+        """
+        rule = self.rule(address)
+        key = (rule.kind, rule.low, rule.high, rule.tolerance, rule.angle_limits)
+        if key not in self._tables:
+            accepted, expected, tolerance = self.predict(address, np.arange(65536), current=-1)
+            self._tables[key] = (accepted.tolist(), expected.tolist(), tolerance.tolist())
+        return self._tables[key]
+
+    def stores(self, address, values):
+        """
+        :return: 写入的值是否会被原样（在精度损失范围内）保存，超出范围的值为 False
+        """
+        accepted, expected, tolerance = self.predict(address, values)
+        return accepted & (np.abs(expected - np.asarray(values, dtype=np.int64)) <= tolerance)
+
+    def check(self, address, values, accepted, readback, current=None):
+        """
+        判定设备的实际行为是否与模型一致。
+        :param accepted: 设备是否接受了写入（write_registers 的返回值）
+        :param readback: 写入后读回的值，只写寄存器可传 None
+        :return: 每个候选值是否一致的布尔数组
+        """
+        expected_accepted, expected, tolerance = self.predict(address, values, current)
+        result = np.asarray(accepted, dtype=bool) == expected_accepted
+        if readback is not None and self.rule(address).kind != RULE_WRITE_ONLY:
+            result &= np.abs(np.asarray(readback, dtype=np.int64) - expected) <= tolerance
+        return result
@@ -0,0 +1,279 @@
+import json
+import logging
+
+from mobus_operator import (setup_modbus, close_modbus, NODE_ID, EC02_ILLEGAL_DATA_ADDRESS, roh_exception_list)
+from limits_cache import read_device_identity
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+SCAN_START_ADDRESS = 1000 # 扫描的起始寄存器地址
+SCAN_END_ADDRESS = 2999 # 扫描的结束寄存器地址（包含）
+SCAN_MAX_COUNT = 125 # FC03 单帧最多读取的寄存器数量
+SCAN_MAP_FILE = 'roh_register_map.json' # 默认的地址映射文件
+# 无效区间内单次跳跃的最大步长，None 表示不设上限：步长按 1、2、4... 增长，越过区间后在最后一步内二分，
+# 每个无效区间只需 O(log n) 次事务。跳过的地址没有探测过，标记为未知；需要确认短于步长的孤立可读区间时
+# 可设为 5（手指寄存器组至少 5 个连续地址），长度不小于该值的可读区间一定会被发现
+SCAN_GAP_MAX_STEP = None
+
+# 单个地址的扫描结果
+ADDRESS_VALID = 0X0  # 可读
+ADDRESS_INVALID = 0X1  # 返回 EC02
+ADDRESS_UNKNOWN = 0X2  # 返回其它异常、通讯失败，或在无效区间内被跳过、没有探测过
+
+roh_address_state_list = {
+        ADDRESS_VALID: 'valid',
+        ADDRESS_INVALID: 'invalid',
+        ADDRESS_UNKNOWN: 'unknown'
+    }
+
+# 回写原值探测可写性时跳过的寄存器：写入会改变设备ID、触发校正/复位/关机
+WRITE_PROBE_EXCLUDED = {1005, 1012, 1013, 1014, 1015}
+
+
+def to_ranges(addresses):
+    """
+    将地址列表压缩为 [[起始, 结束], ...]（包含结束地址）。
+    """
+    ranges = []
+    for address in sorted(addresses):
+        if ranges and ranges[-1][1] == address - 1:
+            ranges[-1][1] = address
+        else:
+            ranges.append([address, address])
+    return ranges
+
+
+def from_ranges(ranges):
+    return {address for start, end in ranges for address in range(start, end + 1)}
+
+
+class RegisterScanner:
+    """
+    寄存器地址空间扫描：先用最大帧读取，失败时用二分查找可读前缀的边界，
+    无效区间按指数增长（默认不设上限）的步长探测单个地址找到下一个可读地址，再二分出区间的结束位置。
+    只有探测返回 EC02 的地址标记为无效，跳过的地址标记为未知（其中可能有短的孤立可读区间）。
+    """
+
+    def __init__(self, bus, node_id=NODE_ID, start_address=SCAN_START_ADDRESS, end_address=SCAN_END_ADDRESS,
+                 max_count=SCAN_MAX_COUNT, gap_max_step=SCAN_GAP_MAX_STEP):
+        self.bus = bus
+        self.node_id = node_id
+        self.start_address = start_address
+        self.end_address = end_address
+        self.max_count = max_count
+        self.gap_max_step = gap_max_step
+        self.transactions = 0
+        self.states = {}
+
+    def probe(self, address, count):
+        """
+        :return: 成功返回 None，异常响应返回 exception_code，通讯失败返回 -1
+        """
+        self.transactions += 1
+        try:
+            response = self.bus.read_holding_registers(address=address, count=count, slave=self.node_id)
+        except Exception as e:
+            logger.error(f'[node_id = {self.node_id}]读取{address}~{address + count - 1}异常: {e}')
+            return -1
+        if response.isError():
+            return response.exception_code
+        return None
+
+    def _mark(self, address, count, state):
+        for offset in range(count):
+            self.states[address + offset] = state
+
+    def _valid_prefix(self, address, count):
+        """
+        已知 [address, address+count) 读取返回 EC02、address 本身可读，二分查找最长可读前缀。
+        """
+        low, high = 1, count - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            result = self.probe(address, middle)
+            if result is None:
+                low = middle
+            elif result == EC02_ILLEGAL_DATA_ADDRESS:
+                high = middle - 1
+            else:
+                return None
+        return low
+
+    def _gap_end(self, address):
+        """
+        已知 address 不可读，查找其后第一个可读地址：按 1、2、4...（不超过 gap_max_step）的步长探测单个地址，
+        越过区间后在最后一步内二分。探测返回 EC02 的地址在此标记为无效。
+        :return: (第一个可读或返回非 EC02 异常的地址，不存在时为 end_address+1, 该地址的探测结果)
+        """
+        invalid = address
+        step = 1
+        while True:
+            if invalid >= self.end_address:
+                return self.end_address + 1, None
+            candidate = min(invalid + step, self.end_address)
+            result = self.probe(candidate, 1)
+            if result != EC02_ILLEGAL_DATA_ADDRESS:
+                break
+            self._mark(candidate, 1, ADDRESS_INVALID)
+            invalid = candidate
+            step = step * 2 if self.gap_max_step is None else min(step * 2, self.gap_max_step)
+        high = candidate
+        while high - invalid > 1:
+            middle = (invalid + high) // 2
+            middle_result = self.probe(middle, 1)
+            if middle_result == EC02_ILLEGAL_DATA_ADDRESS:
+                self._mark(middle, 1, ADDRESS_INVALID)
+                invalid = middle
+            else:
+                high, result = middle, middle_result
+        return high, result
+
+    def scan(self):
+        """
+        :return: {地址: ADDRESS_*}
+        """
+        self.transactions = 0
+        self.states = {}
+        address = self.start_address
+        in_gap = False
+        while address <= self.end_address:
+            count = min(self.max_count, self.end_address - address + 1)
+            if not in_gap:
+                result = self.probe(address, count)
+                if result is None:
+                    self._mark(address, count, ADDRESS_VALID)
+                    address += count
+                    continue
+                if result != EC02_ILLEGAL_DATA_ADDRESS:
+                    logger.info(f'[node_id = {self.node_id}]{address}~{address + count - 1}返回'
+                                f'{roh_exception_list.get(result, result)}, 标记为未知')
+                    self._mark(address, count, ADDRESS_UNKNOWN)
+                    address += count
+                    continue
+            if in_gap:
+                # address - 1 不可读，跳到无效区间之后
+                gap_end, result = self._gap_end(address - 1)
+                for skipped in range(address, gap_end):
+                    self.states.setdefault(skipped, ADDRESS_UNKNOWN)
+                address = gap_end
+                in_gap = False
+                if result is not None and address <= self.end_address:
+                    self._mark(address, 1, ADDRESS_UNKNOWN)
+                    address += 1
+                    in_gap = True
+                # 离开无效区间后从该地址重新按最大帧读取
+                continue
+            result = self.probe(address, 1)
+            if result is not None:
+                self._mark(address, 1, ADDRESS_INVALID if result == EC02_ILLEGAL_DATA_ADDRESS else ADDRESS_UNKNOWN)
+                in_gap = True
+                address += 1
+                continue
+            length = self._valid_prefix(address, count) if count > 1 else 1
+            if length is None:
+                self._mark(address, 1, ADDRESS_VALID)
+                address += 1
+                continue
+            self._mark(address, length, ADDRESS_VALID)
+            address += length
+            if address <= self.end_address and length < count:
+                # 二分已确认 address 是无效地址
+                self._mark(address, 1, ADDRESS_INVALID)
+                in_gap = True
+                address += 1
+        logger.info(f'[node_id = {self.node_id}]扫描{self.start_address}~{self.end_address}完成, '
+                    f'共{self.transactions}次事务')
+        return self.states
+
+    def probe_read_only(self, addresses):
+        """
+        对可读地址读出后用 FC16 回写原值，写入被拒绝的为只读寄存器。
+        :return: 只读地址集合
+        """
+        read_only = set()
+        for address in sorted(addresses):
+            if address in WRITE_PROBE_EXCLUDED:
+                continue
+            self.transactions += 2
+            try:
+                response = self.bus.read_holding_registers(address=address, count=1, slave=self.node_id)
+                if response.isError():
+                    continue
+                response = self.bus.write_registers(address=address, values=response.registers, slave=self.node_id)
+                if response.isError():
+                    read_only.add(address)
+            except Exception as e:
+                logger.error(f'[node_id = {self.node_id}]探测寄存器{address}可写性异常: {e}')
+        return read_only
+
+    def build_map(self, probe_writable=False):
+        """
+        扫描并生成机器可读的地址映射。
+        :param probe_writable: 为 True 时回写原值探测只读寄存器（会写设备）
+        """
+        states = self.scan()
+        valid = [address for address, state in states.items() if state == ADDRESS_VALID]
+        register_map = {
+            'identity': read_device_identity(self.bus, self.node_id),
+            'start_address': self.start_address,
+            'end_address': self.end_address,
+        }
+        for state, name in roh_address_state_list.items():
+            register_map[name] = to_ranges(address for address, value in states.items() if value == state)
+        if probe_writable:
+            register_map['read_only'] = to_ranges(self.probe_read_only(valid))
+        register_map['transactions'] = self.transactions
+        return register_map
+
+
+def save_map(register_map, path=SCAN_MAP_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(register_map, f, indent=2)
+
+
+def load_map(path=SCAN_MAP_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def diff_maps(old_map, new_map):
+    """
+    比较两个固件版本的地址映射。
+    :return: {'valid': {'added': 区间, 'removed': 区间}, 'read_only': {...}}，没有差异的类别不出现
+    """
+    diff = {}
+    for name in ('valid', 'read_only'):
+        if name not in old_map or name not in new_map:
+            continue
+        old_addresses = from_ranges(old_map[name])
+        new_addresses = from_ranges(new_map[name])
+        added = to_ranges(new_addresses - old_addresses)
+        removed = to_ranges(old_addresses - new_addresses)
+        if added or removed:
+            diff[name] = {'added': added, 'removed': removed}
+    return diff
+
+
+if __name__ == "__main__":
+    # 初始化 modbus 总线
+    bus = setup_modbus()
+
+    if bus:
+        register_map = RegisterScanner(bus=bus).build_map()
+        logger.info(f"可读地址: {register_map['valid']}, 共{register_map['transactions']}次事务")
+        try:
+            old_map = load_map()
+            if old_map.get('identity') != register_map['identity']:
+                logger.info(f"与 {old_map.get('identity')} 的差异: {diff_maps(old_map, register_map)}")
+        except (OSError, ValueError):
+            pass
+        save_map(register_map)
+        close_modbus(bus)
@@ -0,0 +1,291 @@
+import threading
+import time
+import logging
+
+import numpy as np
+from pymodbus.exceptions import ModbusIOException
+
+from mobus_operator import (FastResponse, BROADCAST_NODE_ID, NODE_ID, NUM_FINGERS, ROH_SUB_EXCEPTION, ROH_FINGER_STATUS0,
+                            ROH_FINGER_CURRENT_LIMIT0, ROH_FINGER_CURRENT0, ROH_FINGER_POS_TARGET0, ROH_FINGER_POS0,
+                            ROH_FINGER_ANGLE_TARGET0, ROH_FINGER_ANGLE0, ROH_FINGER_FORCE0, EC02_ILLEGAL_DATA_ADDRESS,
+                            EC03_ILLEGAL_DATA_VALUE, EC04_SERVER_DEVICE_FAILURE, ERR_INVALID_DATA,
+                            FC_READ_HOLDING_REGISTERS, FC_WRITE_SINGLE_REGISTER, FC_WRITE_MULTIPLE_REGISTERS,
+                            FC_READ_WRITE_REGISTERS, STATUS_OPENING, STATUS_CLOSING, STATUS_POS_REACHED, STATUS_STUCK)
+from register_model import RegisterModel, RULE_READ_ONLY, RULE_WRITE_ONLY, HALF_RANGE
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+SIM_START_ADDRESS = 1000 # 模拟的起始寄存器地址
+SIM_END_ADDRESS = 2999 # 模拟的结束寄存器地址（包含）
+SIM_MAX_READ_COUNT = 125 # FC03 单帧最多读取的寄存器数量
+SIM_MAX_WRITE_COUNT = 123 # FC16 单帧最多写入的寄存器数量
+SIM_POS_RATE = 65535 # 速度为 65535 时每秒移动的位置量（约 1 秒走完全程）
+SIM_MOVING_CURRENT = 300 # 运动时的电流
+SIM_CONTACT_STIFFNESS = 0.5 # 接触弹簧的刚度（力/位置）
+SIM_CONTACT_CURRENT = 0.1 # 接触力对应的电流（电流/力）
+SIM_FORCE_STEP = 0.001 # 力控环的仿真步长（秒）
+SIM_FORCE_MAX_STEPS = 2000 # 两次访问间最多仿真的步数，间隔更长时视为已稳定
+SIM_FORCE_P_SCALE = 500 # ROH_FINGER_FORCE_P 到比例系数（位置/秒/力）的换算
+SIM_FORCE_I_SCALE = 100 # ROH_FINGER_FORCE_I 到积分系数的换算
+SIM_FORCE_D_SCALE = 20000 # ROH_FINGER_FORCE_D 到微分系数的换算
+SIM_FORCE_STILL_RATE = 100 # 力控时速度低于该值（位置/秒）视为停止
+SIM_STUCK_TIME = 0.5 # 位置控制时被接触物挡住（电流达到限制）超过该时间后状态变为堵转（秒）
+NUM_FORCE_FINGERS = 5 # 带力控的手指数量（不含大拇指旋转）
+
+ROH_START_INIT            = (1013) # W
+ROH_RESET                 = (1014) # W
+ROH_FINGER_FORCE_TARGET0  = (1115) # R/W
+ROH_FINGER_SPEED0         = (1125) # R/W
+ROH_FINGER_FORCE_P0       = (1225) # R/W
+ROH_FINGER_FORCE_I0       = (1235) # R/W
+ROH_FINGER_FORCE_D0       = (1245) # R/W
+ROH_FINGER_FORCE_G0       = (1255) # R/W
+
+
+class RohSimulator:
+    """
+    灵巧手模拟器：寄存器写入语义来自 RegisterModel，位置按速度随时间向目标运动。
+    可用 set_contact 在手指前方放置弹簧接触物，写入 ROH_FINGER_FORCE_TARGET* 后手指按
+    ROH_FINGER_FORCE_P/I/D/G 进入力控，用于无硬件时测试力控调参。
+    提供 read_holding_registers/write_register/write_registers/readwrite_registers，
+    可直接传给 read_registers/write_registers 等函数，用于无硬件时开发和测试。
+    发往 BROADCAST_NODE_ID 的写入同样执行，响应由调用方忽略。
+    """
+
+    def __init__(self, model=None, node_id=NODE_ID, clock=time.perf_counter):
+        self.model = model if model is not None else RegisterModel()
+        self.node_id = node_id
+        self.clock = clock
+        self.lock = threading.RLock()
+        # 接触物位置和刚度，没有接触物时位置为无穷大
+        self.contact = np.full(NUM_FINGERS, np.inf)
+        self.stiffness = np.zeros(NUM_FINGERS, dtype=np.float64)
+        self.defaults = np.zeros(SIM_END_ADDRESS - SIM_START_ADDRESS + 1, dtype=np.uint16)
+        for address, rule in self.model.rules.items():
+            if SIM_START_ADDRESS <= address <= SIM_END_ADDRESS:
+                self.defaults[address - SIM_START_ADDRESS] = rule.default
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.memory = self.defaults.copy()
+            self.pos = np.zeros(NUM_FINGERS, dtype=np.float64)
+            self.force_mode = np.zeros(NUM_FINGERS, dtype=bool)
+            self.force_integral = np.zeros(NUM_FINGERS, dtype=np.float64)
+            self.force_rate = np.zeros(NUM_FINGERS, dtype=np.float64)
+            self.velocity = np.zeros(NUM_FINGERS, dtype=np.float64)
+            self.blocked_time = np.zeros(NUM_FINGERS, dtype=np.float64)
+            self.last_update = self.clock()
+            self._update_telemetry(np.zeros(NUM_FINGERS, dtype=bool))
+
+    def set_contact(self, finger, position, stiffness=SIM_CONTACT_STIFFNESS):
+        """
+        在手指闭合方向的 position 处放置弹簧接触物，接触力为 stiffness * (位置 - position)。
+        """
+        with self.lock:
+            self.step()
+            self.contact[finger] = position
+            self.stiffness[finger] = stiffness
+
+    def clear_contact(self, finger=None):
+        with self.lock:
+            self.step()
+            fingers = slice(None) if finger is None else finger
+            self.contact[fingers] = np.inf
+            self.stiffness[fingers] = 0
+
+    def _force(self, pos):
+        return self.stiffness * np.clip(pos - self.contact, 0, None)
+
+    def connect(self):
+        return True
+
+    def close(self):
+        pass
+
+    def _span(self, address, count):
+        return self.memory[address - SIM_START_ADDRESS:address - SIM_START_ADDRESS + count]
+
+    def _valid_span(self, address, count):
+        return (SIM_START_ADDRESS <= address and address + count - 1 <= SIM_END_ADDRESS and
+                all(self.model.is_valid_address(a) for a in range(address, address + count)))
+
+    def _exception(self, function_code, exception_code, sub_exception_code=None):
+        if sub_exception_code is not None:
+            self.memory[ROH_SUB_EXCEPTION - SIM_START_ADDRESS] = sub_exception_code
+        return FastResponse(function_code | 0x80, exception_code=exception_code)
+
+    def _angle_to_pos(self, finger, angle):
+        min_angle, max_angle, _, _ = self.model.rule(ROH_FINGER_ANGLE_TARGET0 + finger).angle_limits
+        if angle >= HALF_RANGE or max_angle <= min_angle:
+            return 0
+        return (min(max(angle, min_angle), max_angle) - min_angle) * 65535 // (max_angle - min_angle)
+
+    def _pos_to_angle(self, finger, pos):
+        min_angle, max_angle, _, _ = self.model.rule(ROH_FINGER_ANGLE_TARGET0 + finger).angle_limits
+        return min_angle + pos * (max_angle - min_angle) / 65535
+
+    def _update_telemetry(self, moving):
+        target = self._span(ROH_FINGER_POS_TARGET0, NUM_FINGERS)
+        closing = np.where(self.force_mode, self.velocity > 0, target > self.pos)
+        force = self._force(self.pos)
+        self._span(ROH_FINGER_POS0, NUM_FINGERS)[:] = np.rint(self.pos).astype(np.uint16)
+        status = np.where(moving, np.where(closing, STATUS_CLOSING, STATUS_OPENING), STATUS_POS_REACHED)
+        self._span(ROH_FINGER_STATUS0, NUM_FINGERS)[:] = np.where(self.blocked_time >= SIM_STUCK_TIME, STATUS_STUCK,
+                                                                   status)
+        current = np.where(moving, SIM_MOVING_CURRENT, 0) + force * SIM_CONTACT_CURRENT
+        self._span(ROH_FINGER_CURRENT0, NUM_FINGERS)[:] = np.rint(np.clip(current, 0, 65535)).astype(np.uint16)
+        self._span(ROH_FINGER_FORCE0, NUM_FINGERS)[:] = np.rint(np.clip(force, 0, 65535)).astype(np.uint16)
+        angles = [self._pos_to_angle(finger, self.pos[finger]) for finger in range(NUM_FINGERS)]
+        self._span(ROH_FINGER_ANGLE0, NUM_FINGERS)[:] = np.rint(angles).astype(np.uint16)
+
+    def step(self):
+        """
+        按时钟推进手指运动到当前时刻，每次访问寄存器前自动调用。
+        """
+        now = self.clock()
+        dt = now - self.last_update
+        if dt <= 0:
+            return
+        self.last_update = now
+        target = self._span(ROH_FINGER_POS_TARGET0, NUM_FINGERS).astype(np.float64)
+        speed = self._span(ROH_FINGER_SPEED0, NUM_FINGERS).astype(np.float64)
+        max_rate = SIM_POS_RATE * speed / 65535
+        delta = np.where(self.force_mode, 0, target - self.pos)
+        pos = self.pos + np.clip(delta, -max_rate * dt, max_rate * dt)
+        # 位置控制时电机电流不超过 ROH_FINGER_CURRENT_LIMIT*，接触力达到对应值后被接触物挡住
+        limit = self._span(ROH_FINGER_CURRENT_LIMIT0, NUM_FINGERS).astype(np.float64)
+        max_force = np.clip(limit - SIM_MOVING_CURRENT, 0, None) / SIM_CONTACT_CURRENT
+        with np.errstate(divide='ignore'):
+            blocked_pos = np.where(self.stiffness > 0, self.contact + max_force / self.stiffness, np.inf)
+        blocked = ~self.force_mode & (delta > 0) & (pos > blocked_pos)
+        self.pos = np.where(blocked, np.maximum(self.pos, blocked_pos), pos)
+        self.blocked_time = np.where(blocked, self.blocked_time + dt, 0)
+        moving = np.abs(delta) >= 1
+        if self.force_mode.any():
+            self._force_step(dt, max_rate)
+            moving = np.where(self.force_mode, np.abs(self.velocity) >= SIM_FORCE_STILL_RATE, moving)
+        self._update_telemetry(moving)
+
+    def _force_step(self, dt, max_rate):
+        """
+        力控手指按固定步长仿真离散 PID：速度 = G/100 * (P*误差 + I*误差积分 - D*力的变化率)，
+        速度饱和时停止积分。
+        """
+        fingers = np.flatnonzero(self.force_mode)
+        force_target = self._span(ROH_FINGER_FORCE_TARGET0, NUM_FORCE_FINGERS)[fingers].astype(np.float64)
+        p = self._span(ROH_FINGER_FORCE_P0, NUM_FORCE_FINGERS)[fingers] / SIM_FORCE_P_SCALE
+        i = self._span(ROH_FINGER_FORCE_I0, NUM_FORCE_FINGERS)[fingers] / SIM_FORCE_I_SCALE
+        d = self._span(ROH_FINGER_FORCE_D0, NUM_FORCE_FINGERS)[fingers] / SIM_FORCE_D_SCALE
+        g = self._span(ROH_FINGER_FORCE_G0, NUM_FORCE_FINGERS)[fingers] / 100
+        rate = max_rate[fingers]
+        contact, stiffness = self.contact[fingers], self.stiffness[fingers]
+        pos, integral, force_rate = self.pos[fingers], self.force_integral[fingers], self.force_rate[fingers]
+        velocity = self.velocity[fingers]
+        for _ in range(min(int(np.ceil(dt / SIM_FORCE_STEP)), SIM_FORCE_MAX_STEPS)):
+            force = stiffness * np.clip(pos - contact, 0, None)
+            error = force_target - force
+            command = g * (p * error + i * (integral + error * SIM_FORCE_STEP) - d * force_rate)
+            saturated = np.abs(command) > rate
+            integral = np.where(saturated, integral, integral + error * SIM_FORCE_STEP)
+            velocity = np.clip(command, -rate, rate)
+            pos = np.clip(pos + velocity * SIM_FORCE_STEP, 0, 65535)
+            force_rate = (stiffness * np.clip(pos - contact, 0, None) - force) / SIM_FORCE_STEP
+        self.pos[fingers], self.force_integral[fingers], self.force_rate[fingers] = pos, integral, force_rate
+        self.velocity[fingers] = velocity
+
+    def _command(self, address, value):
+        if address == ROH_RESET and value:
+            self.reset()
+        elif address == ROH_START_INIT and value:
+            self._span(ROH_FINGER_POS_TARGET0, NUM_FINGERS)[:] = 0
+
+    def _write(self, function_code, address, values):
+        count = len(values)
+        if count == 0 or count > SIM_MAX_WRITE_COUNT:
+            return self._exception(function_code, EC03_ILLEGAL_DATA_VALUE)
+        if not self._valid_span(address, count):
+            return self._exception(function_code, EC02_ILLEGAL_DATA_ADDRESS)
+        expected_values = []
+        for offset, value in enumerate(values):
+            if self.model.rule(address + offset).kind == RULE_READ_ONLY:
+                return self._exception(function_code, EC02_ILLEGAL_DATA_ADDRESS)
+            if not 0 <= value <= 65535:
+                return self._exception(function_code, EC03_ILLEGAL_DATA_VALUE)
+            # 查表代替逐个值调用 predict，模糊测试时每秒需要处理数万次写入
+            accepted, expected, _ = self.model.table(address + offset)
+            if not accepted[value]:
+                # 整帧拒绝，不写入任何寄存器
+                return self._exception(function_code, EC04_SERVER_DEVICE_FAILURE, ERR_INVALID_DATA)
+            expected_values.append(expected[value])
+        for offset, value in enumerate(expected_values):
+            target_address = address + offset
+            if value < 0:
+                # 超出范围，写进去不生效
+                continue
+            if self.model.rule(target_address).kind == RULE_WRITE_ONLY:
+                self._command(target_address, value)
+                continue
+            self.memory[target_address - SIM_START_ADDRESS] = value
+            finger = target_address - ROH_FINGER_ANGLE_TARGET0
+            if 0 <= finger < NUM_FINGERS:
+                self._span(ROH_FINGER_POS_TARGET0, NUM_FINGERS)[finger] = self._angle_to_pos(finger, value)
+                self.force_mode[finger] = False
+            finger = target_address - ROH_FINGER_POS_TARGET0
+            if 0 <= finger < NUM_FINGERS:
+                # 写位置或角度目标退出力控
+                self.force_mode[finger] = False
+            finger = target_address - ROH_FINGER_FORCE_TARGET0
+            if 0 <= finger < NUM_FORCE_FINGERS:
+                # 写非零力目标进入力控，写 0 回到位置控制
+                self.force_mode[finger] = value > 0
+                self.force_integral[finger] = 0
+                self.force_rate[finger] = 0
+        return FastResponse(function_code)
+
+    def read_holding_registers(self, address, count=1, slave=NODE_ID):
+        if slave != self.node_id:
+            raise ModbusIOException(f'[node_id = {slave}]模拟器无响应')
+        with self.lock:
+            if count < 1 or count > SIM_MAX_READ_COUNT:
+                return self._exception(FC_READ_HOLDING_REGISTERS, EC03_ILLEGAL_DATA_VALUE)
+            if not self._valid_span(address, count):
+                return self._exception(FC_READ_HOLDING_REGISTERS, EC02_ILLEGAL_DATA_ADDRESS)
+            self.step()
+            return FastResponse(FC_READ_HOLDING_REGISTERS, registers=self._span(address, count).tolist())
+
+    def write_register(self, address, value, slave=NODE_ID, no_response_expected=False):
+        if slave not in (self.node_id, BROADCAST_NODE_ID):
+            raise ModbusIOException(f'[node_id = {slave}]模拟器无响应')
+        with self.lock:
+            self.step()
+            return self._write(FC_WRITE_SINGLE_REGISTER, address, [value])
+
+    def write_registers(self, address, values, slave=NODE_ID, no_response_expected=False):
+        if slave not in (self.node_id, BROADCAST_NODE_ID):
+            raise ModbusIOException(f'[node_id = {slave}]模拟器无响应')
+        if isinstance(values, int):
+            values = [values]
+        with self.lock:
+            self.step()
+            return self._write(FC_WRITE_MULTIPLE_REGISTERS, address, list(values))
+
+    def readwrite_registers(self, read_address, read_count, write_address, values, slave=NODE_ID):
+        if slave != self.node_id:
+            raise ModbusIOException(f'[node_id = {slave}]模拟器无响应')
+        with self.lock:
+            self.step()
+            response = self._write(FC_READ_WRITE_REGISTERS, write_address, list(values))
+            if response.isError():
+                return response
+            if not self._valid_span(read_address, read_count):
+                return self._exception(FC_READ_WRITE_REGISTERS, EC02_ILLEGAL_DATA_ADDRESS)
+            return FastResponse(FC_READ_WRITE_REGISTERS, registers=self._span(read_address, read_count).tolist())
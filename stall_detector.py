@@ -0,0 +1,185 @@
+import threading
+import time
+import logging
+from collections import deque
+
+import numpy as np
+
+from mobus_operator import (setup_modbus, close_modbus, read_registers, NODE_ID, NUM_FINGERS, ROH_FINGER_STATUS0,
+                            ROH_FINGER_CURRENT_LIMIT0, ROH_FINGER_CURRENT0, ROH_FINGER_POS0, STATUS_OPENING,
+                            STATUS_CLOSING, STATUS_OVER_CURRENT, STATUS_FORCE_REACHED, STATUS_STUCK, roh_status_list)
+from register_mirror import RegisterMirror, POLL_PERIOD
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+TELEMETRY_START_ADDRESS = ROH_FINGER_STATUS0 # 单帧读取 ROH_FINGER_STATUS0 ~ ROH_FINGER_POS5
+TELEMETRY_REGISTER_COUNT = ROH_FINGER_POS0 + NUM_FINGERS - ROH_FINGER_STATUS0
+
+# 事件类型
+EVENT_STATUS_CHANGED = 0X0  # 手指状态变化
+EVENT_OVER_CURRENT = 0X1  # 电流超过 ROH_FINGER_CURRENT_LIMIT*
+EVENT_STALL = 0X2  # 电流接近限制且位置不动（堵转前兆，早于设备报告堵转）
+EVENT_STUCK = 0X3  # 设备报告堵转或电流超限状态
+
+roh_event_list = {
+        EVENT_STATUS_CHANGED: '状态变化',
+        EVENT_OVER_CURRENT: '电流超限',
+        EVENT_STALL: '疑似堵转',
+        EVENT_STUCK: '设备报告故障'
+    }
+
+FAULT_EVENTS = (EVENT_OVER_CURRENT, EVENT_STALL, EVENT_STUCK)
+FAULT_STATUSES = (STATUS_OVER_CURRENT, STATUS_STUCK)
+STALL_CURRENT_RATIO = 0.9 # 电流达到限制的该比例视为接近堵转
+STALL_POS_TOLERANCE = 32 # 每个 STALL_SAMPLE_PERIOD 内位置变化不超过该值视为不动（与 FINGER_POS_TARGET_MAX_LOSS 一致）
+STALL_SAMPLE_PERIOD = POLL_PERIOD # 位置容差对应的采样间隔（秒），实际间隔不同时按比例缩放
+EVENT_HISTORY = 256 # 保留的事件数量
+
+
+class FingerEvent:
+    def __init__(self, kind, finger, timestamp, status, current, limit, pos, previous_status=None):
+        self.kind = kind
+        self.finger = finger
+        self.timestamp = timestamp
+        self.status = status
+        self.current = current
+        self.limit = limit
+        self.pos = pos
+        self.previous_status = previous_status
+
+    def __repr__(self):
+        return (f'FingerEvent({roh_event_list.get(self.kind)}, finger={self.finger}, '
+                f'status={roh_status_list.get(self.status, self.status)}, current={self.current}/{self.limit}, '
+                f'pos={self.pos})')
+
+
+class StallDetector:
+    """
+    堵转与故障的实时检测：每个遥测样本到来时比较 ROH_FINGER_CURRENT* 与 ROH_FINGER_CURRENT_LIMIT*，
+    并解析 ROH_FINGER_STATUS* 的变化，在同一个采样周期内产生事件。
+    手指正在运动（松开/抓取）、电流接近限制且位置不再变化时即判定为疑似堵转，不必等到读写返回 EC04。
+    可挂接在 RegisterMirror 的轮询线程上，也可直接调用 poll(bus) 或 feed()。
+    """
+
+    def __init__(self, on_event=None, current_ratio=STALL_CURRENT_RATIO, pos_tolerance=STALL_POS_TOLERANCE,
+                 sample_period=STALL_SAMPLE_PERIOD):
+        self.on_event = on_event
+        self.current_ratio = current_ratio
+        self.pos_tolerance = pos_tolerance
+        self.sample_period = sample_period
+        self.events = deque(maxlen=EVENT_HISTORY)
+        self.fault_event = threading.Event() # 出现故障时置位，测试和老化程序可等待它提前终止
+        self.faulted = set()
+        self.reset()
+
+    def reset(self):
+        self._status = None
+        self._pos = None
+        self._timestamp = None
+        self._active = np.zeros((len(FAULT_EVENTS), NUM_FINGERS), dtype=bool)
+        self.faulted.clear()
+        self.fault_event.clear()
+
+    def attach(self, mirror):
+        """
+        挂接到 RegisterMirror，轮询区间需要覆盖 ROH_FINGER_STATUS0 ~ ROH_FINGER_POS5。
+        """
+        mirror.add_listener(self._on_poll)
+
+    def _on_poll(self, mirror, timestamp):
+        if not mirror.span_ok(TELEMETRY_START_ADDRESS, TELEMETRY_REGISTER_COUNT):
+            # 本次轮询没有读到遥测，镜像中是旧值
+            return
+        self.feed(mirror.registers(TELEMETRY_START_ADDRESS, TELEMETRY_REGISTER_COUNT), timestamp)
+
+    def poll(self, bus, node_id=NODE_ID):
+        """
+        单帧读取状态、电流限制、电流和位置并检测。
+        :return: 本次产生的事件，读取失败返回 None
+        """
+        response = read_registers(bus=bus, start_address=TELEMETRY_START_ADDRESS,
+                                  register_count=TELEMETRY_REGISTER_COUNT, node_id=node_id, wait_time=0)
+        if response is None or response.isError():
+            return None
+        return self.feed(response.registers, time.time())
+
+    def feed(self, registers, timestamp):
+        """
+        :param registers: 从 ROH_FINGER_STATUS0 开始的 TELEMETRY_REGISTER_COUNT 个寄存器
+        :param timestamp: 采样时刻（秒），位置容差按与上一个样本的间隔缩放
+        :return: 本次产生的事件列表
+        """
+        registers = np.asarray(registers, dtype=np.int64)
+        status = registers[:NUM_FINGERS]
+        offset = ROH_FINGER_CURRENT_LIMIT0 - TELEMETRY_START_ADDRESS
+        limit = registers[offset:offset + NUM_FINGERS]
+        offset = ROH_FINGER_CURRENT0 - TELEMETRY_START_ADDRESS
+        current = registers[offset:offset + NUM_FINGERS]
+        offset = ROH_FINGER_POS0 - TELEMETRY_START_ADDRESS
+        pos = registers[offset:offset + NUM_FINGERS]
+
+        events = []
+        if self._status is not None:
+            for finger in np.flatnonzero(status != self._status):
+                kind = EVENT_STUCK if status[finger] in FAULT_STATUSES else EVENT_STATUS_CHANGED
+                events.append(self._event(kind, finger, timestamp, status, current, limit, pos,
+                                          int(self._status[finger])))
+            moving = (status == STATUS_OPENING) | (status == STATUS_CLOSING)
+            # 判定不动的是速度：采样间隔越长，允许的位置变化越大
+            tolerance = self.pos_tolerance * max(timestamp - self._timestamp, 0.0) / self.sample_period
+            still = np.abs(pos - self._pos) <= tolerance
+            over = current > limit
+            stall = moving & still & (current >= limit * self.current_ratio) & (status != STATUS_FORCE_REACHED)
+            # 条件持续期间只在开始时产生一次事件
+            for row, (kind, condition) in enumerate(((EVENT_OVER_CURRENT, over), (EVENT_STALL, stall))):
+                for finger in np.flatnonzero(condition & ~self._active[row]):
+                    events.append(self._event(kind, finger, timestamp, status, current, limit, pos))
+                self._active[row] = condition
+        self._status = status
+        self._pos = pos
+        self._timestamp = timestamp
+
+        for event in events:
+            self.events.append(event)
+            if event.kind in FAULT_EVENTS:
+                self.faulted.add(event.finger)
+                self.fault_event.set()
+                logger.error(f'检测到手指故障: {event}')
+            if self.on_event is not None:
+                try:
+                    self.on_event(event)
+                except Exception as e:
+                    logger.error(f'事件回调异常: {e}')
+        return events
+
+    def _event(self, kind, finger, timestamp, status, current, limit, pos, previous_status=None):
+        return FingerEvent(kind, int(finger), timestamp, int(status[finger]), int(current[finger]),
+                           int(limit[finger]), int(pos[finger]), previous_status)
+
+
+if __name__ == "__main__":
+    # 初始化 modbus 总线，轮询遥测并在出现故障时立即报告
+    bus = setup_modbus()
+
+    if bus:
+        mirror = RegisterMirror(bus=bus)
+        detector = StallDetector(on_event=lambda event: logger.info(event))
+        detector.attach(mirror)
+        mirror.start()
+        try:
+            while not detector.fault_event.wait(1):
+                pass
+            logger.error(f'手指{sorted(detector.faulted)}故障，停止')
+        except KeyboardInterrupt:
+            logger.info('用户手动终止')
+        finally:
+            mirror.close()
+            close_modbus(bus)
@@ -0,0 +1,271 @@
+import json
+import os
+import time
+import logging
+
+import numpy as np
+
+from mobus_operator import (setup_modbus, close_modbus, read_registers, write_registers, NODE_ID, NUM_FINGERS,
+                            ROH_FINGER_CURRENT0, ROH_FINGER_POS_TARGET0, ROH_FINGER_POS0)
+from limits_cache import read_device_identity
+from motion_wait import wait_converged, POS_TOLERANCE
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+ROH_FINGER_P0             = (1045) # R/W
+PID_REGISTER_COUNT = 36 # ROH_FINGER_P0 ~ ROH_FINGER_G5（含间隔），一帧读完
+STREAM_START_ADDRESS = ROH_FINGER_CURRENT0 # 单帧读取 ROH_FINGER_CURRENT0 ~ ROH_FINGER_POS5
+STREAM_REGISTER_COUNT = ROH_FINGER_POS0 + NUM_FINGERS - ROH_FINGER_CURRENT0
+CURRENT_OFFSET = 0
+POS_OFFSET = ROH_FINGER_POS0 - ROH_FINGER_CURRENT0
+MAX_SAMPLE_RATE = 2000 # 最高采样率（Hz），按此预分配缓冲区
+
+STEP_BASE = 0 # 阶跃起点
+STEP_SIZES = [6554, 16384, 32768, 65535] # 阶跃幅度（10%、25%、50%、100% 行程）
+STEP_DURATION = 1.5 # 每次阶跃的采样时长（秒）
+RISE_LOW = 0.1 # 上升时间起点（幅度比例）
+RISE_HIGH = 0.9 # 上升时间终点（幅度比例）
+SETTLING_BAND = 0.02 # 调节时间的误差带（幅度比例）
+STEADY_STATE_FRACTION = 0.1 # 取最后 10% 的样本计算稳态误差
+STEP_RESULT_FILE = 'roh_step_response.json' # 结果按固件版本和 PID 参数保存
+
+
+class StepRecording:
+    """
+    一次阶跃的采样数据：t 为相对指令发出时刻的时间（秒），pos/current 形状为 (样本数, 6)。
+    """
+
+    def __init__(self, t, pos, current, start, target):
+        self.t = t
+        self.pos = pos
+        self.current = current
+        self.start = start
+        self.target = target
+
+
+def sample(bus, start_address, register_count, duration, node_id=NODE_ID, begin=None):
+    """
+    以总线允许的最高速率（不超过 MAX_SAMPLE_RATE）单帧读取一段寄存器，写入预分配的数组。
+    :return: (t, data)，t 相对 begin，data 形状为 (样本数, register_count)
+    """
+    begin = time.perf_counter() if begin is None else begin
+    capacity = int(duration * MAX_SAMPLE_RATE) + 1
+    t = np.empty(capacity, dtype=np.float64)
+    data = np.empty((capacity, register_count), dtype=np.uint16)
+    count = 0
+    while count < capacity:
+        # 不超过 MAX_SAMPLE_RATE，保证缓冲区能覆盖整个采样时长
+        delay = count / MAX_SAMPLE_RATE - (time.perf_counter() - begin)
+        if delay > 0:
+            time.sleep(delay)
+        response = read_registers(bus=bus, start_address=start_address, register_count=register_count,
+                                  node_id=node_id, wait_time=0, retry_policy=None)
+        now = time.perf_counter() - begin
+        if response is not None and not response.isError():
+            t[count] = now
+            data[count] = response.registers
+            count += 1
+        if now >= duration:
+            break
+    return t[:count], data[:count]
+
+
+def stream(bus, duration, node_id=NODE_ID, begin=None):
+    """
+    单帧读取电流和位置。
+    :return: (t, pos, current)，t 相对 begin
+    """
+    t, data = sample(bus, STREAM_START_ADDRESS, STREAM_REGISTER_COUNT, duration, node_id=node_id, begin=begin)
+    pos = data[:, POS_OFFSET:POS_OFFSET + NUM_FINGERS].astype(np.float64)
+    current = data[:, CURRENT_OFFSET:CURRENT_OFFSET + NUM_FINGERS].astype(np.float64)
+    return t, pos, current
+
+
+def step_metrics(t, y, start, target):
+    """
+    向量化计算阶跃响应指标，y 的每一列为一个手指。
+    :param t: 形状 (n,) 的时间
+    :param y: 形状 (n, k) 的响应
+    :param start: 形状 (k,) 的起点
+    :param target: 形状 (k,) 的目标
+    :return: 各指标形状为 (k,) 的字典，未达到的时间指标为 nan
+    """
+    start = np.asarray(start, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    span = np.where(target == start, 1.0, target - start)
+    normalized = (y - start) / span
+    n = len(t)
+
+    def first_crossing(level):
+        reached = normalized >= level
+        index = np.argmax(reached, axis=0)
+        return np.where(reached.any(axis=0), t[index], np.nan)
+
+    rise_time = first_crossing(RISE_HIGH) - first_crossing(RISE_LOW)
+    overshoot = np.clip(normalized.max(axis=0) - 1.0, 0.0, None) * 100
+    outside = np.abs(normalized - 1.0) > SETTLING_BAND
+    last_outside = n - 1 - np.argmax(outside[::-1], axis=0)
+    settled = ~outside[-1] if n else np.zeros(y.shape[1], dtype=bool)
+    settling_index = np.where(outside.any(axis=0), np.minimum(last_outside + 1, n - 1), 0)
+    settling_time = np.where(settled, t[settling_index], np.nan)
+    tail = max(1, int(n * STEADY_STATE_FRACTION))
+    steady_state_error = y[-tail:].mean(axis=0) - target
+    return {'rise_time': rise_time,
+            'overshoot': overshoot,
+            'settling_time': settling_time,
+            'steady_state_error': steady_state_error}
+
+
+def read_pid(bus, node_id=NODE_ID):
+    """
+    :return: 每个手指的 (P, I, D, G)，读取失败返回 None
+    """
+    response = read_registers(bus=bus, start_address=ROH_FINGER_P0, register_count=PID_REGISTER_COUNT,
+                              node_id=node_id, wait_time=0)
+    if response is None or response.isError():
+        return None
+    registers = response.registers
+    return [tuple(registers[gain * 10 + finger] for gain in range(4)) for finger in range(NUM_FINGERS)]
+
+
+def pid_key(gains):
+    return 'P={},I={},D={},G={}'.format(*gains)
+
+
+class StepResponseSuite:
+    """
+    手指阶跃响应测试：对手指下发多种幅度的位置阶跃，高速采样位置和电流，计算上升时间、超调量、调节时间和稳态误差，
+    结果按固件版本和 PID 参数保存，用于发现控制环路的回归。
+    """
+
+    def __init__(self, bus, node_id=NODE_ID, path=STEP_RESULT_FILE):
+        self.bus = bus
+        self.node_id = node_id
+        self.path = path
+
+    def read_targets(self):
+        response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET0, register_count=NUM_FINGERS,
+                                  node_id=self.node_id, wait_time=0)
+        if response is None or response.isError():
+            return None
+        return list(response.registers)
+
+    def move_to(self, targets):
+        if not write_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET0, data=targets,
+                               node_id=self.node_id, wait_time=0):
+            return False
+        wait_converged(self.bus, ROH_FINGER_POS0, targets, POS_TOLERANCE, node_id=self.node_id)
+        return True
+
+    def run_step(self, fingers, start, target, duration=STEP_DURATION):
+        """
+        被测手指先移动到 start 并稳定，然后用一帧 FC16 同时下发到 target，采样 duration 秒。
+        起点取稳定后实测的位置，大拇指旋转等有下限的手指不会停在 start（如手指 5 最小为 728）。
+        :return: StepRecording，失败返回 None
+        """
+        targets = self.read_targets()
+        if targets is None:
+            return None
+        for finger in fingers:
+            targets[finger] = start
+        if not self.move_to(targets):
+            return None
+        response = read_registers(bus=self.bus, start_address=ROH_FINGER_POS0, register_count=NUM_FINGERS,
+                                  node_id=self.node_id, wait_time=0)
+        if response is None or response.isError():
+            return None
+        start_pos = np.array(response.registers, dtype=np.float64)
+        for finger in fingers:
+            targets[finger] = target
+        begin = time.perf_counter()
+        if not write_registers(bus=self.bus, start_address=ROH_FINGER_POS_TARGET0, data=targets,
+                               node_id=self.node_id, wait_time=0):
+            return None
+        t, pos, current = stream(self.bus, duration, node_id=self.node_id, begin=begin)
+        return StepRecording(t, pos, current, start_pos, np.array(targets, dtype=np.float64))
+
+    def run(self, fingers=range(NUM_FINGERS), step_sizes=STEP_SIZES, base=STEP_BASE, duration=STEP_DURATION):
+        """
+        逐个手指、逐个幅度执行阶跃测试。
+        :return: 结果列表，每项为一个手指一次阶跃的指标
+        """
+        pid = read_pid(self.bus, self.node_id)
+        results = []
+        for size in step_sizes:
+            target = min(65535, base + size)
+            for finger in fingers:
+                recording = self.run_step([finger], base, target, duration)
+                if recording is None or not len(recording.t):
+                    logger.error(f'[node_id = {self.node_id}]手指{finger}阶跃{base}->{target}失败')
+                    continue
+                metrics = step_metrics(recording.t, recording.pos[:, [finger]],
+                                       recording.start[[finger]], recording.target[[finger]])
+                result = {'finger': finger, 'start': base, 'target': target, 'samples': len(recording.t),
+                          'peak_current': float(recording.current[:, finger].max()),
+                          'pid': pid_key(pid[finger]) if pid else None}
+                result.update({name: float(value[0]) for name, value in metrics.items()})
+                logger.info(f'[node_id = {self.node_id}]手指{finger}阶跃{base}->{target}: {result}')
+                results.append(result)
+        return results
+
+    def save(self, results):
+        save_results(self.path, read_device_identity(self.bus, self.node_id), results)
+
+
+def save_results(path, identity, results):
+    """
+    结果按 {固件版本: {手指:PID: [结果, ...]}} 追加保存。
+    """
+    store = load_results(path)
+    device = store.setdefault(str(identity), {})
+    for result in results:
+        device.setdefault(f"finger{result['finger']}:{result['pid']}", []).append(dict(result, time=time.time()))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(store, f, indent=2)
+
+
+def load_results(path=STEP_RESULT_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, threshold=0.2, metrics=('rise_time', 'settling_time', 'overshoot')):
+    """
+    对比同一手指、同一幅度、同一组 PID 参数的阶跃指标，metrics 中的指标（越小越好）变差超过 threshold（比例）的视为回归。
+    :return: 回归描述列表
+    """
+    regressions = []
+    reference = {(result['finger'], result['target'], result.get('pid')): result for result in baseline}
+    for result in current:
+        old = reference.get((result['finger'], result['target'], result.get('pid')))
+        if old is None:
+            continue
+        for name in metrics:
+            old_value, new_value = old.get(name), result.get(name)
+            if old_value is None or new_value is None or np.isnan(old_value) or np.isnan(new_value):
+                continue
+            if new_value > old_value * (1 + threshold) and new_value - old_value > 1e-3:
+                regressions.append(f"手指{result['finger']}阶跃到{result['target']}({result.get('pid')}): "
+                                   f"{name} {old_value:.4f} -> {new_value:.4f}")
+    return regressions
+
+
+if __name__ == "__main__":
+    # 初始化 modbus 总线
+    bus = setup_modbus()
+
+    if bus:
+        suite = StepResponseSuite(bus=bus)
+        results = suite.run()
+        suite.save(results)
+        close_modbus(bus)
@@ -0,0 +1,1052 @@
+import logging
+import math
+import os
+import socket
+import struct
+import threading
+import time
+import pytest
+import numpy as np
+from concurrent.futures import CancelledError
+from multiprocessing import resource_tracker
+from queue import Full
+from pymodbus.exceptions import InvalidMessageReceivedException, ModbusIOException
+
+from mobus_operator import (RetryPolicy, TransactionScheduler, MultiDropScheduler, NODE_ID, FAILURE_TIMEOUT,
+                            FAILURE_EXCEPTION_RESPONSE, FC_READ_HOLDING_REGISTERS, FC_WRITE_MULTIPLE_REGISTERS,
+                            RTT_MIN_SAMPLES, RTT_TIMEOUT_FACTOR, frame_time, MIN_TIMEOUT,
+                            MAX_TIMEOUT, PRIORITY_SAFETY, PRIORITY_CONTROL, PRIORITY_TELEMETRY, PRIORITY_DIAGNOSTICS,
+                            ROH_FINGER_POS0, ROH_FINGER_POS_TARGET0, ROH_BEEP_SWITCH, NUM_FINGERS,
+                            build_write_frame, ROH_FINGER_STATUS0, ROH_FINGER_CURRENT_LIMIT0, ROH_FINGER_CURRENT0,
+                            STATUS_CLOSING, STATUS_POS_REACHED, STATUS_STUCK, FC_WRITE_SINGLE_REGISTER,
+                            ROH_FINGER_ANGLE_TARGET0, ROH_FINGER_ANGLE0, FastResponse,
+                            FC_READ_WRITE_REGISTERS, compute_crc, build_read_frame, build_write_single_frame,
+                            build_read_write_frame, RtuFastTransport, read_registers, write_registers,
+                            probe_function_codes, function_code_supported)
+from roh_simulator import RohSimulator
+from register_model import RegisterModel, RegisterRule, FINGER_POS_TARGET_MAX_LOSS, RULE_RANGE_REJECT
+from register_fuzz import RegisterFuzzer, OP_WRITE, OP_READ, replay as replay_fuzz
+from limits_cache import LimitsDiscovery
+from register_scanner import RegisterScanner, to_ranges, from_ranges, SCAN_START_ADDRESS, SCAN_END_ADDRESS
+from motion_record import MotionRecording, record, replay, compare_traces
+from motion_wait import wait_converged, POS_TOLERANCE, ANGLE_TOLERANCE
+from stall_detector import (StallDetector, TELEMETRY_START_ADDRESS, TELEMETRY_REGISTER_COUNT, STALL_POS_TOLERANCE,
+                            STALL_SAMPLE_PERIOD, EVENT_STATUS_CHANGED, EVENT_OVER_CURRENT, EVENT_STALL, EVENT_STUCK)
+import modbus_gateway
+from modbus_gateway import (ModbusGateway, GatewayServer, query_gateway_stats, MBAP_FORMAT, MBAP_SIZE, MAX_PDU_SIZE,
+                            EC01_ILLEGAL_FUNCTION, EC03_ILLEGAL_DATA_VALUE, EC0B_GATEWAY_TARGET_FAILED)
+from register_mirror import RegisterMirror, RegisterMirrorReader
+from trajectory import interpolate, build_write_frames, TrajectoryStreamer, INTERP_LINEAR, INTERP_MIN_JERK
+from force_sweep import ForceSweep, compare_force_results, NUM_FORCE_FINGERS
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+# 基于 RohSimulator 的测试，不需要硬件，可直接运行: python -m pytest -q test_roh_simulator.py
+SIM_CONTACT_POSITION = 20000 # 接触物位置
+FORCE_TARGET = 3000 # 力目标
+FORCE_DURATION = 1.0 # 每轮采样时长（秒）
+WEAK_GAINS = (2000, 0, 0, 100) # 力控 P 过小，达不到力目标
+STRONG_GAINS = (20000, 0, 0, 100)
+CONFIG_START_ADDRESS = 1000 # 1000~1099 为版本、配置和各手指目标参数，模拟器中不随运动变化
+ROH_NODE_ID = (1005) # R/W，超范围报错 [2,247]
+ROH_RESET = (1014) # W
+ROH_FINGER_P0 = (1045) # R/W，超范围忽略 [100,50000]
+ROH_FINGER_POS_TARGET5 = (1140) # R/W，位置目标，下限 728
+
+
+class TestForceSweep:
+    @pytest.fixture(autouse=True)
+    def simulator(self, tmp_path):
+        self.sim = RohSimulator()
+        for finger in range(NUM_FORCE_FINGERS):
+            self.sim.set_contact(finger, SIM_CONTACT_POSITION)
+        self.sweep = ForceSweep(self.sim, target=FORCE_TARGET, duration=FORCE_DURATION,
+                                path=str(tmp_path / 'force_sweep.json'))
+        yield
+
+    def test_force_sweep(self):
+        original = self.sweep.read_gains()
+        grid = [[WEAK_GAINS[0], STRONG_GAINS[0]], [WEAK_GAINS[1]], [WEAK_GAINS[2]], [WEAK_GAINS[3]]]
+        results = self.sweep.run(grid=grid)
+        assert len(results) == 2 * NUM_FORCE_FINGERS, f'扫描结果数量不符: {len(results)}\n'
+        assert self.sweep.read_gains() == original, '扫描结束后没有恢复原来的力控参数\n'
+
+        for finger in range(NUM_FORCE_FINGERS):
+            by_gains = {result['gains']: result for result in results if result['finger'] == finger}
+            strong = by_gains[STRONG_GAINS]
+            weak = by_gains[WEAK_GAINS]
+            logger.info(f'手指{finger}: 强增益 {strong}, 弱增益 {weak}')
+            assert not math.isnan(strong['settling_time']) and strong['settling_time'] < FORCE_DURATION, \
+                f'手指{finger}力控没有稳定: {strong}\n'
+            assert abs(strong['steady_state_error']) <= FORCE_TARGET * 0.05, f'手指{finger}稳态误差过大: {strong}\n'
+            assert strong['tracking_error'] <= FORCE_TARGET * 0.1, f'手指{finger}跟踪误差过大: {strong}\n'
+            assert weak['tracking_error'] > strong['tracking_error'], f'扫描没有区分出较差的参数: {weak}\n'
+            front = self.sweep.best(results)[finger]
+            assert STRONG_GAINS in [result['gains'] for result in front], f'手指{finger}的最优前沿不含强增益: {front}\n'
+
+        assert compare_force_results(results, results) == [], '同一组结果与自身比较不应有回归\n'
+
+
+class _Response:
+    def __init__(self, registers=None, exception_code=None):
+        self.registers = registers
+        self.exception_code = exception_code
+
+    def isError(self):
+        return self.exception_code is not None
+
+
+class _SerialPort:
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+
+class _Bus:
+    """
+    只提供 socket.timeout 的总线，request() 按顺序返回预设的结果，('raise', 异常[, 延迟]) 表示延迟后抛出该异常。
+    """
+
+    def __init__(self, outcomes, timeout=0.1):
+        self.socket = _SerialPort(timeout)
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else _Response([0])
+        if isinstance(outcome, tuple):
+            if len(outcome) > 2:
+                time.sleep(outcome[2])
+            raise outcome[1]
+        return outcome
+
+
+class TestRetryPolicy:
+    def test_retries_timeouts_raised_or_returned(self):
+        policy = RetryPolicy(backoff_base=0)
+        # 新版 pymodbus 抛出 ModbusIOException，旧版作为返回值，两种都按超时重试
+        bus = _Bus([('raise', ModbusIOException('raised')), ModbusIOException('returned'), _Response([1])])
+        response = policy.execute(bus, FC_READ_HOLDING_REGISTERS, bus.request)
+        assert response.registers == [1]
+        assert bus.calls == 3
+        assert policy.stats[FAILURE_TIMEOUT] == 2
+        assert policy.stats['retries'] == 2
+
+    def test_gives_up_after_max_retries(self):
+        policy = RetryPolicy(max_retries=2, backoff_base=0)
+        bus = _Bus([('raise', ModbusIOException('timeout'))] * 4)
+        with pytest.raises(ModbusIOException):
+            policy.execute(bus, FC_READ_HOLDING_REGISTERS, bus.request)
+        assert bus.calls == 3
+        assert policy.stats[FAILURE_TIMEOUT] == 3
+
+    def test_exception_response_counted_not_retried(self):
+        policy = RetryPolicy(backoff_base=0)
+        bus = _Bus([_Response(exception_code=4)])
+        response = policy.execute(bus, FC_READ_HOLDING_REGISTERS, bus.request)
+        assert response.exception_code == 4
+        assert bus.calls == 1
+        assert policy.stats[FAILURE_EXCEPTION_RESPONSE] == 1
+        assert policy.stats['retries'] == 0
+
+    def test_timeout_follows_rtt_only_after_enough_samples(self):
+        policy = RetryPolicy()
+        bus = _Bus([])
+        for _ in range(RTT_MIN_SAMPLES - 1):
+            policy.execute(bus, FC_READ_HOLDING_REGISTERS, bus.request)
+        # 样本不足时保持传输层自己的超时
+        assert policy.timeout_for(bus, FC_READ_HOLDING_REGISTERS) is None
+        assert bus.socket.timeout == 0.1
+        policy.execute(bus, FC_READ_HOLDING_REGISTERS, bus.request)
+        policy.execute(bus, FC_READ_HOLDING_REGISTERS, bus.request)
+        timeout = policy.timeout_for(bus, FC_READ_HOLDING_REGISTERS)
+        assert MIN_TIMEOUT <= timeout <= MAX_TIMEOUT
+        assert bus.socket.timeout == timeout
+
+    def test_timeout_scales_with_frame_size(self):
+        policy = RetryPolicy()
+        bus = _Bus([])
+        for _ in range(RTT_MIN_SAMPLES):
+            policy.execute(bus, FC_READ_HOLDING_REGISTERS, bus.request, ROH_FINGER_POS0, 1)
+        short = policy.timeout_for(bus, FC_READ_HOLDING_REGISTERS, 1)
+        long = policy.timeout_for(bus, FC_READ_HOLDING_REGISTERS, 125)
+        # 短帧样本不能把 125 个寄存器的超时压到传输时间以下
+        wire_time = frame_time(bus, FC_READ_HOLDING_REGISTERS, 125)
+        assert wire_time > 0.02
+        assert long >= wire_time * RTT_TIMEOUT_FACTOR
+        assert long > short
+
+    def test_timed_out_attempts_raise_timeout(self):
+        policy = RetryPolicy(max_retries=0)
+        bus = _Bus([])
+        for _ in range(RTT_MIN_SAMPLES):
+            policy.execute(bus, FC_READ_HOLDING_REGISTERS, bus.request)
+        before = policy.timeout_for(bus, FC_READ_HOLDING_REGISTERS)
+        bus.outcomes = [('raise', ModbusIOException('timeout'), before)]
+        with pytest.raises(ModbusIOException):
+            policy.execute(bus, FC_READ_HOLDING_REGISTERS, bus.request)
+        assert policy.timeout_for(bus, FC_READ_HOLDING_REGISTERS) > before
+
+    def test_writes_not_retried_by_default(self):
+        bus = _Bus([('raise', ModbusIOException('timeout'))] * 4)
+        with pytest.raises(ModbusIOException):
+            RetryPolicy(backoff_base=0).execute(bus, FC_WRITE_MULTIPLE_REGISTERS, bus.request,
+                                                ROH_FINGER_POS_TARGET0, NUM_FINGERS)
+        assert bus.calls == 1
+
+    def test_command_registers_never_retried(self):
+        policy = RetryPolicy(backoff_base=0, retry_writes=True)
+        bus = _Bus([('raise', ModbusIOException('timeout')), _Response([0])])
+        policy.execute(bus, FC_WRITE_MULTIPLE_REGISTERS, bus.request, ROH_FINGER_POS_TARGET0, NUM_FINGERS)
+        assert bus.calls == 2
+        bus = _Bus([('raise', ModbusIOException('timeout')), _Response([0])])
+        with pytest.raises(ModbusIOException):
+            policy.execute(bus, FC_WRITE_MULTIPLE_REGISTERS, bus.request, ROH_RESET, 1)
+        assert bus.calls == 1
+
+
+class TestTransactionScheduler:
+    @pytest.fixture(autouse=True)
+    def scheduler(self):
+        self.sim = RohSimulator()
+        self.scheduler = TransactionScheduler(self.sim, queue_size=4, chunk_size=32)
+        yield
+        self.scheduler.stop()
+
+    def test_priority_order(self):
+        done = []
+        futures = {'telemetry': self.scheduler.read(ROH_FINGER_POS0, 6, priority=PRIORITY_TELEMETRY),
+                   'diagnostics': self.scheduler.read(ROH_FINGER_POS0, 6, priority=PRIORITY_DIAGNOSTICS),
+                   'control': self.scheduler.write(ROH_FINGER_POS_TARGET0, [100] * 6, priority=PRIORITY_CONTROL),
+                   'safety': self.scheduler.write(ROH_FINGER_POS_TARGET0, [0] * 6, priority=PRIORITY_SAFETY)}
+        for name, future in futures.items():
+            future.add_done_callback(lambda _, name=name: done.append(name))
+        self.scheduler.start()
+        for future in futures.values():
+            future.result(timeout=5)
+        assert done == ['safety', 'control', 'telemetry', 'diagnostics']
+
+    def test_chunked_read(self):
+        self.scheduler.start()
+        # 配置寄存器区间，拆成 32+32+32+4 四帧读取
+        registers = self.scheduler.read(CONFIG_START_ADDRESS, 100).result(timeout=5)
+        assert registers == self.sim.read_holding_registers(CONFIG_START_ADDRESS, 100).registers
+
+    def test_queue_full(self):
+        for _ in range(4):
+            self.scheduler.read(ROH_FINGER_POS0, 6)
+        with pytest.raises(Full):
+            self.scheduler.read(ROH_FINGER_POS0, 6, block=False)
+        assert self.scheduler.get_metrics()['telemetry']['rejected'] == 1
+
+    def test_stop_cancels_pending(self):
+        futures = [self.scheduler.read(ROH_FINGER_POS0, 6, priority=priority)
+                   for priority in (PRIORITY_TELEMETRY, PRIORITY_DIAGNOSTICS)]
+        self.scheduler.stop()
+        for future in futures:
+            with pytest.raises(CancelledError):
+                future.result(timeout=1)
+        assert self.scheduler.get_metrics()['telemetry']['queue_depth'] == 0
+        with pytest.raises(RuntimeError):
+            self.scheduler.read(ROH_FINGER_POS0, 6)
+
+
+class _RouterBus:
+    """
+    多设备共线：按 slave 把请求转发给对应节点的 RohSimulator。
+    """
+
+    def __init__(self, node_ids):
+        self.nodes = {node_id: RohSimulator(node_id=node_id) for node_id in node_ids}
+
+    def read_holding_registers(self, address, count=1, slave=NODE_ID):
+        return self.nodes[slave].read_holding_registers(address, count, slave=slave)
+
+    def write_register(self, address, value, slave=NODE_ID, no_response_expected=False):
+        return self.nodes[slave].write_register(address, value, slave=slave)
+
+    def write_registers(self, address, values, slave=NODE_ID, no_response_expected=False):
+        return self.nodes[slave].write_registers(address, values, slave=slave)
+
+    def readwrite_registers(self, read_address, read_count, write_address, values, slave=NODE_ID):
+        return self.nodes[slave].readwrite_registers(read_address, read_count, write_address, values, slave=slave)
+
+
+class TestMultiDropScheduler:
+    NODE_IDS = (NODE_ID, NODE_ID + 1)
+    WRITE_SETTLE_TIME = 0.3
+
+    @pytest.fixture(autouse=True)
+    def scheduler(self):
+        self.bus = _RouterBus(self.NODE_IDS)
+        self.scheduler = MultiDropScheduler(self.bus, node_ids=self.NODE_IDS, write_settle_time=self.WRITE_SETTLE_TIME)
+        yield
+        self.scheduler.stop()
+
+    def test_reads_each_node(self):
+        self.scheduler.start()
+        for node_id in self.NODE_IDS:
+            registers = self.scheduler.read(CONFIG_START_ADDRESS, 10, node_id=node_id).result(timeout=5)
+            assert registers == self.bus.nodes[node_id].read_holding_registers(CONFIG_START_ADDRESS, 10,
+                                                                                slave=node_id).registers
+        metrics = self.scheduler.get_metrics()
+        assert [metrics[node_id]['count'] for node_id in self.NODE_IDS] == [1, 1]
+
+    def test_write_settle_yields_bus(self):
+        first, second = self.NODE_IDS
+        done = []
+        futures = {'write': self.scheduler.write(ROH_FINGER_POS_TARGET0, [100] * 6, node_id=first,
+                                                 priority=PRIORITY_CONTROL),
+                   'read_first': self.scheduler.read(ROH_FINGER_POS0, 6, node_id=first),
+                   'read_second': self.scheduler.read(ROH_FINGER_POS0, 6, node_id=second)}
+        for name, future in futures.items():
+            future.add_done_callback(lambda _, name=name: done.append(name))
+        self.scheduler.start()
+        for future in futures.values():
+            future.result(timeout=5)
+        # 写入后的稳定期内总线让给另一个设备
+        assert done == ['write', 'read_second', 'read_first']
+
+    def test_stop_cancels_pending(self):
+        futures = [self.scheduler.read(ROH_FINGER_POS0, 6, node_id=node_id) for node_id in self.NODE_IDS]
+        self.scheduler.stop()
+        for future in futures:
+            with pytest.raises(CancelledError):
+                future.result(timeout=1)
+        assert all(self.scheduler.get_metrics()[node_id]['queue_depth'] == 0 for node_id in self.NODE_IDS)
+
+
+class TestRegisterModel:
+    @pytest.fixture(autouse=True)
+    def model(self):
+        self.model = RegisterModel()
+        yield
+
+    def test_range_ignore(self):
+        accepted, expected, tolerance = self.model.predict(ROH_FINGER_P0, [99, 100, 50000, 50001], current=300)
+        assert accepted.all()
+        assert expected.tolist() == [300, 100, 50000, 300]
+        assert not tolerance.any()
+        assert self.model.stores(ROH_FINGER_P0, [99, 100, 50000, 50001]).tolist() == [False, True, True, False]
+
+    def test_range_reject(self):
+        accepted, expected, _ = self.model.predict(ROH_NODE_ID, [1, 2, 247, 248])
+        assert accepted.tolist() == [False, True, True, False]
+        assert expected.tolist() == [2, 2, 247, 2]
+
+    def test_bool(self):
+        accepted, expected, _ = self.model.predict(ROH_BEEP_SWITCH, [0, 1, 2, 65535])
+        assert accepted.all()
+        assert expected.tolist() == [0, 1, 1, 1]
+        assert self.model.stores(ROH_BEEP_SWITCH, [0, 1, 2]).tolist() == [True, True, False]
+
+    def test_pos_target(self):
+        accepted, expected, tolerance = self.model.predict(ROH_FINGER_POS_TARGET5, [0, 728, 729, 65535])
+        assert accepted.all()
+        assert expected.tolist() == [728, 728, 729, 65535]
+        # 钳位到下限的值必须精确读回，其余允许精度损失
+        assert tolerance.tolist() == [0, 0, FINGER_POS_TARGET_MAX_LOSS, FINGER_POS_TARGET_MAX_LOSS]
+        assert self.model.check(ROH_FINGER_POS_TARGET5, [729, 729], [True, True],
+                                [729 - FINGER_POS_TARGET_MAX_LOSS, 729 - FINGER_POS_TARGET_MAX_LOSS - 1]).tolist() \
+            == [True, False]
+
+    def test_read_only(self):
+        accepted, expected, _ = self.model.predict(ROH_FINGER_POS0, [0, 100], current=500)
+        assert not accepted.any()
+        assert expected.tolist() == [500, 500]
+        assert self.model.check(ROH_FINGER_POS0, [100], [True], [100], current=500).tolist() == [False]
+
+    def test_table_matches_predict(self):
+        accepted, expected, tolerance = self.model.table(ROH_FINGER_P0)
+        assert len(accepted) == len(expected) == len(tolerance) == 65536
+        assert expected[99] == -1 and expected[100] == 100 and expected[50001] == -1
+        # 规则参数相同的寄存器共用一张表
+        assert self.model.table(ROH_FINGER_P0 + 1) is self.model.table(ROH_FINGER_P0)
+
+    def test_simulator_follows_model(self):
+        sim = RohSimulator(model=self.model)
+        for address, values in ((ROH_FINGER_P0, [99, 100, 50000, 50001]), (ROH_NODE_ID, [1, 2, 247, 248]),
+                                (ROH_BEEP_SWITCH, [0, 2]), (ROH_FINGER_POS_TARGET5, [0, 729, 65535])):
+            for value in values:
+                current = sim.read_holding_registers(address).registers[0]
+                accepted = not sim.write_register(address, value).isError()
+                readback = sim.read_holding_registers(address).registers
+                assert self.model.check(address, [value], [accepted], readback, current=current).all(), \
+                    f'模拟器寄存器{address}写入{value}的行为与模型不一致\n'
+
+
+class TestRegisterFuzzer:
+    FUZZ_SEED = 1
+
+    def test_shrink_to_single_register(self):
+        fuzzer = RegisterFuzzer(seed=self.FUZZ_SEED)
+        operations = fuzzer.generate(30)
+        operations.insert(17, (OP_WRITE, ROH_FINGER_P0 - 2, [7, 8, 2, 9]))
+
+        def fails(candidate):
+            return any(kind == OP_WRITE and ROH_FINGER_P0 in range(address, address + len(payload)) and
+                       payload[ROH_FINGER_P0 - address] == 2 for kind, address, payload in candidate)
+
+        # 多寄存器写被缩短为只写出错的那一个寄存器
+        assert fuzzer.shrink(operations, fails) == [(OP_WRITE, ROH_FINGER_P0, [2])]
+
+    def test_shrink_keeps_dependent_operations(self):
+        fuzzer = RegisterFuzzer(seed=self.FUZZ_SEED)
+        operations = fuzzer.generate(30)
+        write = (OP_WRITE, ROH_BEEP_SWITCH, [2])
+        read = (OP_READ, ROH_BEEP_SWITCH, 1)
+        operations.insert(5, write)
+        operations.insert(20, read)
+
+        def fails(candidate):
+            return write in candidate and read in candidate[candidate.index(write) + 1:]
+
+        assert fuzzer.shrink(operations, fails) == [write, read]
+
+    def test_simulator_matches_model(self):
+        result = RegisterFuzzer(seed=self.FUZZ_SEED).fuzz(sequences=20)
+        assert result['failures'] == [], f'模拟器与参考模型不一致: {result["failures"]}\n'
+
+    def test_finds_and_minimizes_mismatch(self):
+        # 参考模型认为布尔寄存器只接受 0，模拟器接受任意值，写入非 0 值即不一致
+        model = RegisterModel()
+        model.rules[ROH_BEEP_SWITCH] = RegisterRule(RULE_RANGE_REJECT, low=0, high=0)
+        fuzzer = RegisterFuzzer(model=model, seed=self.FUZZ_SEED)
+        result = fuzzer.fuzz(simulator=RohSimulator(clock=lambda: 0.0), sequences=50)
+        assert result['failures'], '没有发现模型与模拟器的差异\n'
+        for minimal in result['failures']:
+            # 最小序列只剩一个写 ROH_BEEP_SWITCH 的单寄存器写操作
+            assert len(minimal) == 1, f'失败序列没有被最小化: {minimal}\n'
+            kind, address, payload = minimal[0]
+            assert (kind, address, len(payload)) == (OP_WRITE, ROH_BEEP_SWITCH, 1) and payload[0] != 0
+
+    def test_replay_uses_discovered_limits_and_restores(self, tmp_path):
+        # 设备的角度限位与默认模型不同：写入 0 读回 100
+        device_model = RegisterModel()
+        device_model.rules[ROH_FINGER_ANGLE_TARGET0].angle_limits = (100, 32500, 35000, 65000)
+        sim = RohSimulator(model=device_model, clock=lambda: 0.0)
+        operations = [(OP_WRITE, ROH_FINGER_P0, [30000, 123]), (OP_WRITE, ROH_FINGER_ANGLE_TARGET0, [0]),
+                      (OP_READ, ROH_FINGER_ANGLE_TARGET0, 1), (OP_READ, ROH_FINGER_P0, 2)]
+        addresses = [ROH_FINGER_P0, ROH_FINGER_P0 + 1, ROH_FINGER_ANGLE_TARGET0]
+        original = [sim.read_holding_registers(address).registers[0] for address in addresses]
+        limits = LimitsDiscovery(sim, path=str(tmp_path / 'limits.json'))
+        assert replay_fuzz(sim, operations, limits=limits, reset_wait=0) is None
+        assert limits.limits[f'{ROH_FINGER_ANGLE_TARGET0}:0'] == 100
+        # 默认模型认为写入 0 读回 0，会误报不一致
+        assert replay_fuzz(sim, operations, model=RegisterModel(), reset_wait=0) is not None
+        assert [sim.read_holding_registers(address).registers[0] for address in addresses] == original
+
+
+class TestTrajectory:
+    TIMES = [0, 0.5, 1.5]
+    WAYPOINTS = [[0] * NUM_FINGERS, [65535] * NUM_FINGERS, [1000] * NUM_FINGERS]
+    RATE = 100
+
+    def test_interpolate_endpoints(self):
+        for mode in (INTERP_LINEAR, INTERP_MIN_JERK):
+            t, values = interpolate(self.TIMES, self.WAYPOINTS, rate=self.RATE, mode=mode)
+            assert len(t) == len(values) == int(self.TIMES[-1] * self.RATE) + 1
+            assert values.shape[1] == NUM_FINGERS and values.dtype == np.uint16
+            assert t[0] == 0 and t[-1] == pytest.approx(self.TIMES[-1])
+            # 关键帧时刻正好落在关键帧位置上
+            for time_point, waypoint in zip(self.TIMES, self.WAYPOINTS):
+                index = int(round(time_point * self.RATE))
+                assert values[index].tolist() == waypoint
+
+    def test_min_jerk_smooth_at_keyframes(self):
+        _, linear = interpolate(self.TIMES, self.WAYPOINTS, rate=self.RATE, mode=INTERP_LINEAR)
+        _, min_jerk = interpolate(self.TIMES, self.WAYPOINTS, rate=self.RATE, mode=INTERP_MIN_JERK)
+        linear_step = np.abs(np.diff(linear[:, 0].astype(np.int64)))
+        min_jerk_step = np.abs(np.diff(min_jerk[:, 0].astype(np.int64)))
+        # 起止速度为 0，起步的第一步比线性插值小得多，中段速度更高
+        assert min_jerk_step[0] < linear_step[0] / 10
+        assert min_jerk_step.max() > linear_step.max()
+
+    def test_interpolate_rejects_invalid_keyframes(self):
+        with pytest.raises(ValueError):
+            interpolate([0, 1], self.WAYPOINTS)
+        with pytest.raises(ValueError):
+            interpolate([0, 1, 1], self.WAYPOINTS)
+        with pytest.raises(ValueError):
+            interpolate([], [])
+
+    def test_build_write_frames_match_single_frame(self):
+        _, values = interpolate(self.TIMES, self.WAYPOINTS, rate=self.RATE, mode=INTERP_MIN_JERK)
+        frames = build_write_frames(NODE_ID, ROH_FINGER_POS_TARGET0, values)
+        assert frames.shape[0] == len(values)
+        for row, frame in zip(values, frames):
+            assert frame.tobytes() == bytes(build_write_frame(NODE_ID, ROH_FINGER_POS_TARGET0, row.tolist()))
+
+    def test_stream_to_simulator(self):
+        sim = RohSimulator()
+        t, values = interpolate(self.TIMES, self.WAYPOINTS, rate=self.RATE, mode=INTERP_MIN_JERK)
+        stats = TrajectoryStreamer(sim).play(t, values)
+        assert stats.sent + stats.skipped == len(t) and stats.failed == 0
+        assert sim.read_holding_registers(ROH_FINGER_POS_TARGET0, NUM_FINGERS).registers == self.WAYPOINTS[-1]
+
+
+class TestMotionRecord:
+    RECORD_DURATION = 0.5
+    RECORD_RATE = 100
+
+    def test_record_and_replay(self):
+        sim = RohSimulator()
+        sim.write_registers(ROH_FINGER_POS_TARGET0, [40000] * NUM_FINGERS)
+        recording = record(sim, self.RECORD_DURATION, rate=self.RECORD_RATE)
+        assert recording.pos.shape == (len(recording.t), NUM_FINGERS) and recording.pos.dtype == np.uint16
+        assert len(recording.t) > self.RECORD_DURATION * self.RECORD_RATE * 0.8
+        assert recording.pos[-1, 0] > recording.pos[0, 0], '录制期间手指没有运动\n'
+
+        target = RohSimulator()
+        stats, _ = replay(target, recording)
+        assert stats.failed == 0 and stats.sent > 0
+        final = target.read_holding_registers(ROH_FINGER_POS0, NUM_FINGERS).registers
+        assert np.all(np.abs(np.asarray(final) - recording.pos[-1]) <= POS_TOLERANCE), \
+            f'回放结束位置与录制不一致: {final} != {recording.pos[-1].tolist()}\n'
+
+    def test_save_and_load(self, tmp_path):
+        t = np.linspace(0, 1, 11)
+        pos = np.tile(np.arange(11, dtype=np.uint16)[:, None] * 100, (1, NUM_FINGERS))
+        path = str(tmp_path / 'motion.npz')
+        MotionRecording(t, pos, rate=10).save(path)
+        loaded = MotionRecording.load(path)
+        assert np.array_equal(loaded.t, t) and np.array_equal(loaded.pos, pos) and loaded.rate == 10
+
+    def test_compare_traces(self):
+        t = np.linspace(0, 1, 11)
+        pos = np.tile(np.arange(11, dtype=np.uint16)[:, None] * 100, (1, NUM_FINGERS))
+        reference = MotionRecording(t, pos)
+        assert np.all(compare_traces(reference, MotionRecording(t, pos)) == 0)
+        # 以一半速度回放，时间缩放后应完全一致
+        assert np.all(compare_traces(reference, MotionRecording(t * 2, pos), time_scale=2) == 0)
+        # 晚 0.1 秒开始，偏差为一个采样间隔的位移
+        assert np.all(compare_traces(reference, MotionRecording(t + 0.1, pos)) == 100)
+        assert compare_traces(reference, MotionRecording(t[:0], pos[:0])) is None
+
+
+def _telemetry(status=STATUS_POS_REACHED, current=0, limit=1000, pos=10000):
+    """
+    构造从 ROH_FINGER_STATUS0 开始的遥测寄存器，finger 0 使用给定值，其余手指静止到位。
+    """
+    registers = [0] * TELEMETRY_REGISTER_COUNT
+    for address, value, default in ((ROH_FINGER_STATUS0, status, STATUS_POS_REACHED),
+                                    (ROH_FINGER_CURRENT_LIMIT0, limit, 1000),
+                                    (ROH_FINGER_CURRENT0, current, 0),
+                                    (ROH_FINGER_POS0, pos, 10000)):
+        offset = address - TELEMETRY_START_ADDRESS
+        registers[offset:offset + NUM_FINGERS] = [value] + [default] * (NUM_FINGERS - 1)
+    return registers
+
+
+class _StaleMirror:
+    def span_ok(self, start_address, register_count=1):
+        return False
+
+    def registers(self, start_address, register_count):
+        raise AssertionError('轮询失败时不应读取镜像')
+
+
+class TestStallDetector:
+    @pytest.fixture(autouse=True)
+    def detector(self):
+        self.detector = StallDetector()
+        yield
+
+    def test_status_change_and_stuck(self):
+        assert self.detector.feed(_telemetry(), 0.0) == []
+        events = self.detector.feed(_telemetry(status=STATUS_CLOSING), STALL_SAMPLE_PERIOD)
+        assert [(event.kind, event.finger, event.previous_status) for event in events] == \
+            [(EVENT_STATUS_CHANGED, 0, STATUS_POS_REACHED)]
+        assert not self.detector.fault_event.is_set()
+        events = self.detector.feed(_telemetry(status=STATUS_STUCK), 2 * STALL_SAMPLE_PERIOD)
+        assert [event.kind for event in events] == [EVENT_STUCK]
+        assert self.detector.fault_event.is_set() and self.detector.faulted == {0}
+        self.detector.reset()
+        assert not self.detector.fault_event.is_set() and not self.detector.faulted
+
+    def test_over_current_reported_once(self):
+        self.detector.feed(_telemetry(), 0.0)
+        kinds = [[event.kind for event in self.detector.feed(_telemetry(current=1001), index * STALL_SAMPLE_PERIOD)]
+                 for index in range(1, 4)]
+        # 条件持续期间只在开始时产生一次事件
+        assert kinds == [[EVENT_OVER_CURRENT], [], []]
+
+    def test_stall_before_device_reports(self):
+        self.detector.feed(_telemetry(status=STATUS_CLOSING, current=500, pos=10000), 0.0)
+        # 电流接近限制且位置不动，设备仍报告正在抓取
+        events = self.detector.feed(_telemetry(status=STATUS_CLOSING, current=950, pos=10010), STALL_SAMPLE_PERIOD)
+        assert [(event.kind, event.finger) for event in events] == [(EVENT_STALL, 0)]
+        assert self.detector.fault_event.is_set()
+
+    def test_still_tolerance_scales_with_sample_interval(self):
+        move = 2 * STALL_POS_TOLERANCE
+        self.detector.feed(_telemetry(status=STATUS_CLOSING, current=950, pos=10000), 0.0)
+        # 一个采样周期移动两倍容差：仍在运动
+        assert self.detector.feed(_telemetry(status=STATUS_CLOSING, current=950, pos=10000 + move),
+                                  STALL_SAMPLE_PERIOD) == []
+        # 同样的位移用了四个采样周期：速度低于阈值，判为堵转
+        events = self.detector.feed(_telemetry(status=STATUS_CLOSING, current=950, pos=10000 + 2 * move),
+                                    5 * STALL_SAMPLE_PERIOD)
+        assert [event.kind for event in events] == [EVENT_STALL]
+
+    def test_skips_failed_mirror_poll(self):
+        self.detector._on_poll(_StaleMirror(), 0.0)
+        assert self.detector._status is None
+
+    def test_simulator_stall(self):
+        sim = RohSimulator()
+        sim.set_contact(0, SIM_CONTACT_POSITION)
+        sim.write_registers(ROH_FINGER_POS_TARGET0, [65535])
+        deadline = time.perf_counter() + 3
+        while not self.detector.fault_event.is_set() and time.perf_counter() < deadline:
+            self.detector.poll(sim)
+            time.sleep(STALL_SAMPLE_PERIOD)
+        assert self.detector.faulted == {0}, f'没有检测到手指0堵转: {list(self.detector.events)}\n'
+        kinds = [event.kind for event in self.detector.events if event.finger == 0]
+        # 在设备报告堵转之前先检测到
+        assert EVENT_STALL in kinds and EVENT_STUCK not in kinds
+
+
+class _FlakyBus:
+    """
+    转发到 RohSimulator，fail 为 True 时模拟无响应。
+    """
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.fail = False
+
+    def read_holding_registers(self, address, count=1, slave=NODE_ID):
+        if self.fail:
+            raise ModbusIOException('模拟无响应')
+        return self.sim.read_holding_registers(address, count, slave=slave)
+
+
+class TestRegisterMirror:
+    @pytest.fixture(autouse=True)
+    def mirror(self):
+        # 固定时钟，镜像内容不随运动变化
+        self.sim = RohSimulator(clock=lambda: 0.0)
+        self.bus = _FlakyBus(self.sim)
+        self.mirror = RegisterMirror(self.bus, name=f'roh_test_mirror_{os.getpid()}')
+        self.mirror.open()
+        self.reader = RegisterMirrorReader(name=self.mirror.name)
+        # 读取方通常在另一个进程；同一进程内它会注销写入方在 resource_tracker 的登记，这里恢复
+        resource_tracker.register(self.mirror.shm._name, 'shared_memory')
+        yield
+        self.reader.close()
+        self.mirror.close()
+
+    def test_publish_and_read(self):
+        self.mirror.poll_once()
+        expected = self.sim.read_holding_registers(ROH_FINGER_POS0, NUM_FINGERS).registers
+        assert self.reader.finger_pos() == expected
+        assert self.reader.header()[2] == 1
+        assert self.reader.is_valid(ROH_FINGER_POS0, NUM_FINGERS, max_age=1)
+        # 不在轮询区间内的地址无效
+        assert not self.reader.is_valid(CONFIG_START_ADDRESS)
+
+    def test_torn_read_retried(self):
+        self.mirror.poll_once()
+        generation = self.reader.generation
+        calls = []
+
+        def racing_generation():
+            value = generation()
+            calls.append(value)
+            if len(calls) == 1:
+                # 读取方取得序号后、拷贝映像前，写入方发布了新值
+                self.mirror.publish([(ROH_FINGER_POS0, [1, 2, 3, 4, 5, 6])])
+            return value
+
+        self.reader.generation = racing_generation
+        assert self.reader.finger_pos() == [1, 2, 3, 4, 5, 6]
+        assert len(calls) == 4 and calls[0] != calls[1]
+
+    def test_read_times_out_while_writing(self):
+        self.mirror.poll_once()
+        self.mirror.seq += 1  # 写入方停在写入中
+        self.mirror._write_header(time.time())
+        with pytest.raises(TimeoutError):
+            self.reader.finger_pos()
+        with pytest.raises(TimeoutError):
+            self.reader.span_status()
+
+    def test_failed_poll_marks_span_stale(self):
+        self.mirror.poll_once()
+        before = self.reader.finger_pos()
+        assert self.mirror.span_ok(ROH_FINGER_POS0, NUM_FINGERS)
+        self.bus.fail = True
+        self.mirror.poll_once()
+        assert not self.mirror.span_ok(ROH_FINGER_POS0, NUM_FINGERS)
+        assert not self.reader.is_valid(ROH_FINGER_POS0, NUM_FINGERS)
+        (_, _, last_poll, _, errors), = self.reader.span_status()
+        assert (last_poll, errors) == (1, 1)
+        # 失败时保留上一次的值
+        assert self.reader.finger_pos() == before
+        self.bus.fail = False
+        self.mirror.poll_once()
+        assert self.reader.is_valid(ROH_FINGER_POS0, NUM_FINGERS)
+
+    def test_refuses_existing_shared_memory(self):
+        with pytest.raises(FileExistsError):
+            RegisterMirror(self.bus, name=self.mirror.name).open()
+
+
+class TestModbusGateway:
+    @pytest.fixture(autouse=True)
+    def gateway(self):
+        self.sim = RohSimulator(clock=lambda: 0.0)
+        self.gateway = ModbusGateway(self.sim)
+        self.server = GatewayServer(self.gateway, port=0)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.sockets = []
+        yield
+        for sock in self.sockets:
+            sock.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.gateway.stop()
+
+    def connect(self):
+        sock = socket.create_connection(('127.0.0.1', self.port), timeout=5)
+        self.sockets.append(sock)
+        return sock
+
+    def send(self, sock, pdu, transaction_id=1, unit_id=NODE_ID):
+        sock.sendall(struct.pack(MBAP_FORMAT, transaction_id, 0, len(pdu) + 1, unit_id) + pdu)
+
+    def receive(self, sock):
+        """
+        :return: (事务号, 单元号, PDU)，连接被关闭时返回 None
+        """
+        header = sock.recv(MBAP_SIZE, socket.MSG_WAITALL)
+        if not header:
+            return None
+        transaction_id, _, length, unit_id = struct.unpack(MBAP_FORMAT, header)
+        return transaction_id, unit_id, sock.recv(length - 1, socket.MSG_WAITALL)
+
+    def wait_queued(self, depth):
+        deadline = time.perf_counter() + 5
+        while self.gateway.queue_depth() < depth and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        assert self.gateway.queue_depth() == depth
+
+    def test_read_echoes_transaction_id(self):
+        self.gateway.start()
+        sock = self.connect()
+        self.send(sock, struct.pack('>BHH', FC_READ_HOLDING_REGISTERS, CONFIG_START_ADDRESS, 10), transaction_id=0x1234)
+        transaction_id, unit_id, pdu = self.receive(sock)
+        assert (transaction_id, unit_id) == (0x1234, NODE_ID)
+        expected = self.sim.read_holding_registers(CONFIG_START_ADDRESS, 10).registers
+        assert pdu == struct.pack('>BB10H', FC_READ_HOLDING_REGISTERS, 20, *expected)
+
+    def test_malformed_requests(self):
+        self.gateway.start()
+        sock = self.connect()
+        # FC16 字节数与寄存器数量不符
+        self.send(sock, struct.pack('>BHHB2H', 0x10, ROH_FINGER_POS_TARGET0, 2, 3, 1, 2))
+        assert self.receive(sock)[2] == bytes([0x90, EC03_ILLEGAL_DATA_VALUE])
+        self.send(sock, struct.pack('>BHH', FC_READ_HOLDING_REGISTERS, CONFIG_START_ADDRESS, 126))
+        assert self.receive(sock)[2] == bytes([0x83, EC03_ILLEGAL_DATA_VALUE])
+        self.send(sock, bytes([0x2B]))
+        assert self.receive(sock)[2] == bytes([0xAB, EC01_ILLEGAL_FUNCTION])
+        # 长度字段超过 PDU 上限时无法再找到帧边界，网关断开连接
+        sock.sendall(struct.pack(MBAP_FORMAT, 1, 0, MAX_PDU_SIZE + 2, NODE_ID))
+        assert self.receive(sock) is None
+
+    def test_overlapping_reads_coalesced(self):
+        first, second = self.connect(), self.connect()
+        self.send(first, struct.pack('>BHH', FC_READ_HOLDING_REGISTERS, CONFIG_START_ADDRESS, 10))
+        self.send(second, struct.pack('>BHH', FC_READ_HOLDING_REGISTERS, CONFIG_START_ADDRESS + 5, 10))
+        self.wait_queued(2)
+        self.gateway.start()
+        expected = self.sim.read_holding_registers(CONFIG_START_ADDRESS, 15).registers
+        assert self.receive(first)[2] == struct.pack('>BB10H', FC_READ_HOLDING_REGISTERS, 20, *expected[:10])
+        assert self.receive(second)[2] == struct.pack('>BB10H', FC_READ_HOLDING_REGISTERS, 20, *expected[5:])
+        stats = self.gateway.get_stats()
+        assert (stats['frames'], stats['coalesced']) == (1, 1)
+
+    def test_timed_out_write_never_sent(self, monkeypatch):
+        monkeypatch.setattr(modbus_gateway, 'REQUEST_TIMEOUT', 0.2)
+        before = self.sim.read_holding_registers(ROH_FINGER_POS_TARGET0).registers[0]
+        sock = self.connect()
+        self.send(sock, struct.pack('>BHH', 0x06, ROH_FINGER_POS_TARGET0, before + 1000))
+        # 网关线程没有启动，请求超时
+        assert self.receive(sock)[2] == bytes([0x86, EC0B_GATEWAY_TARGET_FAILED])
+        assert self.gateway.queue_depth() == 0
+        self.gateway.start()
+        time.sleep(0.1)
+        assert self.sim.read_holding_registers(ROH_FINGER_POS_TARGET0).registers[0] == before
+        assert self.gateway.get_stats()['cancelled'] == 1
+
+    def test_stats_paginated(self):
+        for index in range(20):
+            self.gateway.register_client(f'client-with-a-long-name-{index}')
+        stats = query_gateway_stats(port=self.port)
+        assert len(stats['clients']) == 21
+        assert len(str(stats)) > MAX_PDU_SIZE
+
+
+class _SerialDevice:
+    """
+    模拟串口：解析写入的 RTU 帧并交给 RohSimulator 处理，把编码后的响应放入接收缓冲区。
+    corrupt 为 True 时翻转响应 CRC，silent 为 True 时不应答（readinto 返回 0 即超时），
+    reply_node_id 不为 None 时以该设备ID应答。
+    """
+
+    def __init__(self, sim, corrupt=False, silent=False, reply_node_id=None):
+        self.sim = sim
+        self.corrupt = corrupt
+        self.silent = silent
+        self.reply_node_id = reply_node_id
+        self.written = []
+        self.rx = bytearray()
+
+    def reset_input_buffer(self):
+        self.rx.clear()
+
+    def flush(self):
+        pass
+
+    def readinto(self, view):
+        size = min(len(view), len(self.rx))
+        view[:size] = self.rx[:size]
+        del self.rx[:size]
+        return size
+
+    def write(self, frame):
+        frame = bytes(frame)
+        self.written.append(frame)
+        assert compute_crc(frame) == 0 # 含 CRC 的整帧再算 CRC 应为 0
+        node_id, function_code = frame[0], frame[1]
+        if function_code == FC_READ_HOLDING_REGISTERS:
+            address, count = struct.unpack_from('>HH', frame, 2)
+            response = self.sim.read_holding_registers(address, count, slave=node_id)
+        elif function_code == FC_WRITE_SINGLE_REGISTER:
+            address, value = struct.unpack_from('>HH', frame, 2)
+            response = self.sim.write_register(address, value, slave=node_id)
+        elif function_code == FC_WRITE_MULTIPLE_REGISTERS:
+            address, count = struct.unpack_from('>HH', frame, 2)
+            response = self.sim.write_registers(address, list(struct.unpack_from(f'>{count}H', frame, 7)), slave=node_id)
+        else:
+            read_address, read_count, write_address, count = struct.unpack_from('>HHHH', frame, 2)
+            values = list(struct.unpack_from(f'>{count}H', frame, 11))
+            response = self.sim.readwrite_registers(read_address, read_count, write_address, values, slave=node_id)
+        if self.silent:
+            return
+        if self.reply_node_id is not None:
+            node_id = self.reply_node_id
+        if response.isError():
+            pdu = bytes([node_id, function_code | 0x80, response.exception_code])
+        elif function_code in (FC_READ_HOLDING_REGISTERS, FC_READ_WRITE_REGISTERS):
+            count = len(response.registers)
+            pdu = struct.pack(f'>BBB{count}H', node_id, function_code, count * 2, *response.registers)
+        else:
+            pdu = bytes([node_id]) + frame[1:6] # FC06/FC16 正常响应回显地址和值/数量
+        crc = compute_crc(pdu) ^ (0xFFFF if self.corrupt else 0)
+        self.rx += pdu + struct.pack('<H', crc)
+
+
+class TestRtuFraming:
+    def setup_method(self):
+        self.sim = RohSimulator(clock=lambda: 0.0)
+        self.device = _SerialDevice(self.sim)
+        self.transport = RtuFastTransport(port='sim')
+        self.transport.socket = self.device
+
+    def test_crc_known_vectors(self):
+        assert compute_crc(b'123456789') == 0x4B37 # CRC-16/MODBUS 标准校验值
+        assert build_read_frame(1, 0, 10).hex() == '01030000000ac5cd'
+        assert build_write_single_frame(1, 1, 3).hex() == '010600010003980b'
+        # Modbus 协议规范中的 FC16 示例
+        assert build_write_frame(0x11, 1, [0x000A, 0x0102]).hex() == '11100001000204000a0102c6f0'
+
+    def test_frame_layouts(self):
+        frame = build_read_frame(2, ROH_FINGER_POS0, NUM_FINGERS)
+        assert struct.unpack('>BBHH', frame[:6]) == (2, FC_READ_HOLDING_REGISTERS, ROH_FINGER_POS0, NUM_FINGERS)
+        frame = build_write_single_frame(2, ROH_BEEP_SWITCH, 1)
+        assert struct.unpack('>BBHH', frame[:6]) == (2, FC_WRITE_SINGLE_REGISTER, ROH_BEEP_SWITCH, 1)
+        frame = build_write_frame(2, ROH_FINGER_POS_TARGET0, [1, 2, 3])
+        assert len(frame) == 9 + 3 * 2
+        assert struct.unpack('>BBHHB3H', frame[:-2]) == (2, FC_WRITE_MULTIPLE_REGISTERS, ROH_FINGER_POS_TARGET0, 3, 6, 1, 2, 3)
+        frame = build_read_write_frame(2, ROH_FINGER_POS0, 6, ROH_FINGER_POS_TARGET0, [4, 5])
+        assert len(frame) == 13 + 2 * 2
+        assert struct.unpack('>BBHHHHB2H', frame[:-2]) == (2, FC_READ_WRITE_REGISTERS, ROH_FINGER_POS0, 6,
+                                                          ROH_FINGER_POS_TARGET0, 2, 4, 4, 5)
+        for frame in (build_read_frame(1, 0, 1), build_write_single_frame(1, 0, 0), build_write_frame(1, 0, [0]),
+                      build_read_write_frame(1, 0, 1, 0, [0])):
+            assert compute_crc(frame) == 0
+
+    def test_transport_round_trip(self):
+        targets = [1000, 2000, 3000, 4000, 5000, 6000]
+        assert not self.transport.write_registers(ROH_FINGER_POS_TARGET0, targets).isError()
+        assert not self.transport.write_register(ROH_BEEP_SWITCH, 1).isError()
+        assert self.sim.read_holding_registers(ROH_BEEP_SWITCH).registers == [1]
+        response = self.transport.read_holding_registers(ROH_FINGER_POS_TARGET0, NUM_FINGERS)
+        assert response.registers == targets
+        response = self.transport.readwrite_registers(ROH_FINGER_POS_TARGET0, NUM_FINGERS, ROH_FINGER_POS_TARGET0, [7000])
+        assert response.function_code == FC_READ_WRITE_REGISTERS
+        assert response.registers == [7000] + targets[1:]
+        out = bytearray(NUM_FINGERS * 2)
+        assert self.transport.read_raw_into(ROH_FINGER_POS_TARGET0, NUM_FINGERS, out)
+        assert list(struct.unpack(f'>{NUM_FINGERS}H', out)) == [7000] + targets[1:]
+
+    def test_transport_through_operator(self):
+        assert write_registers(self.transport, ROH_FINGER_POS_TARGET0, [1234] * NUM_FINGERS)
+        assert read_registers(self.transport, ROH_FINGER_POS_TARGET0, NUM_FINGERS).registers == [1234] * NUM_FINGERS
+        # 读请求帧按 (设备, 地址, 数量) 缓存，重复读取发送同一帧
+        read_registers(self.transport, ROH_FINGER_POS_TARGET0, NUM_FINGERS)
+        assert self.device.written[-1] == self.device.written[-2]
+
+    def test_exception_response(self):
+        response = self.transport.read_holding_registers(0xFFF0, 2)
+        assert response.isError()
+        assert response.function_code == FC_READ_HOLDING_REGISTERS | 0x80
+        assert response.exception_code == 2
+        response = self.transport.readwrite_registers(0xFFF0, 1, ROH_FINGER_POS_TARGET0, [1000])
+        assert response.isError()
+        assert response.function_code == FC_READ_WRITE_REGISTERS | 0x80
+        assert not self.transport.read_raw_into(0xFFF0, 1, bytearray(2))
+        # 异常响应之后传输仍可正常使用
+        assert self.transport.read_holding_registers(ROH_FINGER_POS_TARGET0).registers == [1000]
+
+    def test_bad_crc(self):
+        self.device.corrupt = True
+        with pytest.raises(InvalidMessageReceivedException):
+            self.transport.read_holding_registers(ROH_FINGER_POS0, NUM_FINGERS)
+        with pytest.raises(InvalidMessageReceivedException):
+            self.transport.write_register(ROH_BEEP_SWITCH, 1)
+
+    def test_mismatched_response(self):
+        self.device.reply_node_id = NODE_ID + 1
+        with pytest.raises(InvalidMessageReceivedException):
+            self.transport.read_holding_registers(ROH_FINGER_POS0, NUM_FINGERS)
+
+    def test_timeout(self):
+        self.device.silent = True
+        with pytest.raises(ModbusIOException):
+            self.transport.read_holding_registers(ROH_FINGER_POS0, NUM_FINGERS)
+
+
+class TestFunctionCodeProbe:
+    def test_probe_cached_per_port(self):
+        first = RohSimulator(clock=lambda: 0.0)
+        first.port = 'sim-probe'
+        assert probe_function_codes(first)[FC_WRITE_SINGLE_REGISTER]
+        # 同一串口重新连接得到的新总线对象不再发送探测帧
+        second = _FlakyBus(RohSimulator(clock=lambda: 0.0))
+        second.port = 'sim-probe'
+        second.fail = True # 一旦发送探测帧就会失败
+        assert function_code_supported(second, FC_WRITE_SINGLE_REGISTER)
+        assert probe_function_codes(second)[FC_WRITE_SINGLE_REGISTER]
+        other = RohSimulator(clock=lambda: 0.0)
+        other.port = 'sim-other'
+        assert not function_code_supported(other, FC_WRITE_SINGLE_REGISTER)
+
+
+class TestRegisterScanner:
+    def setup_method(self):
+        self.sim = RohSimulator(clock=lambda: 0.0)
+        self.truth = {address for address in range(SCAN_START_ADDRESS, SCAN_END_ADDRESS + 1)
+                      if self.sim.model.is_valid_address(address)}
+
+    def check_map(self, register_map):
+        valid = from_ranges(register_map['valid'])
+        invalid = from_ranges(register_map['invalid'])
+        unknown = from_ranges(register_map['unknown'])
+        # 每个地址都有且只有一个结果，标记为可读或无效的地址都经过探测确认
+        assert valid | invalid | unknown == set(range(SCAN_START_ADDRESS, SCAN_END_ADDRESS + 1))
+        assert not (valid & invalid or valid & unknown or invalid & unknown)
+        assert valid <= self.truth
+        assert not invalid & self.truth
+        return valid, unknown
+
+    def test_uncapped_gallop(self):
+        register_map = RegisterScanner(self.sim).build_map()
+        valid, unknown = self.check_map(register_map)
+        assert register_map['valid'] == [[1000, 1184], [1245, 1249], [1255, 1259], [2000, 2999]]
+        # 被跳过的短可读区间标记为未知，而不是无效
+        assert {1225, 1229, 1235, 1239} <= unknown
+        assert register_map['transactions'] == 71
+
+    def test_capped_gallop_finds_short_ranges(self):
+        register_map = RegisterScanner(self.sim, gap_max_step=5).build_map()
+        valid, _ = self.check_map(register_map)
+        assert valid == self.truth
+        assert register_map['valid'] == to_ranges(self.truth)
+        assert register_map['transactions'] == 233
+
+
+class _ScriptedBus:
+    """
+    按顺序返回预设的寄存器值，用完后一直返回最后一组；delay 为每次读取的耗时（秒）。
+    """
+
+    def __init__(self, values, delay=0.0):
+        self.values = values
+        self.delay = delay
+        self.reads = 0
+
+    def read_holding_registers(self, address, count=1, slave=NODE_ID):
+        if self.delay:
+            time.sleep(self.delay)
+        registers = self.values[min(self.reads, len(self.values) - 1)]
+        self.reads += 1
+        return FastResponse(FC_READ_HOLDING_REGISTERS, registers=list(registers))
+
+
+class TestWaitConverged:
+    def test_converges_on_simulator(self):
+        sim = RohSimulator()
+        target = 10000 # 约 0.15 秒走完
+        sim.write_registers(ROH_FINGER_POS_TARGET0, [target])
+        result = wait_converged(sim, ROH_FINGER_POS0, [target], POS_TOLERANCE, timeout=2)
+        assert result.converged, f'{result}\n'
+        assert abs(result.values[0] - target) <= POS_TOLERANCE
+        assert 0.1 < result.elapsed < 1.0
+
+    def test_angle_wraps_position_does_not(self):
+        # 角度寄存器按 int16 比较：65534 即 -2，与目标 1 相差 3
+        result = wait_converged(_ScriptedBus([[65534]]), ROH_FINGER_ANGLE0, [1], ANGLE_TOLERANCE, timeout=1)
+        assert result.converged and result.samples == 3
+        # 位置寄存器的 0 和 65535 是行程两端，不能回绕
+        result = wait_converged(_ScriptedBus([[65534]]), ROH_FINGER_POS0, [1], POS_TOLERANCE, timeout=0.1)
+        assert not result.converged
+
+    def test_stall_returns_before_timeout(self):
+        bus = _ScriptedBus([[0], [5000], [10000]], delay=0.005)
+        result = wait_converged(bus, ROH_FINGER_POS0, [30000], POS_TOLERANCE, timeout=2, stall_time=0.05)
+        assert not result.converged
+        assert result.values == [10000]
+        assert result.elapsed < 1
+
+    def test_stall_timer_starts_on_first_movement(self):
+        # 指令生效前静止 0.1 秒，超过 stall_time 但不应判为停住
+        bus = _ScriptedBus([[0]] * 20 + [[30000]], delay=0.005)
+        result = wait_converged(bus, ROH_FINGER_POS0, [30000], POS_TOLERANCE, timeout=2, stall_time=0.05)
+        assert result.converged, f'{result}\n'
+
+    def test_abort(self):
+        abort = threading.Event()
+        polls = []
+
+        def on_poll():
+            polls.append(time.perf_counter())
+            if len(polls) == 3:
+                abort.set()
+
+        bus = _ScriptedBus([[0], [1000], [2000], [3000], [4000]])
+        result = wait_converged(bus, ROH_FINGER_POS0, [30000], POS_TOLERANCE, timeout=2, abort=abort, on_poll=on_poll)
+        assert not result.converged
+        assert result.samples == 3 and len(polls) == 3
+        assert result.values == [2000]
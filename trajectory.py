@@ -0,0 +1,209 @@
+import struct
+import time
+import logging
+
+import numpy as np
+
+from mobus_operator import (setup_modbus, close_modbus, write_registers, wait_until, NODE_ID, NUM_FINGERS,
+                            FC_WRITE_MULTIPLE_REGISTERS, ROH_FINGER_POS_TARGET0, _CRC16_TABLE)
+
+# 设置日志级别为INFO，获取日志记录器实例
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+console_handler = logging.StreamHandler()
+
+# 设置处理程序的日志级别为 INFO
+console_handler.setLevel(logging.INFO)
+logger.addHandler(console_handler)
+
+# 插值方式
+INTERP_LINEAR = 0X0  # 线性插值
+INTERP_MIN_JERK = 0X1  # 最小加加速度（五次多项式），起止速度和加速度为 0
+
+roh_interp_list = {
+        INTERP_LINEAR: '线性',
+        INTERP_MIN_JERK: '最小加加速度'
+    }
+
+TRAJECTORY_RATE = 100 # 默认发送频率（Hz），115200bps 下一帧 FC16 往返约 3ms，可用 50~200Hz
+TRAJECTORY_START_DELAY = 0.01 # 开始发送前的准备时间（秒）
+
+
+def interpolate(times, waypoints, rate=TRAJECTORY_RATE, mode=INTERP_LINEAR):
+    """
+    把关键帧向量化插值成固定频率的目标序列。
+    :param times: 形状 (k,) 的关键帧时间（秒），递增
+    :param waypoints: 形状 (k, 6) 的关键帧位置
+    :return: (t, values)，t 形状 (n,)，values 形状 (n, 6) 的 uint16
+    """
+    times = np.asarray(times, dtype=np.float64)
+    waypoints = np.asarray(waypoints, dtype=np.float64)
+    if len(times) != len(waypoints) or len(times) < 1 or np.any(np.diff(times) <= 0):
+        raise ValueError(f"Invalid keyframes: {times}")
+    t = np.arange(0, times[-1] - times[0] + 0.5 / rate, 1 / rate) + times[0]
+    segment = np.clip(np.searchsorted(times, t, side='right') - 1, 0, max(len(times) - 2, 0))
+    end = np.minimum(segment + 1, len(times) - 1)
+    duration = np.where(end > segment, times[end] - times[segment], 1.0)
+    s = np.clip((t - times[segment]) / duration, 0.0, 1.0)
+    if mode == INTERP_MIN_JERK:
+        s = s * s * s * (10 - 15 * s + 6 * s * s)
+    values = waypoints[segment] + (waypoints[end] - waypoints[segment]) * s[:, None]
+    return t - times[0], np.rint(np.clip(values, 0, 65535)).astype(np.uint16)
+
+
+def build_write_frames(node_id, start_address, values):
+    """
+    向量化生成一组 FC16 帧，每行与 build_write_frame(node_id, start_address, values[i]) 相同，
+    CRC 按字节位置对所有帧同时查表计算，几分钟的数据也只占一块连续内存。
+    :param values: 形状 (n, count) 的寄存器值
+    :return: 形状 (n, 帧长) 的 uint8 数组
+    """
+    values = np.asarray(values, dtype='>u2')
+    n, count = values.shape
+    header = np.frombuffer(struct.pack('>BBHHB', node_id, FC_WRITE_MULTIPLE_REGISTERS, start_address, count, count * 2),
+                           dtype=np.uint8)
+    frames = np.empty((n, len(header) + count * 2 + 2), dtype=np.uint8)
+    frames[:, :len(header)] = header
+    frames[:, len(header):-2] = values.view(np.uint8).reshape(n, count * 2)
+    table = np.array(_CRC16_TABLE, dtype=np.uint16)
+    crc = np.full(n, 0xFFFF, dtype=np.uint16)
+    for column in range(frames.shape[1] - 2):
+        crc = (crc >> 8) ^ table[(crc ^ frames[:, column]) & 0xFF]
+    frames[:, -2] = crc & 0xFF
+    frames[:, -1] = crc >> 8
+    return frames
+
+
+class StreamStats:
+    """
+    一次流式发送的统计：每个节拍的发送偏差（实际发出时刻 - 计划时刻）和发送耗时（发出到收到应答），
+    被跳过的节拍为 nan。
+    """
+
+    def __init__(self, jitter, latency, sent, skipped, failed, elapsed):
+        self.jitter = jitter
+        self.latency = latency
+        self.sent = sent
+        self.skipped = skipped
+        self.failed = failed
+        self.elapsed = elapsed
+
+    def summary(self):
+        if not self.sent:
+            return {'sent': 0, 'skipped': self.skipped, 'failed': self.failed, 'elapsed': self.elapsed}
+        return {'sent': self.sent,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'elapsed': self.elapsed,
+                'jitter_p50': float(np.nanpercentile(self.jitter, 50)),
+                'jitter_p99': float(np.nanpercentile(self.jitter, 99)),
+                'jitter_max': float(np.nanmax(self.jitter)),
+                'latency_mean': float(np.nanmean(self.latency)),
+                'latency_p99': float(np.nanpercentile(self.latency, 99))}
+
+    def __repr__(self):
+        return f'StreamStats({self.summary()})'
+
+
+class TrajectoryStreamer:
+    """
+    按截止时间调度的轨迹流式发送：每个节拍一帧 FC16 写入 6 个目标，截止时间按起点的绝对时间计算，不累积漂移；
+    落后超过一个节拍时丢弃过期节拍，只发最新的一个，不排队补发。
+    RtuFastTransport 预先向量化生成全部帧直接发送，其它总线逐帧调用 write_registers。
+    """
+
+    def __init__(self, bus, node_id=NODE_ID, start_address=ROH_FINGER_POS_TARGET0):
+        self.bus = bus
+        self.node_id = node_id
+        self.start_address = start_address
+
+    def compile(self, values):
+        """
+        :param values: 形状 (n, 6) 的目标序列
+        :return: 预先生成的帧（RtuFastTransport）或 uint16 目标数组
+        """
+        if hasattr(self.bus, 'send_frame'):
+            return build_write_frames(self.node_id, self.start_address, values)
+        return np.asarray(values, dtype=np.uint16)
+
+    def _sender(self, compiled):
+        """
+        :return: send(index)，发送第 index 个节拍，成功返回 True
+        """
+        bus, node_id, start_address = self.bus, self.node_id, self.start_address
+        if hasattr(bus, 'send_frame'):
+            size = compiled.shape[1]
+            frames = memoryview(np.ascontiguousarray(compiled)).cast('B')
+
+            def send(index):
+                try:
+                    frame = frames[index * size:(index + 1) * size]
+                    return not bus.send_frame(frame, FC_WRITE_MULTIPLE_REGISTERS, node_id).isError()
+                except Exception as e:
+                    logger.error(f'[node_id = {node_id}]发送轨迹帧异常: {e}')
+                    return False
+        else:
+            def send(index):
+                return write_registers(bus=bus, start_address=start_address, data=compiled[index].tolist(),
+                                       node_id=node_id, wait_time=0, retry_policy=None)
+        return send
+
+    def play(self, t, values, time_scale=1.0, begin=None, compiled=None):
+        """
+        按 t 给出的时刻发送 values，t 可以不等间隔（如回放录制的数据）。
+        :param t: 形状 (n,) 的相对时间（秒），递增
+        :param time_scale: 时间缩放，2 表示以一半速度播放
+        :param begin: 起点（time.perf_counter()），默认为稍后的当前时刻
+        :param compiled: compile(values) 的结果，重复播放时可复用
+        :return: StreamStats
+        """
+        compiled = compiled if compiled is not None else self.compile(values)
+        n = len(compiled)
+        deadlines = np.asarray(t, dtype=np.float64) * time_scale
+        begin = time.perf_counter() + TRAJECTORY_START_DELAY if begin is None else begin
+        deadlines = (deadlines + begin).tolist()
+        jitter = np.full(n, np.nan)
+        latency = np.full(n, np.nan)
+        send = self._sender(compiled)
+        perf_counter = time.perf_counter
+        skipped = failed = 0
+        for index in range(n):
+            now = perf_counter()
+            if index + 1 < n and deadlines[index + 1] <= now:
+                # 下一个节拍也已经过期，这一帧不再发送
+                skipped += 1
+                continue
+            wait_until(deadlines[index])
+            issue = perf_counter()
+            ok = send(index)
+            done = perf_counter()
+            if not ok:
+                failed += 1
+                continue
+            jitter[index] = issue - deadlines[index]
+            latency[index] = done - issue
+        stats = StreamStats(jitter, latency, n - skipped - failed, skipped, failed, perf_counter() - begin)
+        logger.info(f'[node_id = {self.node_id}]轨迹发送完成: {stats.summary()}')
+        return stats
+
+
+def stream_trajectory(bus, times, waypoints, rate=TRAJECTORY_RATE, mode=INTERP_MIN_JERK, node_id=NODE_ID,
+                      time_scale=1.0):
+    """
+    插值关键帧并以 rate 的频率发送到 ROH_FINGER_POS_TARGET0~5。
+    :return: StreamStats
+    """
+    t, values = interpolate(times, waypoints, rate, mode)
+    return TrajectoryStreamer(bus, node_id).play(t, values, time_scale=time_scale)
+
+
+if __name__ == "__main__":
+    # 初始化 modbus 总线
+    bus = setup_modbus()
+
+    if bus:
+        # 2 秒握拳、1 秒保持、2 秒张开，100Hz 最小加加速度插值
+        waypoints = [[0] * NUM_FINGERS, [65535] * NUM_FINGERS, [65535] * NUM_FINGERS, [0] * NUM_FINGERS]
+        logger.info(stream_trajectory(bus, [0, 2, 3, 5], waypoints))
+        close_modbus(bus)